@@ -7,25 +7,84 @@ load_dotenv()
 import os
 import json
 import time
-from typing import Any, Dict, List, Literal, Optional, Sequence
-
-from langchain_google_genai import (  # type: ignore[import-untyped]
-    ChatGoogleGenerativeAI,
-    HarmBlockThreshold,
-    HarmCategory,
+import asyncio
+import logging
+import threading
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import (
+    Any, Dict, Generator, List, Literal, NamedTuple, Optional, Sequence, Tuple,
 )
+
 from langchain_core.messages import (  # type: ignore[import-untyped]
     BaseMessage,
     SystemMessage,
     HumanMessage,
     AIMessage,
+    ToolMessage,
+    RemoveMessage,
 )
+from langchain_core.tools import BaseTool  # type: ignore[import-untyped]
 from langgraph.graph.message import add_messages  # type: ignore[import-untyped]
 from typing_extensions import Annotated, TypedDict
-from pydantic import BaseModel  # type: ignore[import-untyped]
-
+from pydantic import BaseModel, Field  # type: ignore[import-untyped]
+
+from context import context_for, fold_point, last_user_message, transcript
+from research_notes import (
+    ANSWER,
+    NoteRecord,
+    append_notes,
+    note,
+    notes_for_step,
+    report_view,
+)
+from budget import BudgetExceeded, RequestBudget, budget_exhausted, current_budget
+from metrics import (
+    LLM_CALLS,
+    LLM_RETRIES,
+    LLM_SECONDS,
+    LLM_TOKENS,
+    current_node,
+    model_label,
+)
+from review import (
+    REVIEW_MAX_RETRIES,
+    ReviewDecision,
+    ReviewStats,
+    get_review_stats,
+    local_review,
+)
+from intent import IntentClassifier, IntentDecision, get_classifier
+from llm_cache import ResponseCache, cache_key, get_response_cache, request_key
+from cassette import Cassette, get_cassette
+from rate_limit import (
+    RateLimiter,
+    Reservation,
+    estimate_tokens,
+    get_rate_limiter,
+    jittered,
+    parse_retry_after,
+    usage_tokens,
+)
 from tools import TOOLS, ZAPIER_TOOLS
 
+log = logging.getLogger(__name__)
+
+# Tools that must go through the human_approval interrupt before they run.
+APPROVAL_TOOLS: Tuple[str, ...] = ("save_to_notes",)
+# Attempts per LLM call; quota errors wait on the shared rate limiter in between.
+LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "5"))
+# Upper bound on LLM→tool round trips a single research step may take.
+MAX_STEP_TOOL_ROUNDS: int = 3
+# ACTION_PARALLEL=0 runs every action step after the previous one, ignoring
+# the dependencies the planner declared.
+ACTION_PARALLEL: bool = os.getenv("ACTION_PARALLEL", "1").lower() not in ("0", "false", "off")
+# Opt-in: when the local classifier gives 'research' at least this probability
+# and the router still has to ask Gemini, the planner call runs alongside it.
+SPECULATIVE_PLANNING: bool = os.getenv("SPECULATIVE_PLANNING", "0").lower() in ("1", "true", "on")
+SPECULATE_MIN_SCORE: float = float(os.getenv("SPECULATE_MIN_SCORE", "0.35"))
+
 
 def load_user_prefs() -> Dict[str, Any]:
     if os.path.exists("user_prefs.json"):
@@ -35,32 +94,116 @@ def load_user_prefs() -> Dict[str, Any]:
     return {}
 
 
-USER_PREFS: Dict[str, Any] = load_user_prefs()
-PREF_CONTEXT: str = f"User Preferences: {USER_PREFS}" if USER_PREFS else ""
+@lru_cache(maxsize=1)
+def pref_context() -> str:
+    prefs: Dict[str, Any] = load_user_prefs()
+    return f"User Preferences: {prefs}" if prefs else ""
+
+
+def render(template: str, **values: Any) -> str:
+    """Fill a prompt template; `{prefs}` is the user preferences line."""
+    return template.format(prefs=pref_context(), **values)
+
+
+class StepResult(TypedDict):
+    pending_calls: List[Dict[str, Any]]
+
+
+def merge_step_results(
+    left: Optional[Dict[int, Any]],
+    right: Optional[Dict[int, Any]],
+) -> Dict[int, Any]:
+    """Reducer for parallel step workers; writing None resets it for a new plan."""
+    if right is None:
+        return {}
+    return {**(left or {}), **right}
+
+
+def latest_budget(
+    left: Optional[Dict[str, Any]],
+    right: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Reducer: each write is a whole snapshot of the request's budget, so the
+    last one wins and nothing carries over from an earlier turn."""
+    return right if right is not None else (left or {})
 
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     mode: Literal["quick", "research", "explain", "action"]
     plan: List[str]
+    plan_deps: List[List[int]]
+    step_results: Annotated[Dict[int, StepResult], merge_step_results]
     current_step: int
-    research_notes: str
-    review_count: int
+    research_notes: Annotated[List[NoteRecord], append_notes]
+    review_count: int  # answers the validator sent back this turn
     user_approval_needed: bool
     approval_action: Optional[str]
     action_results: Optional[List[str]]
-
-
-llm: Any = ChatGoogleGenerativeAI(  # type: ignore[call-arg]
-    model="gemini-2.0-flash-lite",   # ← was gemini-2.0-flash. Lite = 30 RPM free vs 15 RPM
-    temperature=0,
-    safety_settings={
-        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-    },
-)
+    action_outputs: Annotated[Dict[int, str], merge_step_results]
+    speculated: bool
+    context_summary: str
+    budget: Annotated[Dict[str, Any], latest_budget]  # RequestBudget.snapshot(), see budget.py
+
+
+# ── LLM (built on first use) ────────────────────────────────────────────
+_llm: Any = None
+_bound: Dict[Tuple[str, Any], Any] = {}
+# Seconds spent building lazily created clients, reported by import_report.py.
+INIT_TIMINGS: Dict[str, float] = {}
+
+
+def get_llm() -> Any:
+    global _llm
+    if _llm is None:
+        started: float = time.perf_counter()
+        from langchain_google_genai import (  # type: ignore[import-untyped]
+            ChatGoogleGenerativeAI,
+            HarmBlockThreshold,
+            HarmCategory,
+        )
+        _llm = ChatGoogleGenerativeAI(  # type: ignore[call-arg]
+            model="gemini-2.0-flash-lite",   # ← was gemini-2.0-flash. Lite = 30 RPM free vs 15 RPM
+            temperature=0,
+            safety_settings={
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            },
+        )
+        INIT_TIMINGS["llm"] = time.perf_counter() - started
+    return _llm
+
+
+def set_llm(instance: Any) -> None:
+    """Swap the chat model (e.g. for a fake in scripts) and drop bound runnables."""
+    global _llm
+    _llm = instance
+    _bound.clear()
+
+
+def with_tools(tools: List[Any]) -> Any:
+    """`llm.bind_tools(tools)`, built once per tool set."""
+    key: Tuple[str, Any] = ("tools", tuple(t.name for t in tools))
+    if key not in _bound:
+        _bound[key] = get_llm().bind_tools(tools)
+    return _bound[key]
+
+
+def structured(schema: Any) -> Any:
+    """`llm.with_structured_output(schema)`, built once per schema."""
+    key: Tuple[str, Any] = ("structured", schema)
+    if key not in _bound:
+        _bound[key] = get_llm().with_structured_output(schema)
+    return _bound[key]
+
+
+def __getattr__(name: str) -> Any:
+    # `from agent import llm` keeps working without building the client at import.
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 ROUTER_PROMPT = """You are a smart router. Classify the user's intent into exactly one of:
 
@@ -74,10 +217,12 @@ ROUTER_PROMPT = """You are a smart router. Classify the user's intent into exact
 Reply with exactly one word: research | quick | explain | action
 """
 
-PLANNER_PROMPT: str = f"""You are a research planner. Break the request into 2 to 3
+PLANNER_PROMPT = """You are a research planner. Break the request into 2 to 3
 distinct, actionable research steps.
-{PREF_CONTEXT}
-Each step must focus on a specific aspect. Return a valid JSON list of strings only.
+{prefs}
+Each step must focus on a specific aspect. Steps run in parallel unless they
+declare dependencies: set depends_on to the 0-based indices of EARLIER steps whose
+findings the step needs, and leave it empty for independent steps.
 """
 
 EXECUTOR_PROMPT = """You are a Reasoning Research Agent.
@@ -88,18 +233,20 @@ Research Notes So Far:
 
 Instructions:
 1. Briefly explain your REASONING (why this step matters).
-2. Use search_web if you need current information.
-3. Use save_to_notes to record important findings (provide a topic name).
-4. If no tool needed, provide your analysis directly.
+2. Use search_notes first to check findings saved in earlier sessions.
+3. Use search_web if you need current information, or search_web_batch to look up
+   several angles of the step in a single call.
+4. Use save_to_notes to record important findings (provide a topic name).
+5. If no tool needed, provide your analysis directly.
 """
 
-REPORTER_PROMPT: str = f"""You are a technical writer. Produce a comprehensive final report.
+REPORTER_PROMPT = """You are a technical writer. Produce a comprehensive final report.
 
 Research Notes:
-{{notes}}
+{notes}
 
-{PREF_CONTEXT}
-Original Request: {{request}}
+{prefs}
+Original Request: {request}
 
 Write the report in clear sections. Be specific and cite findings from the notes.
 """
@@ -116,12 +263,13 @@ Answer: {answer}
 Reply with status (pass or fail) and brief feedback.
 """
 
-CHAT_PROMPT: str = f"""You are a helpful, concise assistant.
-{PREF_CONTEXT}
+CHAT_PROMPT = """You are a helpful, concise assistant.
+{prefs}
 
-User Input: {{input}}
+User Input: {input}
 
-If confident, respond directly. If you need current info, use search_web.
+If confident, respond directly. To recall something saved earlier, use search_notes.
+If you need current info, use search_web.
 """
 
 EXPLAIN_PROMPT = """You are the Meta-Agent. Explain your own architecture clearly.
@@ -129,7 +277,7 @@ EXPLAIN_PROMPT = """You are the Meta-Agent. Explain your own architecture clearl
 ISEA v3.0 components:
 1. Router       - classifies intent: quick | research | explain | action
 2. Planner      - decomposes research tasks into 3-5 steps
-3. Executor     - runs each step, calls tools (web search, notes, calculator)
+3. Executor     - runs each step, calls tools (saved-notes search, web search, notes, calculator)
 4. Validator    - checks answer quality, triggers retry if it fails
 5. Reporter     - synthesises research notes into a final report
 6. HITL Safety  - pauses for human approval before sensitive write operations
@@ -148,14 +296,19 @@ Available Zapier actions:
 - create-event       : create a Google Calendar event
 - slack-message      : post a message to a Slack channel
 
-Produce a concise 2-4 step plan. Return ONLY a valid JSON list of strings.
-Example: ["Check connected apps", "Reschedule standup to Thursday 10am", "Notify #engineering"]
+Produce a concise 2-4 step plan. Independent steps run at the same time, so for
+each step set depends_on to the 0-based indices of EARLIER steps that must finish
+first (e.g. a notification about a rescheduled meeting depends on the reschedule),
+and leave it empty when the step stands on its own.
+Example: [{"task": "Reschedule standup to Thursday 10am", "depends_on": []},
+          {"task": "Notify #engineering about the new time", "depends_on": [0]},
+          {"task": "Email Alice the Q3 report", "depends_on": []}]
 """
 
 ACTION_EXECUTOR_PROMPT = """You are an action execution agent.
 
 Current Step: {step}
-Steps Completed: {results}
+Results of Earlier Steps This Step Depends On: {results}
 Original Request: {request}
 
 Instructions:
@@ -178,13 +331,34 @@ Actions completed:
 Write a friendly, clear summary of what was done, what changed, and who was notified.
 """
 
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an
+AI research assistant. Merge the new transcript into the existing summary.
+Keep user goals, preferences, decisions, key facts and findings; drop chit-chat.
+Stay under 250 words.
+
+Existing summary:
+{summary}
+
+New transcript:
+{transcript}
+"""
+
 
 class RoutingOutput(BaseModel):  # type: ignore[misc]
     mode: Literal["quick", "research", "explain", "action"]
 
 
-class PlanningOutput(BaseModel):  # type: ignore[misc]
-    steps: List[str]
+class PlanStep(BaseModel):  # type: ignore[misc]
+    task: str
+    depends_on: List[int] = Field(default_factory=list)
+
+
+class ResearchPlanOutput(BaseModel):  # type: ignore[misc]
+    steps: List[PlanStep]
+
+
+class ActionPlanOutput(BaseModel):  # type: ignore[misc]
+    steps: List[PlanStep]
 
 
 class ReviewOutput(BaseModel):  # type: ignore[misc]
@@ -192,167 +366,819 @@ class ReviewOutput(BaseModel):  # type: ignore[misc]
     feedback: str
 
 
-def safe_invoke(llm_instance: Any, input_data: Any, retries: int = 3) -> Any:
+def _is_rate_limited(exc: Exception) -> bool:
+    msg: str = str(exc).lower()
+    return any(
+        kw in msg
+        for kw in ("429", "resourceexhausted", "quota",
+                   "contents are required", "503")
+    )
+
+
+def _backoff(attempt: int, exc: Exception) -> float:
+    """Seconds to wait after a quota error: the server's hint, else exponential; jittered."""
+    hint: Optional[float] = parse_retry_after(str(exc))
+    return jittered(hint if hint is not None else float(2 ** (attempt + 1)))
+
+
+def safe_invoke(llm_instance: Any, input_data: Any, retries: int = LLM_MAX_RETRIES) -> Any:
+    cache: Optional[ResponseCache] = get_response_cache()
+    key: Optional[str] = cache_key(llm_instance, input_data) if cache else None
+    labels: Tuple[str, str] = (current_node(), model_label(llm_instance))
+    if cache is not None and key is not None:
+        hit, cached = cache.get(key)
+        if hit:
+            LLM_CALLS.inc(*labels, "cached")
+            return cached
+    cassette: Optional[Cassette] = get_cassette()
+    # A replayed call never reaches Gemini, so it takes no quota.
+    limiter: Optional[RateLimiter] = (
+        None if cassette is not None and cassette.replaying else get_rate_limiter()
+    )
+    estimate: int = estimate_tokens(input_data)
+    budget: Optional[RequestBudget] = current_budget()
+    if budget is not None:
+        budget.begin_llm_call(estimate)
+    call_key: str = request_key(llm_instance, input_data) if cassette is not None else ""
+    last_exc: Exception = RuntimeError("No attempts made")
+    for attempt in range(retries):
+        if budget is not None:
+            budget.check_deadline()
+        reservation: Optional[Reservation] = (
+            limiter.acquire(estimate) if limiter is not None else None
+        )
+        started: float = time.perf_counter()
+        try:
+            result: Any = (
+                llm_instance.invoke(input_data) if cassette is None
+                else cassette.call("llm", call_key, input_data, lambda: llm_instance.invoke(input_data))
+            )
+            LLM_SECONDS.observe(time.perf_counter() - started, *labels)
+            LLM_CALLS.inc(*labels, "ok")
+            reported: Optional[int] = usage_tokens(result)
+            LLM_TOKENS.inc(*labels, amount=reported or estimate)
+            if limiter is not None and reservation is not None:
+                limiter.record_usage(reservation, reported)
+            if budget is not None:
+                budget.charge_tokens(reported or estimate)
+            if cache is not None and key is not None and result is not None:
+                cache.set(key, result)
+            return result
+        except Exception as exc:
+            last_exc = exc
+            LLM_CALLS.inc(*labels, "error")
+            print(f"LLM Error (attempt {attempt + 1}/{retries}): {exc}")
+            if _is_rate_limited(exc):
+                wait: float = _backoff(attempt, exc)
+                if cassette is not None and cassette.replaying:
+                    wait *= cassette.latency  # replayed quota errors back off on the replay clock
+                if budget is not None:
+                    # Don't wait out a quota error the deadline won't survive.
+                    budget.check_deadline(wait)
+                if attempt + 1 < retries:
+                    LLM_RETRIES.inc(*labels)
+                print(f"Rate limit hit. Waiting {wait:.1f}s...")
+                if limiter is not None:
+                    # Pauses the shared queue, so the next acquire() does the waiting.
+                    limiter.penalize(wait)
+                else:
+                    time.sleep(wait)
+            else:
+                raise exc
+    raise RuntimeError(f"Max retries reached. Last error: {last_exc}")
+
+
+async def asafe_invoke(llm_instance: Any, input_data: Any, retries: int = LLM_MAX_RETRIES) -> Any:
+    cache: Optional[ResponseCache] = get_response_cache()
+    key: Optional[str] = cache_key(llm_instance, input_data) if cache else None
+    labels: Tuple[str, str] = (current_node(), model_label(llm_instance))
+    if cache is not None and key is not None:
+        hit, cached = await cache.aget(key)
+        if hit:
+            LLM_CALLS.inc(*labels, "cached")
+            return cached
+    cassette: Optional[Cassette] = get_cassette()
+    limiter: Optional[RateLimiter] = (
+        None if cassette is not None and cassette.replaying else get_rate_limiter()
+    )
+    estimate: int = estimate_tokens(input_data)
+    budget: Optional[RequestBudget] = current_budget()
+    if budget is not None:
+        budget.begin_llm_call(estimate)
+    call_key: str = request_key(llm_instance, input_data) if cassette is not None else ""
     last_exc: Exception = RuntimeError("No attempts made")
     for attempt in range(retries):
+        if budget is not None:
+            budget.check_deadline()
+        reservation: Optional[Reservation] = (
+            await limiter.aacquire(estimate) if limiter is not None else None
+        )
+        started: float = time.perf_counter()
         try:
-            return llm_instance.invoke(input_data)
+            result: Any = (
+                await llm_instance.ainvoke(input_data) if cassette is None
+                else await cassette.acall("llm", call_key, input_data, lambda: llm_instance.ainvoke(input_data))
+            )
+            LLM_SECONDS.observe(time.perf_counter() - started, *labels)
+            LLM_CALLS.inc(*labels, "ok")
+            reported: Optional[int] = usage_tokens(result)
+            LLM_TOKENS.inc(*labels, amount=reported or estimate)
+            if limiter is not None and reservation is not None:
+                limiter.record_usage(reservation, reported)
+            if budget is not None:
+                budget.charge_tokens(reported or estimate)
+            if cache is not None and key is not None and result is not None:
+                await cache.aset(key, result)
+            return result
         except Exception as exc:
             last_exc = exc
-            msg: str = str(exc).lower()
+            LLM_CALLS.inc(*labels, "error")
             print(f"LLM Error (attempt {attempt + 1}/{retries}): {exc}")
-            if any(
-                kw in msg
-                for kw in ("429", "resourceexhausted", "quota",
-                           "contents are required", "503")
-            ):
-                wait: int = 2 ** (attempt + 1)
-                print(f"Rate limit hit. Waiting {wait}s...")
-                time.sleep(wait)
+            if _is_rate_limited(exc):
+                wait: float = _backoff(attempt, exc)
+                if cassette is not None and cassette.replaying:
+                    wait *= cassette.latency  # replayed quota errors back off on the replay clock
+                if budget is not None:
+                    # Don't wait out a quota error the deadline won't survive.
+                    budget.check_deadline(wait)
+                if attempt + 1 < retries:
+                    LLM_RETRIES.inc(*labels)
+                print(f"Rate limit hit. Waiting {wait:.1f}s...")
+                if limiter is not None:
+                    limiter.penalize(wait)
+                else:
+                    await asyncio.sleep(wait)
             else:
                 raise exc
     raise RuntimeError(f"Max retries reached. Last error: {last_exc}")
 
 
+# ── Node runners ────────────────────────────────────────────────────────
+# Node bodies are written once as generators: each `yield (runnable, input)`
+# asks for one LLM call and receives its response back, and the generator's
+# return value is the state update. `_run` drives a body with the blocking
+# `safe_invoke` (used by `graph.stream`), `_arun` with `asafe_invoke` (used by
+# `graph.astream`), so the API never blocks the event loop on Gemini.
+# Yielding a tool with a tool call instead of a model runs that tool.
+NodeSteps = Generator[Tuple[Any, Any], Any, Dict[str, Any]]
+
+
+class Parallel(NamedTuple):
+    """Yield `Parallel([(runnable, input), ...], [])` to run several calls at
+    once. The body gets a list of results back (a failed call's exception in
+    its place), and `seconds` is filled with each call's duration."""
+    calls: List[Tuple[Any, Any]]
+    seconds: List[float]
+
+
+def _dispatch(runnable: Any, input_data: Any) -> Any:
+    if isinstance(runnable, BaseTool):
+        return runnable.invoke(input_data)
+    return safe_invoke(runnable, input_data)
+
+
+async def _adispatch(runnable: Any, input_data: Any) -> Any:
+    if isinstance(runnable, BaseTool):
+        return await runnable.ainvoke(input_data)
+    return await asafe_invoke(runnable, input_data)
+
+
+def _timed(runnable: Any, input_data: Any) -> Tuple[Any, float]:
+    started: float = time.perf_counter()
+    try:
+        return _dispatch(runnable, input_data), time.perf_counter() - started
+    except Exception as exc:
+        return exc, time.perf_counter() - started
+
+
+async def _atimed(runnable: Any, input_data: Any) -> Tuple[Any, float]:
+    started: float = time.perf_counter()
+    try:
+        return await _adispatch(runnable, input_data), time.perf_counter() - started
+    except Exception as exc:
+        return exc, time.perf_counter() - started
+
+
+def _dispatch_request(request: Any) -> Any:
+    if not isinstance(request, Parallel):
+        return _dispatch(*request)
+    # Each call runs in a copy of this context so it charges the same budget.
+    contexts: List[Any] = [copy_context() for _ in request.calls]
+    with ThreadPoolExecutor(max_workers=len(request.calls)) as pool:
+        done: List[Tuple[Any, float]] = list(
+            pool.map(lambda ctx, call: ctx.run(_timed, *call), contexts, request.calls)
+        )
+    request.seconds[:] = [seconds for _, seconds in done]
+    return [result for result, _ in done]
+
+
+async def _adispatch_request(request: Any) -> Any:
+    if not isinstance(request, Parallel):
+        return await _adispatch(*request)
+    done: List[Tuple[Any, float]] = list(
+        await asyncio.gather(*(_atimed(*call) for call in request.calls))
+    )
+    request.seconds[:] = [seconds for _, seconds in done]
+    return [result for result, _ in done]
+
+
+def _with_budget(update: Dict[str, Any]) -> Dict[str, Any]:
+    budget: Optional[RequestBudget] = current_budget()
+    return update if budget is None else {**update, "budget": budget.snapshot()}
+
+
+# A refused LLM call is thrown into the body, which may catch BudgetExceeded
+# and finish with a partial answer; a body that doesn't becomes a no-op.
+def _run(steps: NodeSteps) -> Dict[str, Any]:
+    try:
+        request: Any = next(steps)
+        while True:
+            try:
+                result: Any = _dispatch_request(request)
+            except BudgetExceeded as exc:
+                request = steps.throw(exc)
+                continue
+            request = steps.send(result)
+    except StopIteration as done:
+        return _with_budget(done.value)
+    except BudgetExceeded as exc:
+        log.debug("%s, node skipped", exc)
+        return _with_budget({})
+
+
+async def _arun(steps: NodeSteps) -> Dict[str, Any]:
+    try:
+        request: Any = next(steps)
+        while True:
+            try:
+                result: Any = await _adispatch_request(request)
+            except BudgetExceeded as exc:
+                request = steps.throw(exc)
+                continue
+            request = steps.send(result)
+    except StopIteration as done:
+        return _with_budget(done.value)
+    except BudgetExceeded as exc:
+        log.debug("%s, node skipped", exc)
+        return _with_budget({})
+
+
+def partial_answer(state: AgentState, exc: BudgetExceeded) -> str:
+    """What the request produced before its budget ran out, without the LLM."""
+    mode: str = str(state.get("mode") or "quick")
+    body: str
+    if mode == "research":
+        body = report_view(list(state.get("research_notes") or [])).strip()
+    elif mode == "action":
+        body = "\n".join(state.get("action_results") or [])
+    else:
+        messages: List[BaseMessage] = _msgs(state)
+        current: Optional[BaseMessage] = last_user_message(messages)
+        turn: List[BaseMessage] = messages[messages.index(current) + 1:] if current else []
+        answers: List[str] = [
+            str(m.content) for m in turn
+            if isinstance(m, (AIMessage, ToolMessage)) and str(m.content).strip()
+        ]
+        body = answers[-1] if answers else ""
+    note_text: str = f"(Stopped early: the {exc.limit} budget for this request ran out.)"
+    return f"{note_text}\n\n{body}" if body else f"{note_text} Nothing was completed before that."
+
+
 def _msgs(state: AgentState) -> List[BaseMessage]:
     return list(state["messages"])
 
 
-def router_node(state: AgentState) -> Dict[str, Any]:
+def _request(state: AgentState) -> str:
+    """The user message that started the current turn."""
+    last: Optional[BaseMessage] = last_user_message(_msgs(state))
+    return str(last.content) if last is not None else ""
+
+
+def _context_steps(state: AgentState) -> NodeSteps:
     messages: List[BaseMessage] = _msgs(state)
-    last_content: str = str(messages[-1].content).lower()
-    if "explain" in last_content and "me" not in last_content:
-        return {"mode": "explain"}
-    print(f"DEBUG router: {len(messages)} message(s)")
-    structured_llm: Any = llm.with_structured_output(RoutingOutput)
-    response: Any = safe_invoke(
+    cut: int = fold_point(messages)
+    if cut == 0:
+        return {}
+    folded: List[BaseMessage] = messages[:cut]
+    prompt: str = SUMMARY_PROMPT.format(
+        summary=str(state.get("context_summary") or "(none)"),
+        transcript=transcript(folded),
+    )
+    response: Any = yield (get_llm(), [HumanMessage(content=prompt)])
+    log.debug("folded %d message(s) into the summary", len(folded))
+    return {
+        "context_summary": str(response.content),
+        "messages": [RemoveMessage(id=m.id) for m in folded if m.id],
+    }
+
+
+def context_node(state: AgentState) -> Dict[str, Any]:
+    return _run(_context_steps(state))
+
+
+async def acontext_node(state: AgentState) -> Dict[str, Any]:
+    return await _arun(_context_steps(state))
+
+
+# ── Speculative planning ────────────────────────────────────────────────
+_speculation_lock = threading.Lock()
+_speculation: Dict[str, float] = {
+    "attempts": 0, "hits": 0, "wasted": 0, "failed": 0,
+    "saved_seconds": 0.0, "wasted_tokens": 0,
+}
+
+
+def _record_speculation(outcome: str, seconds: List[float], planner_input: Any) -> None:
+    with _speculation_lock:
+        _speculation["attempts"] += 1
+        _speculation[outcome] += 1
+        if outcome == "hits":
+            # Run serially the two calls take sum(seconds); together, max(seconds).
+            _speculation["saved_seconds"] += sum(seconds) - max(seconds)
+        elif outcome == "wasted":
+            _speculation["wasted_tokens"] += estimate_tokens(planner_input)
+
+
+def speculation_stats() -> Dict[str, Any]:
+    with _speculation_lock:
+        c: Dict[str, float] = dict(_speculation)
+    attempts: float = c["attempts"]
+    return {
+        **c,
+        "enabled": SPECULATIVE_PLANNING,
+        "min_score": SPECULATE_MIN_SCORE,
+        "hit_rate": c["hits"] / attempts if attempts else None,
+        "waste_rate": c["wasted"] / attempts if attempts else None,
+    }
+
+
+def _router_steps(state: AgentState) -> NodeSteps:
+    messages: List[BaseMessage] = context_for(state, "router")
+    last_content: str = str(messages[-1].content) if messages else ""
+    classifier: IntentClassifier = get_classifier()
+    local: IntentDecision = classifier.classify(last_content)
+    if local.confident:
+        return _route(local.mode)
+    if local.contextual:
+        # The reply means nothing on its own: let Gemini see the recent turns.
+        messages = context_for(state, "router_contextual")
+    log.debug("router: local guess %s (%.2f)", local.mode, local.confidence)
+    structured_llm: Any = structured(RoutingOutput)
+    route_call: Tuple[Any, Any] = (
         structured_llm, [SystemMessage(content=ROUTER_PROMPT), *messages]
     )
+    speculate: bool = (
+        SPECULATIVE_PLANNING
+        and classifier.scores(last_content).get("research", 0.0) >= SPECULATE_MIN_SCORE
+    )
+    if not speculate:
+        try:
+            response: Any = yield route_call
+        except BudgetExceeded:
+            return _route(local.mode)
+        return _route_update(classifier, last_content, local, response)
+
+    plan_call: Tuple[Any, Any] = _planner_call(state)
+    batch = Parallel([route_call, plan_call], [])
+    response, plan_response = yield batch
+    if isinstance(response, BudgetExceeded):
+        return _route(local.mode)
+    if isinstance(response, Exception):
+        raise response
+    update: Dict[str, Any] = _route_update(classifier, last_content, local, response)
+    if isinstance(plan_response, Exception):
+        _record_speculation("failed", batch.seconds, plan_call[1])
+    elif update["mode"] == "research":
+        _record_speculation("hits", batch.seconds, plan_call[1])
+        update = {**update, "speculated": True, **_plan_update(plan_response)}
+    else:
+        _record_speculation("wasted", batch.seconds, plan_call[1])
+    return update
+
+
+def _route_update(
+    classifier: IntentClassifier, text: str, local: IntentDecision, response: Any
+) -> Dict[str, Any]:
     print(f"DEBUG router response: {response}")
     if response is None:
-        return {"mode": "quick"}
-    return {"mode": response.mode}
+        return _route("quick")
+    classifier.record_llm_decision(text, local, str(response.mode))
+    return _route(str(response.mode))
 
 
-def planner_node(state: AgentState) -> Dict[str, Any]:
-    messages: List[BaseMessage] = _msgs(state)
-    structured_llm: Any = llm.with_structured_output(PlanningOutput)
-    response: Any = safe_invoke(
-        structured_llm, [SystemMessage(content=PLANNER_PROMPT), *messages]
+def _route(mode: str) -> Dict[str, Any]:
+    return {"mode": mode, "speculated": False, "review_count": 0}
+
+
+def _apply_mode(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Give the request the budget defaults of the mode it was routed to."""
+    budget: Optional[RequestBudget] = current_budget()
+    if budget is None or not update.get("mode"):
+        return update
+    budget.set_mode(str(update["mode"]))
+    return {**update, "budget": budget.snapshot()}
+
+
+def router_node(state: AgentState) -> Dict[str, Any]:
+    return _apply_mode(_run(_router_steps(state)))
+
+
+async def arouter_node(state: AgentState) -> Dict[str, Any]:
+    return _apply_mode(await _arun(_router_steps(state)))
+
+
+def plan_deps(steps: List[PlanStep]) -> List[List[int]]:
+    # Only backward references survive, so the dependency graph is always a DAG.
+    return [
+        sorted({d for d in step.depends_on if 0 <= d < i})
+        for i, step in enumerate(steps)
+    ]
+
+
+def _planner_call(state: AgentState) -> Tuple[Any, Any]:
+    messages: List[BaseMessage] = context_for(state, "planner")
+    return (
+        structured(ResearchPlanOutput),
+        [SystemMessage(content=render(PLANNER_PROMPT)), *messages],
     )
-    return {"plan": response.steps, "current_step": 0, "research_notes": ""}
 
 
-def executor_node(state: AgentState) -> Dict[str, Any]:
+def _planner_steps(state: AgentState) -> NodeSteps:
+    try:
+        response: Any = yield _planner_call(state)
+    except BudgetExceeded:
+        response = None  # an empty plan goes straight to the reporter
+    return _plan_update(response)
+
+
+def _plan_update(response: Any) -> Dict[str, Any]:
+    steps: List[PlanStep] = list(response.steps) if response else []
+    return {
+        "plan": [step.task for step in steps],
+        "plan_deps": plan_deps(steps),
+        "step_results": None,
+        "current_step": 0,
+        "research_notes": None,
+    }
+
+
+def planner_node(state: AgentState) -> Dict[str, Any]:
+    return _run(_planner_steps(state))
+
+
+async def aplanner_node(state: AgentState) -> Dict[str, Any]:
+    return await _arun(_planner_steps(state))
+
+
+class StepTask(TypedDict):
+    messages: List[BaseMessage]
+    step_index: int
+    step: str
+    notes: str
+
+
+def ready_steps(state: AgentState) -> List[int]:
+    """Indices of plan steps not yet run whose dependencies have all finished."""
     plan: List[str] = list(state.get("plan") or [])
-    current_step: int = int(state.get("current_step") or 0)
-    notes: str = str(state.get("research_notes") or "")
-    step_instruction: str = plan[current_step]
-    llm_executor: Any = llm.bind_tools(TOOLS)
-    prompt: str = EXECUTOR_PROMPT.format(step=step_instruction, notes=notes)
-    response: Any = safe_invoke(
-        llm_executor, [*_msgs(state), HumanMessage(content=prompt)]
+    deps: List[List[int]] = list(state.get("plan_deps") or [])
+    done: Dict[int, StepResult] = dict(state.get("step_results") or {})
+    return [
+        i for i in range(len(plan))
+        if i not in done
+        and all(d in done for d in (deps[i] if i < len(deps) else []))
+    ]
+
+
+def step_task(state: AgentState, index: int) -> StepTask:
+    """Build the private input of one parallel executor from the shared state."""
+    deps: List[List[int]] = list(state.get("plan_deps") or [])
+    step: str = list(state.get("plan") or [])[index]
+    notes: str = notes_for_step(
+        list(state.get("research_notes") or []),
+        step,
+        deps[index] if index < len(deps) else [],
     )
-    return {"messages": [response]}
+    return {
+        "messages": context_for(state, "executor"),
+        "step_index": index,
+        "step": step,
+        "notes": notes,
+    }
+
+
+def _executor_steps(task: StepTask) -> NodeSteps:
+    llm_executor: Any = with_tools(TOOLS)
+    tools_by_name: Dict[str, Any] = {t.name: t for t in TOOLS}
+    prompt: str = EXECUTOR_PROMPT.format(step=task["step"], notes=task["notes"])
+    messages: List[BaseMessage] = [*task["messages"], HumanMessage(content=prompt)]
+    index: int = task["step_index"]
+    pending: List[Dict[str, Any]] = []
+    records: List[NoteRecord] = []
+    response: Any = None
+    for _ in range(MAX_STEP_TOOL_ROUNDS):
+        try:
+            response = yield (llm_executor, messages)
+        except BudgetExceeded:
+            break  # keep what the step gathered so far
+        messages.append(response)
+        tool_calls: List[Dict[str, Any]] = list(getattr(response, "tool_calls", None) or [])
+        if not tool_calls:
+            break
+        for call in tool_calls:
+            if call["name"] in APPROVAL_TOOLS:
+                # Sensitive writes are deferred until every step has finished
+                # and then go through human_approval as one batch.
+                pending.append(dict(call))
+                messages.append(ToolMessage(
+                    content=f"{call['name']} queued for human approval.",
+                    tool_call_id=call["id"],
+                ))
+            elif call["name"] in tools_by_name:
+                result: Any = yield (tools_by_name[call["name"]], {**call, "type": "tool_call"})
+                messages.append(result)
+                args: str = ", ".join(str(v) for v in (call.get("args") or {}).values())
+                records.append(note(index, f"{call['name']}: {args}"[:120], str(result.content)))
+            else:
+                messages.append(ToolMessage(
+                    content=f"Unknown tool: {call['name']}", tool_call_id=call["id"]
+                ))
+    text: str = str(response.content) if response is not None else ""
+    if text.strip():
+        records.append(note(index, ANSWER, text))
+    return {
+        "step_results": {index: {"pending_calls": pending}},
+        "research_notes": records,
+    }
+
+
+def executor_node(task: StepTask) -> Dict[str, Any]:
+    return _run(_executor_steps(task))
+
+
+async def aexecutor_node(task: StepTask) -> Dict[str, Any]:
+    return await _arun(_executor_steps(task))
 
 
 def executor_logic(state: AgentState) -> Dict[str, Any]:
-    last_msg: BaseMessage = _msgs(state)[-1]
-    current: int = int(state.get("current_step") or 0)
-    notes: str = str(state.get("research_notes") or "")
-    new_notes: str = notes + f"\n\nStep {current + 1} Result:\n{str(last_msg.content)}"
-    return {"research_notes": new_notes, "current_step": current + 1}
+    """Track progress once a wave completes and batch any deferred approvals."""
+    plan: List[str] = list(state.get("plan") or [])
+    done: Dict[int, StepResult] = dict(state.get("step_results") or {})
+    update: Dict[str, Any] = {"current_step": len(done)}
+    if len(done) >= len(plan):
+        pending: List[Dict[str, Any]] = [
+            call for index in sorted(done) for call in done[index]["pending_calls"]
+        ]
+        if pending:
+            update["messages"] = [AIMessage(content="", tool_calls=pending)]
+    return update
+
+
+def _reporter_steps(state: AgentState) -> NodeSteps:
+    notes: str = report_view(list(state.get("research_notes") or []))
+    original_request: str = _request(state)
+    prompt: str = render(REPORTER_PROMPT, notes=notes, request=original_request)
+    try:
+        response: Any = yield (get_llm(), [HumanMessage(content=prompt)])
+    except BudgetExceeded as exc:
+        response = AIMessage(content=partial_answer(state, exc))
+    return {"messages": [response]}
 
 
 def reporter_node(state: AgentState) -> Dict[str, Any]:
-    notes: str = str(state.get("research_notes") or "")
-    original_request: str = str(_msgs(state)[0].content)
-    prompt: str = REPORTER_PROMPT.format(notes=notes, request=original_request)
-    response: Any = safe_invoke(llm, [HumanMessage(content=prompt)])
+    return _run(_reporter_steps(state))
+
+
+async def areporter_node(state: AgentState) -> Dict[str, Any]:
+    return await _arun(_reporter_steps(state))
+
+
+def _chat_steps(state: AgentState) -> NodeSteps:
+    view: List[BaseMessage] = context_for(state, "chat")
+    current: Optional[BaseMessage] = last_user_message(view)
+    split: int = view.index(current) if current is not None else len(view)
+    prompt: str = render(CHAT_PROMPT, input=_request(state))
+    llm_quick: Any = with_tools(TOOLS)
+    # Earlier turns (summary first), then the prompt in place of the user
+    # message, then this turn's tool calls and results.
+    try:
+        response: Any = yield (
+            llm_quick, [*view[:split], HumanMessage(content=prompt), *view[split + 1:]]
+        )
+    except BudgetExceeded as exc:
+        response = AIMessage(content=partial_answer(state, exc))
     return {"messages": [response]}
 
 
 def chat_node(state: AgentState) -> Dict[str, Any]:
+    return _run(_chat_steps(state))
+
+
+async def achat_node(state: AgentState) -> Dict[str, Any]:
+    return await _arun(_chat_steps(state))
+
+
+def _turn_tool_outputs(messages: List[BaseMessage]) -> List[str]:
+    current: Optional[BaseMessage] = last_user_message(messages)
+    start: int = messages.index(current) + 1 if current is not None else 0
+    return [str(m.content) for m in messages[start:] if isinstance(m, ToolMessage)]
+
+
+def _validator_steps(state: AgentState) -> NodeSteps:
     messages: List[BaseMessage] = _msgs(state)
-    last_user_msg: str = str(messages[-1].content)
-    prompt: str = CHAT_PROMPT.format(input=last_user_msg)
-    llm_quick: Any = llm.bind_tools(TOOLS)
-    response: Any = safe_invoke(
-        llm_quick, [HumanMessage(content=prompt), *messages[:-1]]
-    )
-    return {"messages": [response]}
+    last_content: str = str(messages[-1].content)
+    retries: int = int(state.get("review_count") or 0)
+    stats: ReviewStats = get_review_stats()
+    if retries >= REVIEW_MAX_RETRIES:
+        # Another failure could not be acted on, so don't pay for the review.
+        stats.record("capped")
+        return {}
+
+    decision: ReviewDecision = local_review(last_content, _turn_tool_outputs(messages))
+    if decision.verdict == "pass":
+        stats.record("local_pass", decision.reason)
+        return {}
+    if decision.verdict == "fail":
+        stats.record("local_fail", decision.reason, retry=True)
+        feedback: str = decision.feedback
+    else:
+        structured_llm: Any = structured(ReviewOutput)
+        response: Any = yield (
+            structured_llm,
+            [SystemMessage(content=REVIEWER_PROMPT.format(answer=last_content))],
+        )
+        if response is None or str(response.status) != "fail":
+            stats.record("llm_pass")
+            return {}
+        stats.record("llm_fail", retry=True)
+        feedback = str(response.feedback)
+    return {
+        "review_count": retries + 1,
+        "messages": [HumanMessage(content=f"Reviewer Feedback: {feedback}")],
+    }
 
 
 def validator_node(state: AgentState) -> Dict[str, Any]:
-    last_content: str = str(_msgs(state)[-1].content)
-    structured_llm: Any = llm.with_structured_output(ReviewOutput)
-    response: Any = safe_invoke(
-        structured_llm,
-        [SystemMessage(content=REVIEWER_PROMPT.format(answer=last_content))],
-    )
-    review_count: int = int(state.get("review_count") or 0) + 1
-    if response is not None and str(response.status) == "fail":
-        return {
-            "review_count": review_count,
-            "messages": [HumanMessage(content=f"Reviewer Feedback: {response.feedback}")],
-        }
-    return {"review_count": review_count}
+    return _run(_validator_steps(state))
 
 
-def explain_node(state: AgentState) -> Dict[str, Any]:
-    response: Any = safe_invoke(llm, [SystemMessage(content=EXPLAIN_PROMPT)])
+async def avalidator_node(state: AgentState) -> Dict[str, Any]:
+    return await _arun(_validator_steps(state))
+
+
+def _explain_steps(state: AgentState) -> NodeSteps:
+    try:
+        response: Any = yield (get_llm(), [SystemMessage(content=EXPLAIN_PROMPT)])
+    except BudgetExceeded as exc:
+        response = AIMessage(content=partial_answer(state, exc))
     return {"messages": [response]}
 
 
+def explain_node(state: AgentState) -> Dict[str, Any]:
+    return _run(_explain_steps(state))
+
+
+async def aexplain_node(state: AgentState) -> Dict[str, Any]:
+    return await _arun(_explain_steps(state))
+
+
 def human_approval_node(state: AgentState) -> None:
     return None
 
 
+def _action_planner_steps(state: AgentState) -> NodeSteps:
+    messages: List[BaseMessage] = context_for(state, "action_planner")
+    structured_llm: Any = structured(ActionPlanOutput)
+    steps: List[PlanStep]
+    try:
+        response: Any = yield (
+            structured_llm, [SystemMessage(content=ACTION_PLANNER_PROMPT), *messages]
+        )
+        steps = (
+            list(response.steps) if response and response.steps
+            else [PlanStep(task="Execute the requested action")]
+        )
+    except BudgetExceeded:
+        steps = []  # nothing runs; the action reporter says so
+    deps: List[List[int]] = (
+        plan_deps(steps) if ACTION_PARALLEL else [[i - 1] if i else [] for i in range(len(steps))]
+    )
+    log.debug("action plan: %s deps=%s", [s.task for s in steps], deps)
+    return {
+        "plan": [step.task for step in steps],
+        "plan_deps": deps,
+        "step_results": None,
+        "action_outputs": None,
+        "current_step": 0,
+        "action_results": [],
+    }
+
+
 def action_planner_node(state: AgentState) -> Dict[str, Any]:
-    messages: List[BaseMessage] = _msgs(state)
-    structured_llm: Any = llm.with_structured_output(PlanningOutput)
-    response: Any = safe_invoke(
-        structured_llm, [SystemMessage(content=ACTION_PLANNER_PROMPT), *messages]
+    return _run(_action_planner_steps(state))
+
+
+async def aaction_planner_node(state: AgentState) -> Dict[str, Any]:
+    return await _arun(_action_planner_steps(state))
+
+
+class ActionTask(TypedDict):
+    messages: List[BaseMessage]
+    step_index: int
+    step: str
+    request: str
+    completed: str
+
+
+def action_task(state: AgentState, index: int) -> ActionTask:
+    """Private input of one action worker; it sees only the steps it depends on."""
+    deps: List[List[int]] = list(state.get("plan_deps") or [])
+    outputs: Dict[int, str] = dict(state.get("action_outputs") or {})
+    completed: str = "\n".join(
+        f"Step {d + 1}: {outputs[d]}" for d in (deps[index] if index < len(deps) else [])
     )
-    steps: List[str] = response.steps if response else ["Execute the requested action"]
-    print(f"DEBUG action plan: {steps}")
-    return {"plan": steps, "current_step": 0, "action_results": []}
+    return {
+        "messages": context_for(state, "action_executor"),
+        "step_index": index,
+        "step": list(state.get("plan") or [])[index],
+        "request": _request(state),
+        "completed": completed,
+    }
 
 
-def action_executor_node(state: AgentState) -> Dict[str, Any]:
-    plan: List[str] = list(state.get("plan") or [])
-    current_step: int = int(state.get("current_step") or 0)
-    raw_results: Optional[List[str]] = state.get("action_results")
-    results: List[str] = list(raw_results) if raw_results else []
-    original_request: str = str(_msgs(state)[0].content)
-    step_instruction: str = plan[current_step]
-    results_text: str = "\n".join(results) if results else "None yet"
+def _action_executor_steps(task: ActionTask) -> NodeSteps:
     prompt: str = ACTION_EXECUTOR_PROMPT.format(
-        step=step_instruction, results=results_text, request=original_request
-    )
-    llm_action: Any = llm.bind_tools(ZAPIER_TOOLS)
-    response: Any = safe_invoke(
-        llm_action, [SystemMessage(content=prompt), *_msgs(state)]
+        step=task["step"], results=task["completed"] or "None", request=task["request"]
     )
-    return {"messages": [response]}
+    llm_action: Any = with_tools(ZAPIER_TOOLS)
+    tools_by_name: Dict[str, Any] = {t.name: t for t in ZAPIER_TOOLS}
+    messages: List[BaseMessage] = [SystemMessage(content=prompt), *task["messages"]]
+    outputs: List[str] = []
+    response: Any = None
+    for _ in range(MAX_STEP_TOOL_ROUNDS):
+        try:
+            response = yield (llm_action, messages)
+        except BudgetExceeded:
+            break  # keep what the step gathered so far
+        messages.append(response)
+        tool_calls: List[Dict[str, Any]] = list(getattr(response, "tool_calls", None) or [])
+        if not tool_calls:
+            break
+        for call in tool_calls:
+            if call["name"] not in tools_by_name:
+                messages.append(ToolMessage(
+                    content=f"Unknown tool: {call['name']}", tool_call_id=call["id"]
+                ))
+                continue
+            result: Any = yield (tools_by_name[call["name"]], {**call, "type": "tool_call"})
+            messages.append(result)
+            if call["name"] == "zapier_execute":
+                outputs.append(str(result.content))
+        # A connections check alone is not the step's action; let the model act on it.
+        if outputs:
+            break
+    text: str = "\n".join(outputs) or (str(response.content) if response is not None else "")
+    index: int = task["step_index"]
+    return {
+        "step_results": {index: {"pending_calls": []}},
+        "action_outputs": {index: text},
+    }
+
+
+def action_executor_node(task: ActionTask) -> Dict[str, Any]:
+    return _run(_action_executor_steps(task))
+
+
+async def aaction_executor_node(task: ActionTask) -> Dict[str, Any]:
+    return await _arun(_action_executor_steps(task))
 
 
 def action_step_manager(state: AgentState) -> Dict[str, Any]:
-    last_msg: BaseMessage = _msgs(state)[-1]
-    current_step: int = int(state.get("current_step") or 0)
-    raw_results: Optional[List[str]] = state.get("action_results")
-    results: List[str] = list(raw_results) if raw_results else []
-    results.append(f"Step {current_step + 1}: {str(last_msg.content)}")
-    return {"action_results": results, "current_step": current_step + 1}
+    """Collect finished action steps into action_results in plan order."""
+    outputs: Dict[int, str] = dict(state.get("action_outputs") or {})
+    return {
+        "action_results": [f"Step {i + 1}: {outputs[i]}" for i in sorted(outputs)],
+        "current_step": len(outputs),
+    }
 
 
-def action_reporter_node(state: AgentState) -> Dict[str, Any]:
+def _action_reporter_steps(state: AgentState) -> NodeSteps:
     raw_results: Optional[List[str]] = state.get("action_results")
     results: List[str] = list(raw_results) if raw_results else []
-    original_request: str = str(_msgs(state)[0].content)
+    original_request: str = _request(state)
     results_text: str = "\n".join(results) if results else "No actions were completed."
     prompt: str = ACTION_REPORTER_PROMPT.format(
         request=original_request, results=results_text
     )
-    response: Any = safe_invoke(llm, [HumanMessage(content=prompt)])
-    return {"messages": [response]}
\ No newline at end of file
+    try:
+        response: Any = yield (get_llm(), [HumanMessage(content=prompt)])
+    except BudgetExceeded as exc:
+        response = AIMessage(content=partial_answer(state, exc))
+    return {"messages": [response]}
+
+
+def action_reporter_node(state: AgentState) -> Dict[str, Any]:
+    return _run(_action_reporter_steps(state))
+
+
+async def aaction_reporter_node(state: AgentState) -> Dict[str, Any]:
+    return await _arun(_action_reporter_steps(state))
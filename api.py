@@ -4,18 +4,51 @@ from __future__ import annotations
 from dotenv import load_dotenv  # type: ignore[import-untyped]
 load_dotenv()
 
-from fastapi import FastAPI  # type: ignore[import-untyped]
-from fastapi.responses import StreamingResponse  # type: ignore[import-untyped]
+from fastapi import FastAPI, Request  # type: ignore[import-untyped]
+from fastapi.responses import Response, StreamingResponse  # type: ignore[import-untyped]
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore[import-untyped]
 from pydantic import BaseModel  # type: ignore[import-untyped]
-from typing import Any, Dict, List, Optional, AsyncGenerator
-from langchain_core.messages import HumanMessage  # type: ignore[import-untyped]
-from langgraph.checkpoint.memory import MemorySaver  # type: ignore[import-untyped]
+import os
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, AsyncGenerator, AsyncIterator
+from langchain_core.messages import AIMessageChunk, HumanMessage  # type: ignore[import-untyped]
+from checkpoint_store import create_checkpointer, store_size, thread_leases, worker_count
+from events import NDJSON, Framing, coalesce, encode_update, message_text, negotiate
+from budget import budget_stats, start_budget
+from cassette import get_cassette
+from agent import speculation_stats
 from graph import create_graph
+from intent import get_classifier
+from llm_cache import get_response_cache
+from rate_limit import get_rate_limiter
+from review import get_review_stats
+from metrics import (
+    ACTIVE_STREAMS,
+    CHECKPOINT_BYTES,
+    CHECKPOINT_THREADS,
+    CONTENT_TYPE,
+    on_scrape,
+    render_metrics,
+)
+from notes_index import get_notes_index
+from tools import search_cache
+from zapier_client import get_zapier_client
 import uvicorn  # type: ignore[import-untyped]
-import json
 
-app: Any = FastAPI()
+@asynccontextmanager
+async def lifespan(_app: Any) -> AsyncIterator[None]:
+    yield
+    await get_zapier_client().aclose()
+    if hasattr(memory, "close"):
+        memory.close()
+    tape: Any = get_cassette()
+    if tape is not None:
+        tape.close()
+
+
+app: Any = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,19 +58,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-memory: Any = MemorySaver()
+# In-process MemorySaver by default; CHECKPOINTER=sqlite makes threads durable
+# and shares them between the workers started by serve.py.
+memory: Any = create_checkpointer()
 agent_app: Any = create_graph(checkpointer=memory)
+leases: Any = thread_leases(memory)
+
+
+def _checkpoint_gauges() -> None:
+    size: Dict[str, int] = store_size(memory)
+    CHECKPOINT_BYTES.set(size["bytes"])
+    CHECKPOINT_THREADS.set(size["threads"])
+
+
+on_scrape(_checkpoint_gauges)
+
+
+# Nodes whose LLM output is forwarded token by token when `stream_tokens` is set.
+TOKEN_STREAM_NODES = frozenset({"chat_node", "reporter", "explain_node", "action_reporter"})
+
+
+class BudgetRequest(BaseModel):  # type: ignore[misc]
+    """Per-request limits; unset fields use the defaults of the routed mode."""
+    seconds: Optional[float] = None
+    llm_calls: Optional[int] = None
+    tokens: Optional[int] = None
+    tool_calls: Optional[int] = None
 
 
 class ChatRequest(BaseModel):  # type: ignore[misc]
     message: str
     thread_id: str = "default_thread"
     mode: Optional[str] = None
+    stream_tokens: bool = False
+    budget: Optional[BudgetRequest] = None
 
 
 class ApprovalRequest(BaseModel):  # type: ignore[misc]
     thread_id: str
     approved: bool
+    stream_tokens: bool = False
 
 
 @app.get("/")  # type: ignore[misc]
@@ -46,184 +106,252 @@ def read_root() -> Dict[str, str]:
 
 
 def process_event(event: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Convert LangGraph stream events to frontend-friendly JSON."""
-    events_out: List[Dict[str, Any]] = []
-
-    for node, value in event.items():
-        if str(node).startswith("__"):
+    """Convert LangGraph stream events to frontend-friendly JSON.
+
+    Each node's encoder is registered with the node in `create_graph`."""
+    return encode_update(event)
+
+
+def process_token(chunk: Any, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Convert a `messages` stream item to a delta event, or None to drop it."""
+    node_str: str = str(metadata.get("langgraph_node", ""))
+    if node_str not in TOKEN_STREAM_NODES or not isinstance(chunk, AIMessageChunk):
+        return None
+    delta: str = message_text(chunk.content)
+    if not delta:
+        return None
+    return {"node": node_str, "data": {"delta": delta}}
+
+
+async def _graph_events(
+    graph_input: Any, config: Dict[str, Any], stream_tokens: bool
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    if not stream_tokens:
+        async for event in agent_app.astream(graph_input, config=config):
+            processed: List[Dict[str, Any]] = process_event(event)
+            if processed:
+                yield processed
+        return
+
+    async for kind, payload in agent_app.astream(
+        graph_input, config=config, stream_mode=["updates", "messages"]
+    ):
+        if kind == "messages":
+            token_event: Optional[Dict[str, Any]] = process_token(*payload)
+            if token_event:
+                yield [token_event]
             continue
+        processed = process_event(payload)
+        if processed:
+            yield processed
+
+
+async def stream_graph(
+    graph_input: Any,
+    config: Dict[str, Any],
+    stream_tokens: bool = False,
+    budget: Optional[BudgetRequest] = None,
+    mode: Optional[str] = None,
+    framing: Framing = NDJSON,
+    resume_budget: Optional[Dict[str, Any]] = None,
+) -> AsyncGenerator[bytes, None]:
+    """Run the graph and yield framed records: node-completion events, plus
+    token deltas from TOKEN_STREAM_NODES when `stream_tokens` is set. Events
+    that are ready together share a record. The run gets its own request
+    budget, or carries on with `resume_budget` saved by a paused run; nodes
+    and tools charge it through the context."""
+    start_budget(budget.model_dump(exclude_none=True) if budget else None, mode, resume_budget)
+    ACTIVE_STREAMS.inc()
+    try:
+        async for events in coalesce(_graph_events(graph_input, config, stream_tokens)):
+            yield framing.encode({"events": events})
+    finally:
+        ACTIVE_STREAMS.dec()
 
-        data: Dict[str, Any] = {}
-        node_str: str = str(node)
 
-        if node_str == "router":
-            data["mode"] = value.get("mode")
+async def flush_checkpoints() -> None:
+    """Persist buffered checkpoints so a paused thread survives a restart."""
+    if hasattr(memory, "aflush"):
+        await memory.aflush()
 
-        elif node_str == "planner":
-            data["plan"] = value.get("plan", [])
 
-        elif node_str == "executor":
-            msgs: List[Any] = value.get("messages", [])
-            if msgs:
-                last: Any = msgs[-1]
-                tool_calls: Any = getattr(last, "tool_calls", None)
-                if tool_calls:
-                    data["tool"] = str(tool_calls[0]["name"])
-                    data["reasoning"] = f"Using tool: {tool_calls[0]['name']}"
-                else:
-                    data["output"] = str(last.content)
-
-        elif node_str == "step_manager":
-            data["status"] = "step_completed"
-
-        elif node_str == "reporter":
-            msgs = value.get("messages", [])
-            if msgs:
-                data["final_response"] = str(msgs[-1].content)
-
-        elif node_str == "chat_node":
-            msgs = value.get("messages", [])
-            if msgs:
-                data["response"] = str(msgs[-1].content)
-
-        elif node_str == "validator":
-            msgs = value.get("messages", [])
-            if msgs:
-                data["feedback"] = str(msgs[0].content)
-                data["status"] = "failed"
-            else:
-                data["status"] = "passed"
-
-        elif node_str == "human_approval":
-            data["status"] = "awaiting_approval"
-            data["message"] = "Agent wants to save notes. Approve or reject."
-
-        elif node_str == "explain_node":
-            msgs = value.get("messages", [])
-            if msgs:
-                content: str = str(msgs[-1].content)
-                data["explanation"] = content
-                data["response"] = content
-
-        elif node_str == "tools":
-            data["status"] = "tool_executed"
-
-        elif node_str == "action_planner":
-            data["action_plan"] = value.get("plan", [])
-            data["mode"] = "action"
-
-        elif node_str == "action_executor":
-            msgs = value.get("messages", [])
-            if msgs:
-                last = msgs[-1]
-                tool_calls = getattr(last, "tool_calls", None)
-                if tool_calls:
-                    args: Dict[str, Any] = tool_calls[0].get("args", {})
-                    data["zapier_action"] = str(args.get("action", "?"))
-                    data["status"] = "executing"
-                else:
-                    data["output"] = str(last.content)
+# ── Thread leases ───────────────────────────────────────────────────────
+# One request at a time may run a thread, on whichever worker it landed.
+# The lease is renewed while the run lasts, so a crashed worker frees its
+# threads after THREAD_LEASE_TTL seconds. If a renewal finds the lease taken
+# over, the run stops at its next record with an error.
+THREAD_LEASE_TTL: float = float(os.getenv("THREAD_LEASE_TTL", "30"))
+THREAD_LEASE_WAIT: float = float(os.getenv("THREAD_LEASE_WAIT", "10"))
 
-        elif node_str == "action_tools":
-            msgs = value.get("messages", [])
-            if msgs:
-                data["tool_result"] = str(msgs[-1].content)
-                data["status"] = "action_executed"
 
-        elif node_str == "action_step_manager":
-            data["status"] = "step_completed"
-            data["current_step"] = value.get("current_step", 0)
+class ThreadBusy(RuntimeError):
+    """Another request is still running the thread."""
 
-        elif node_str == "action_reporter":
-            msgs = value.get("messages", [])
-            if msgs:
-                final: str = str(msgs[-1].content)
-                data["final_response"] = final
-                data["response"] = final
-                data["status"] = "action_complete"
 
-        events_out.append({"node": node_str, "data": data})
+class ThreadLease:
+    def __init__(self, thread_id: str) -> None:
+        self.thread_id = thread_id
+        self.lost = False
 
-    return events_out
+    def check(self) -> None:
+        if self.lost:
+            raise ThreadBusy(f"Thread {self.thread_id} was taken over by another request.")
 
 
-@app.post("/chat")  # type: ignore[misc]
-async def chat_endpoint(req: ChatRequest) -> StreamingResponse:
-    async def event_generator() -> AsyncGenerator[str, None]:
-        config: Dict[str, Any] = {"configurable": {"thread_id": req.thread_id}}
+@asynccontextmanager
+async def hold_thread(thread_id: str) -> AsyncIterator[ThreadLease]:
+    owner: str = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    deadline: float = asyncio.get_running_loop().time() + THREAD_LEASE_WAIT
+    while not await asyncio.to_thread(leases.claim_thread, thread_id, owner, THREAD_LEASE_TTL):
+        if asyncio.get_running_loop().time() >= deadline:
+            raise ThreadBusy(f"Thread {thread_id} is busy with another request.")
+        await asyncio.sleep(0.1)
 
-        snapshot: Any = agent_app.get_state(config)
-        if snapshot.next:
-            yield json.dumps({
-                "events": [{
-                    "node": "system",
-                    "data": {
-                        "status": "paused",
-                        "message": "Agent is waiting for approval.",
-                        "next_step": list(snapshot.next)
-                    }
-                }]
-            }) + "\n"
-            return
-
-        print(f"[API] /chat thread={req.thread_id} msg={req.message[:60]}")
-        input_msg: Any = HumanMessage(content=req.message)
+    lease: ThreadLease = ThreadLease(thread_id)
 
-        try:
-            for event in agent_app.stream(
-                {"messages": [input_msg]},
-                config=config
-            ):
-                processed: List[Dict[str, Any]] = process_event(event)
-                if processed:
-                    yield json.dumps({"events": processed}) + "\n"
-
-            final_snap: Any = agent_app.get_state(config)
-            if final_snap.next:
-                yield json.dumps({
-                    "status": "paused",
-                    "events": [{
-                        "node": "human_approval",
-                        "data": {"status": "paused"}
-                    }]
-                }) + "\n"
-
-        except Exception as exc:
-            print(f"[API] Error: {exc}")
-            yield json.dumps({"status": "error", "message": str(exc)}) + "\n"
-
-    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+    async def renew() -> None:
+        while True:
+            await asyncio.sleep(THREAD_LEASE_TTL / 3)
+            try:
+                held: bool = await asyncio.to_thread(
+                    leases.claim_thread, thread_id, owner, THREAD_LEASE_TTL
+                )
+            except Exception as exc:  # e.g. the database stayed locked; retry next round
+                print(f"[API] lease renewal for {thread_id} failed: {exc}")
+                continue
+            if not held:
+                print(f"[API] lost the lease on {thread_id}")
+                lease.lost = True
+                return
+
+    renewal: asyncio.Task = asyncio.create_task(renew())
+    try:
+        yield lease
+    finally:
+        renewal.cancel()
+        # Whatever worker takes the thread next must see this run's checkpoints.
+        await flush_checkpoints()
+        await asyncio.to_thread(leases.release_thread, thread_id, owner)
 
 
-@app.post("/approve")  # type: ignore[misc]
-async def approve_endpoint(req: ApprovalRequest) -> StreamingResponse:
-    async def resume_generator() -> AsyncGenerator[str, None]:
+@app.post("/chat")  # type: ignore[misc]
+async def chat_endpoint(req: ChatRequest, request: Request) -> StreamingResponse:
+    # NDJSON, or MessagePack objects when the client's Accept header asks for them.
+    framing: Framing = negotiate(request.headers.get("accept"))
+
+    async def event_generator() -> AsyncGenerator[bytes, None]:
         config: Dict[str, Any] = {"configurable": {"thread_id": req.thread_id}}
-        snapshot: Any = agent_app.get_state(config)
+        try:
+            async with hold_thread(req.thread_id) as lease:
+                snapshot: Any = await agent_app.aget_state(config)
+                if snapshot.next:
+                    yield framing.encode({
+                        "events": [{
+                            "node": "system",
+                            "data": {
+                                "status": "paused",
+                                "message": "Agent is waiting for approval.",
+                                "next_step": list(snapshot.next)
+                            }
+                        }]
+                    })
+                    return
+
+                print(f"[API] /chat thread={req.thread_id} msg={req.message[:60]}")
+                input_msg: Any = HumanMessage(content=req.message)
+
+                try:
+                    async for line in stream_graph(
+                        {"messages": [input_msg]}, config, req.stream_tokens, req.budget, framing=framing
+                    ):
+                        lease.check()
+                        yield line
+                    await flush_checkpoints()
+
+                    final_snap: Any = await agent_app.aget_state(config)
+                    if final_snap.next:
+                        yield framing.encode({
+                            "status": "paused",
+                            "events": [{
+                                "node": "human_approval",
+                                "data": {"status": "paused"}
+                            }]
+                        })
+
+                except Exception as exc:
+                    print(f"[API] Error: {exc}")
+                    yield framing.encode({"status": "error", "message": str(exc)})
+        except ThreadBusy as exc:
+            yield framing.encode({"status": "error", "message": str(exc)})
+
+    return StreamingResponse(event_generator(), media_type=framing.media_type)
 
-        if not snapshot.next:
-            yield json.dumps({"status": "error", "message": "No pending approval."}) + "\n"
-            return
 
-        if req.approved:
-            try:
-                for event in agent_app.stream(None, config=config):
-                    processed: List[Dict[str, Any]] = process_event(event)
-                    if processed:
-                        yield json.dumps({"events": processed}) + "\n"
-            except Exception as exc:
-                yield json.dumps({"status": "error", "message": str(exc)}) + "\n"
-        else:
-            yield json.dumps({"status": "cancelled", "message": "Step rejected."}) + "\n"
+@app.post("/approve")  # type: ignore[misc]
+async def approve_endpoint(req: ApprovalRequest, request: Request) -> StreamingResponse:
+    framing: Framing = negotiate(request.headers.get("accept"))
 
-    return StreamingResponse(resume_generator(), media_type="application/x-ndjson")
+    async def resume_generator() -> AsyncGenerator[bytes, None]:
+        config: Dict[str, Any] = {"configurable": {"thread_id": req.thread_id}}
+        try:
+            async with hold_thread(req.thread_id) as lease:
+                snapshot: Any = await agent_app.aget_state(config)
+
+                if not snapshot.next:
+                    yield framing.encode({"status": "error", "message": "No pending approval."})
+                    return
+
+                if req.approved:
+                    try:
+                        async for line in stream_graph(
+                            None, config, req.stream_tokens, mode=snapshot.values.get("mode"),
+                            framing=framing, resume_budget=snapshot.values.get("budget"),
+                        ):
+                            lease.check()
+                            yield line
+                        await flush_checkpoints()
+                    except Exception as exc:
+                        yield framing.encode({"status": "error", "message": str(exc)})
+                else:
+                    yield framing.encode({"status": "cancelled", "message": "Step rejected."})
+        except ThreadBusy as exc:
+            yield framing.encode({"status": "error", "message": str(exc)})
+
+    return StreamingResponse(resume_generator(), media_type=framing.media_type)
+
+
+@app.get("/stats")  # type: ignore[misc]
+async def get_stats() -> Dict[str, Any]:
+    llm_cache: Any = get_response_cache()
+    limiter: Any = get_rate_limiter()
+    tape: Any = get_cassette()
+    return {
+        "router": get_classifier().stats(),
+        "speculative_planning": speculation_stats(),
+        "validator": get_review_stats().stats(),
+        "budget": budget_stats(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "search_cache": search_cache.stats(),
+        "notes_index": get_notes_index().stats(),
+        "zapier": get_zapier_client().stats(),
+        "rate_limiter": limiter.snapshot() if limiter else None,
+        "cassette": tape.stats() if tape else None,
+        "worker": {"pid": os.getpid(), "workers": worker_count()},
+    }
+
+
+@app.get("/metrics")  # type: ignore[misc]
+def get_metrics() -> Response:
+    # Sync handler: FastAPI runs it on a worker thread, so sizing the
+    # checkpoint store never blocks the event loop.
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
 
 
 @app.get("/state/{thread_id}")  # type: ignore[misc]
 async def get_state(thread_id: str) -> Dict[str, Any]:
     config: Dict[str, Any] = {"configurable": {"thread_id": thread_id}}
     try:
-        snapshot: Any = agent_app.get_state(config)
+        snapshot: Any = await agent_app.aget_state(config)
         return {
             "thread_id": thread_id,
             "next": list(snapshot.next) if snapshot.next else [],
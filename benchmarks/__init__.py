@@ -0,0 +1 @@
+"""Local benchmarks and stand-ins for the external services the agent calls."""
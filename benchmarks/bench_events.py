@@ -0,0 +1,148 @@
+# pyright: basic
+"""CPU cost of turning graph updates into stream records.
+
+Replays a synthetic research run (routing, plan, three step results, a long
+report streamed as token deltas, then the whole report) through the event
+encoders of events.py for `--streams` concurrent streams, and reports CPU
+time per event and bytes sent for each serializer and with and without
+coalescing. "json, per update" is how /chat framed events before
+events.py: one stdlib json.dumps line per update. Each record yields to the
+event loop once, as the ASGI send does; socket writes are not counted.
+
+    python -m benchmarks.bench_events --streams 200 [--json]
+"""
+from __future__ import annotations
+
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk  # type: ignore[import-untyped]
+
+import events
+from events import MSGPACK, NDJSON, coalesce, encode_update
+from graph import create_graph
+
+
+def _updates(report_chars: int, delta_chars: int) -> List[Tuple[str, Any]]:
+    """("updates", update) and ("delta", text) items of one research run."""
+    report: str = ("Battery storage costs fell sharply across markets. " * (report_chars // 50 + 1))[:report_chars]
+    items: List[Tuple[str, Any]] = [
+        ("updates", {"context": None}),
+        ("updates", {"router": {"mode": "research", "speculated": False}}),
+        ("updates", {"planner": {"plan": [f"Step {i}" for i in range(3)], "current_step": 0}}),
+    ]
+    for i in range(3):
+        items.append(("updates", {"executor": {
+            "step_results": {i: {"pending_calls": []}},
+            "research_notes": [
+                {"source": f"search_web: query {i}", "text": report[:1500]},
+                {"source": "answer", "text": report[:2000]},
+            ],
+        }}))
+        items.append(("updates", {"step_manager": {"current_step": i + 1}}))
+    for start in range(0, len(report), delta_chars):
+        items.append(("delta", report[start:start + delta_chars]))
+    items.append(("updates", {"reporter": {"messages": [AIMessage(content=report)]}}))
+    return items
+
+
+async def _source(items: List[Tuple[str, Any]]) -> AsyncIterator[List[Dict[str, Any]]]:
+    for kind, payload in items:
+        if kind == "delta":
+            chunk: Any = AIMessageChunk(content=payload)
+            yield [{"node": "reporter", "data": {"delta": events.message_text(chunk.content)}}]
+        else:
+            processed: List[Dict[str, Any]] = encode_update(payload)
+            if processed:
+                yield processed
+        await asyncio.sleep(0)  # other streams get the loop between updates
+
+
+def _stdlib_line(payload: Any) -> bytes:
+    return (json.dumps(payload) + "\n").encode("utf-8")
+
+
+async def _stream(
+    items: List[Tuple[str, Any]], encode: Callable[[Any], bytes], coalesced: bool
+) -> Tuple[int, int, int]:
+    records = events_out = size = 0
+    source: AsyncIterator[List[Dict[str, Any]]] = _source(items)
+    async for batch in (coalesce(source) if coalesced else source):
+        body: bytes = encode({"events": batch})
+        records += 1
+        events_out += len(batch)
+        size += len(body)
+        await asyncio.sleep(0)  # the ASGI send of each record gives up the loop
+    return records, events_out, size
+
+
+def _measure(
+    items: List[Tuple[str, Any]], streams: int, encode: Callable[[Any], bytes], coalesced: bool
+) -> Dict[str, Any]:
+    async def go() -> List[Tuple[int, int, int]]:
+        return await asyncio.gather(*(_stream(items, encode, coalesced) for _ in range(streams)))
+
+    cpu: float = time.process_time()
+    wall: float = time.perf_counter()
+    results: List[Tuple[int, int, int]] = asyncio.run(go())
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    produced: int = sum(1 for kind, payload in items if kind == "delta" or encode_update(payload)) * streams
+    records: int = sum(r[0] for r in results)
+    return {
+        "cpu_ms": round(cpu * 1000, 1),
+        "wall_ms": round(wall * 1000, 1),
+        "us_per_event": round(cpu * 1e6 / produced, 2),
+        "records": records,
+        "events_sent": sum(r[1] for r in results),
+        "kib_sent": round(sum(r[2] for r in results) / 1024, 1),
+    }
+
+
+def run(streams: int = 200, report_chars: int = 20_000, delta_chars: int = 12) -> Dict[str, Any]:
+    create_graph()  # registers the node encoders
+    items: List[Tuple[str, Any]] = _updates(report_chars, delta_chars)
+    results: Dict[str, Any] = {
+        "streams": streams, "updates_per_stream": len(items),
+        "orjson": events.orjson is not None, "msgpack": MSGPACK is not None,
+    }
+    cases: List[Tuple[str, Callable[[Any], bytes], bool]] = [
+        ("json, per update", _stdlib_line, False),
+        ("ndjson, per update", NDJSON.encode, False),
+        ("ndjson, coalesced", NDJSON.encode, True),
+    ]
+    if MSGPACK is not None:
+        cases.append(("msgpack, coalesced", MSGPACK.encode, True))
+    for name, encode, coalesced in cases:
+        results[name] = _measure(items, streams, encode, coalesced)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--report-chars", type=int, default=20_000)
+    parser.add_argument("--delta-chars", type=int, default=12, help="characters per token delta")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    results: Dict[str, Any] = run(args.streams, args.report_chars, args.delta_chars)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{args.streams} streams x {results['updates_per_stream']} updates "
+        f"(orjson {'on' if results['orjson'] else 'off'}, msgpack {'on' if results['msgpack'] else 'off'})"
+    )
+    for name, row in results.items():
+        if isinstance(row, dict):
+            print(
+                f"  {name:<20} {row['us_per_event']:>7.2f} us/event  {row['cpu_ms']:>8.1f} ms CPU  "
+                f"{row['records']:>7} records  {row['kib_sent']:>9.1f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
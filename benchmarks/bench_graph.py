@@ -0,0 +1,267 @@
+# pyright: basic
+"""End-to-end graph benchmark per mode, fully offline.
+
+Runs one scripted request per mode (quick, research, explain, action) through
+`create_graph` with the fakes from benchmarks/fakes.py standing in for
+Gemini, Tavily and the Zapier service, and reports wall time, time spent in
+each node, LLM and tool calls, and peak Python memory. Every fake backend
+waits a fixed latency, so differences between two commits come from the
+graph itself: how many calls it makes, in what order, and what overlaps.
+
+    python -m benchmarks.bench_graph --runs 5 --out before.json
+    python -m benchmarks.bench_graph --runs 5 --compare before.json
+"""
+from __future__ import annotations
+
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage  # type: ignore[import-untyped]
+from langgraph.checkpoint.memory import MemorySaver  # type: ignore[import-untyped]
+
+from benchmarks.fakes import FakeBackends, install
+from budget import start_budget
+from graph import create_graph
+from metrics import LLM_CALLS, NODE_SECONDS, TOOL_CALLS
+
+SCENARIOS: Dict[str, str] = {
+    "quick": "What is 17 * 23 + 4?",
+    "research": "Research the trends in grid battery storage costs and compare the main chemistries",
+    "explain": "How do you work?",
+    "action": "Send an email to alice about the launch and post the update in the slack channel",
+}
+
+
+def _git_commit() -> str:
+    try:
+        out: bytes = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        )
+        return out.decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def _max_rss_kib() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    ordered: List[float] = sorted(values)
+    return {
+        "mean": _ms(statistics.fmean(ordered)),
+        "p50": _ms(statistics.median(ordered)),
+        "min": _ms(ordered[0]),
+        "max": _ms(ordered[-1]),
+    }
+
+
+class _Counters:
+    """Node, LLM and tool metrics recorded between two points in time."""
+
+    def __init__(self) -> None:
+        self.nodes: Dict[Tuple[str, ...], Tuple[int, float]] = NODE_SECONDS.totals()
+        self.llm: Dict[Tuple[str, ...], float] = LLM_CALLS.values()
+        self.tools: Dict[Tuple[str, ...], float] = TOOL_CALLS.values()
+
+    def since(self, before: "_Counters") -> Dict[str, Any]:
+        nodes: Dict[str, Tuple[int, float]] = {}
+        for key, (count, total) in self.nodes.items():
+            was: Tuple[int, float] = before.nodes.get(key, (0, 0.0))
+            if count > was[0]:
+                nodes[key[0]] = (count - was[0], total - was[1])
+        llm: Dict[str, int] = {}
+        for key, value in self.llm.items():
+            node, _, outcome = key
+            if outcome != "cached" and value > before.llm.get(key, 0.0):
+                llm[node] = llm.get(node, 0) + int(value - before.llm.get(key, 0.0))
+        tools: int = int(sum(v - before.tools.get(k, 0.0) for k, v in self.tools.items()))
+        return {"nodes": nodes, "llm": llm, "tools": tools}
+
+
+def _invoke(app: Any, text: str, use_async: bool) -> Dict[str, Any]:
+    config: Dict[str, Any] = {"configurable": {"thread_id": f"bench-{uuid.uuid4().hex}"}}
+    graph_input: Dict[str, Any] = {"messages": [HumanMessage(content=text)]}
+    if not use_async:
+        start_budget()
+        return app.invoke(graph_input, config=config)
+
+    async def go() -> Dict[str, Any]:
+        start_budget()
+        return await app.ainvoke(graph_input, config=config)
+
+    return asyncio.run(go())
+
+
+def run_scenario(
+    app: Any, backends: FakeBackends, mode: str, runs: int, use_async: bool, warm: bool
+) -> Dict[str, Any]:
+    text: str = SCENARIOS[mode]
+    walls: List[float] = []
+    nodes: Dict[str, List[float]] = {}
+    llm_calls: List[int] = []
+    tool_calls: List[int] = []
+    routed: str = ""
+    for _ in range(runs):
+        if not warm:
+            backends.reset()
+        before: _Counters = _Counters()
+        started: float = time.perf_counter()
+        state: Dict[str, Any] = _invoke(app, text, use_async)
+        walls.append(time.perf_counter() - started)
+        delta: Dict[str, Any] = _Counters().since(before)
+        routed = str(state.get("mode", ""))
+        for node, (_, seconds) in delta["nodes"].items():
+            nodes.setdefault(node, []).append(seconds)
+        llm_calls.append(sum(delta["llm"].values()))
+        tool_calls.append(delta["tools"])
+
+    # Peak memory on one extra run: tracemalloc slows everything down.
+    if not warm:
+        backends.reset()
+    tracemalloc.start()
+    _invoke(app, text, use_async)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "routed_to": routed,
+        "runs": runs,
+        "wall_ms": _summary(walls),
+        "llm_calls": round(statistics.fmean(llm_calls), 2),
+        "tool_calls": round(statistics.fmean(tool_calls), 2),
+        # Time inside each node per run; parallel branches overlap, so the
+        # rows can add up to more than the wall time.
+        "node_ms": {
+            node: _ms(sum(values) / runs)
+            for node, values in sorted(nodes.items(), key=lambda kv: -sum(kv[1]))
+        },
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run(
+    modes: List[str],
+    runs: int = 5,
+    llm_latency: float = 0.05,
+    search_latency: float = 0.02,
+    zapier_latency: float = 0.01,
+    use_async: bool = True,
+    warm: bool = False,
+) -> Dict[str, Any]:
+    backends: FakeBackends = install(
+        llm_latency=llm_latency,
+        search_latency=search_latency,
+        zapier_latency=zapier_latency,
+        response_cache=warm,
+    )
+    results: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "runs": runs, "async": use_async, "warm": warm,
+            "llm_latency_s": llm_latency, "search_latency_s": search_latency,
+            "zapier_latency_s": zapier_latency,
+        },
+        "scenarios": {},
+    }
+    try:
+        app: Any = create_graph(checkpointer=MemorySaver())
+        _invoke(app, "hello", use_async)  # import and compile costs stay out of the numbers
+        for mode in modes:
+            results["scenarios"][mode] = run_scenario(app, backends, mode, runs, use_async, warm)
+    finally:
+        backends.close()
+    results["max_rss_kib"] = _max_rss_kib()
+    return results
+
+
+def _delta(new: float, old: float) -> str:
+    if not old:
+        return f"{new:g}"
+    return f"{new:g} ({(new - old) / old * 100:+.1f}%)"
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"{results['commit']} vs {baseline.get('commit', '?')}")
+    rows: List[Tuple[str, Callable[[Dict[str, Any]], float]]] = [
+        ("wall p50 ms", lambda r: r["wall_ms"]["p50"]),
+        ("llm calls", lambda r: r["llm_calls"]),
+        ("tool calls", lambda r: r["tool_calls"]),
+        ("peak KiB", lambda r: r["peak_kib"]),
+    ]
+    for mode, row in results["scenarios"].items():
+        old: Optional[Dict[str, Any]] = baseline.get("scenarios", {}).get(mode)
+        print(f"  {mode}")
+        for label, pick in rows:
+            print(f"    {label:<12} {_delta(pick(row), pick(old)) if old else pick(row)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modes", default=",".join(SCENARIOS), help="comma-separated subset")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--zapier-latency", type=float, default=0.01)
+    parser.add_argument("--sync", action="store_true", help="use invoke instead of ainvoke")
+    parser.add_argument("--warm", action="store_true", help="keep search, connection and LLM caches")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--out", help="also write the JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    modes: List[str] = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown: List[str] = [m for m in modes if m not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+    results: Dict[str, Any] = run(
+        modes, args.runs, args.llm_latency, args.search_latency, args.zapier_latency,
+        use_async=not args.sync, warm=args.warm,
+    )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+        return
+    config: Dict[str, Any] = results["config"]
+    print(
+        f"{results['commit']}: {config['runs']} run(s) per mode, "
+        f"{'async' if config['async'] else 'sync'}, LLM {config['llm_latency_s'] * 1000:g} ms"
+    )
+    for mode, row in results["scenarios"].items():
+        wall: Dict[str, float] = row["wall_ms"]
+        print(
+            f"  {mode:<9} -> {row['routed_to']:<9} {wall['p50']:>8.1f} ms p50  "
+            f"{row['llm_calls']:>5g} LLM  {row['tool_calls']:>4g} tools  {row['peak_kib']:>8.1f} KiB peak"
+        )
+        for node, ms in row["node_ms"].items():
+            print(f"      {node:<20} {ms:>8.1f} ms")
+    print(f"  max RSS {results['max_rss_kib']} KiB")
+
+
+if __name__ == "__main__":
+    main()
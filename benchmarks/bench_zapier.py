@@ -0,0 +1,109 @@
+# pyright: basic
+"""Zapier tool latency: one-shot `requests` calls vs the pooled client.
+
+Each "action" is what action mode does per step: list connections, then
+dispatch. Runs against the local stand-in, so numbers reflect connection
+handling and caching rather than Zapier itself.
+
+    python -m benchmarks.bench_zapier --actions 50 --latency 0.005 [--json]
+"""
+from __future__ import annotations
+
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Callable, Dict, List
+
+import requests
+
+from benchmarks.zapier_standin import StandinServer, start
+from zapier_client import ZapierClient
+
+
+def _unpooled(url: str) -> None:
+    requests.get(f"{url}/connections", timeout=10).json()
+    requests.post(
+        f"{url}/actions/dispatch", json={"action": "slack-message", "params": {}}, timeout=30
+    ).json()
+
+
+def _measure(server: StandinServer, actions: int, run: Callable[[], None]) -> Dict[str, Any]:
+    server.reset_counts()
+    started: float = time.perf_counter()
+    run()
+    elapsed: float = time.perf_counter() - started
+    return {
+        "total_ms": round(elapsed * 1000, 1),
+        "per_action_ms": round(elapsed * 1000 / actions, 2),
+        "tcp_connections": server.tcp_connections,
+        "http_requests": server.requests,
+    }
+
+
+def run(actions: int = 50, latency: float = 0.005) -> Dict[str, Any]:
+    server: StandinServer = start(latency=latency)
+    results: Dict[str, Any] = {"actions": actions, "latency_s": latency}
+    try:
+        results["requests_unpooled"] = _measure(
+            server, actions, lambda: [_unpooled(server.url) for _ in range(actions)]
+        )
+
+        client = ZapierClient(server.url)
+
+        def pooled() -> None:
+            for _ in range(actions):
+                client.connections()
+                client.dispatch("slack-message", {})
+
+        results["pooled_sync"] = _measure(server, actions, pooled)
+
+        aclient = ZapierClient(server.url)
+
+        async def sequential() -> None:
+            for _ in range(actions):
+                await aclient.aconnections()
+                await aclient.adispatch("slack-message", {})
+            await aclient.aclose()
+
+        results["pooled_async"] = _measure(server, actions, lambda: asyncio.run(sequential()))
+
+        gclient = ZapierClient(server.url)
+
+        async def concurrent() -> None:
+            async def one() -> None:
+                await gclient.aconnections()
+                await gclient.adispatch("slack-message", {})
+            await asyncio.gather(*(one() for _ in range(actions)))
+            await gclient.aclose()
+
+        results["pooled_async_concurrent"] = _measure(
+            server, actions, lambda: asyncio.run(concurrent())
+        )
+        client.close()
+    finally:
+        server.shutdown()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--actions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005, help="stand-in seconds per request")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    results: Dict[str, Any] = run(args.actions, args.latency)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.actions} actions, {args.latency * 1000:g} ms stand-in latency")
+    for name, row in results.items():
+        if isinstance(row, dict):
+            print(
+                f"  {name:<26} {row['total_ms']:>9.1f} ms  {row['per_action_ms']:>7.2f} ms/action"
+                f"  {row['tcp_connections']:>4} conns  {row['http_requests']:>4} requests"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# pyright: basic
+"""Deterministic offline stand-ins for Gemini, Tavily and the Zapier service.
+
+`FakeChatModel` is a real LangChain chat model, so `bind_tools`,
+`with_structured_output` (through LangChain's own tool-calling parser),
+callbacks and token streaming behave as they do with Gemini. Its replies
+are scripted from the request: structured schemas get fixed plans, routes
+and reviews; a model with tools bound calls one tool per turn and then
+answers. Every call sleeps for `latency` seconds.
+
+    from benchmarks.fakes import install
+    backends = install(llm_latency=0.05)   # agent, tools and Zapier now offline
+    ...
+    backends.close()
+"""
+from __future__ import annotations
+
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel  # type: ignore[import-untyped]
+from langchain_core.messages import (  # type: ignore[import-untyped]
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # type: ignore[import-untyped]
+from langchain_core.utils.function_calling import convert_to_openai_tool  # type: ignore[import-untyped]
+from pydantic import PrivateAttr  # type: ignore[import-untyped]
+
+from benchmarks.zapier_standin import StandinServer, start
+
+_WORDS: List[str] = (
+    "the agent gathers sources compares findings and reports measured results "
+    "with clear evidence across markets models benchmarks costs risks and trends"
+).split()
+_STEP_RE = re.compile(r"^Current Step: (.+)$", re.MULTILINE)
+_SAVE_RE = re.compile(r"\bsave\b", re.IGNORECASE)
+_EXPRESSION_RE = re.compile(r"\d+(?:\.\d+)?\s*[-+*/^]\s*\d+(?:\.\d+)?(?:\s*[-+*/^]\s*\d+(?:\.\d+)?)*")
+
+
+def _text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+def _sentence(seed: str, words: int) -> str:
+    """`words` pseudo-random but reproducible words derived from `seed`."""
+    digest: bytes = hashlib.sha256(seed.encode("utf-8")).digest()
+    picked: List[str] = [_WORDS[digest[i % len(digest)] % len(_WORDS)] for i in range(words)]
+    return " ".join(picked).capitalize() + "."
+
+
+def _route(text: str) -> str:
+    low: str = text.lower()
+    if re.search(r"\b(email|slack|calendar|schedule|send|notify)\b", low):
+        return "action"
+    if re.search(r"\b(how do you work|your architecture|who are you)\b", low):
+        return "explain"
+    if re.search(r"\b(research|analy[sz]e|compare|report|trends?)\b", low):
+        return "research"
+    return "quick"
+
+
+class FakeChatModel(BaseChatModel):  # type: ignore[misc]
+    model: str = "fake-chat"
+    latency: float = 0.05
+    answer_words: int = 60
+    # Text answers stream word by word (as Gemini's do under stream_mode
+    # "messages"); tool calls and structured output arrive whole.
+    disable_streaming: Any = "tool_calling"
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _calls: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    # ── LangChain interface ─────────────────────────────────────────────
+    def bind_tools(self, tools: Sequence[Any], tool_choice: Optional[str] = None, **kwargs: Any) -> Any:
+        return self.bind(
+            tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice, **kwargs
+        )
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Any = None, **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages, kwargs)
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Any = None, **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages, kwargs)
+
+    def _chunks(self, result: ChatResult) -> List[ChatGenerationChunk]:
+        message: Any = result.generations[0].message
+        words: List[str] = _text(message).split(" ")
+        chunks: List[ChatGenerationChunk] = [
+            ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            for i, word in enumerate(words)
+        ]
+        chunks[-1].message.usage_metadata = message.usage_metadata
+        return chunks
+
+    def _stream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Any = None, **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for chunk in self._chunks(self._generate(messages, stop, **kwargs)):
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Any = None, **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self._chunks(await self._agenerate(messages, stop, **kwargs)):
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    # ── Bookkeeping ─────────────────────────────────────────────────────
+    def calls(self) -> Dict[str, int]:
+        """Calls served so far, by kind (structured schema, tool_call or text)."""
+        with self._lock:
+            return dict(self._calls)
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self._calls[kind] = self._calls.get(kind, 0) + 1
+
+    # ── Scripted replies ────────────────────────────────────────────────
+    def _result(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> ChatResult:
+        message: AIMessage = self.respond(messages, kwargs.get("tools") or [], kwargs.get("tool_choice"))
+        prompt_chars: int = sum(len(_text(m)) for m in messages)
+        output_chars: int = len(_text(message)) + len(json.dumps([c["args"] for c in message.tool_calls]))
+        message.usage_metadata = {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": output_chars // 4,
+            "total_tokens": prompt_chars // 4 + output_chars // 4,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def respond(self, messages: List[BaseMessage], tools: List[Dict[str, Any]], tool_choice: Any) -> AIMessage:
+        """The reply to `messages`; override to script other conversations."""
+        names: List[str] = [t["function"]["name"] for t in tools]
+        humans: List[int] = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        seed: str = "\n".join(_text(m) for m in messages)
+
+        if tool_choice == "any" and len(names) == 1:
+            self._count(names[0])
+            return self._call(names[0], self.structured(names[0], messages), seed)
+
+        # Executor prompts name their step; quick mode answers the user's message.
+        step: Any = _STEP_RE.search(seed)
+        request: str = step.group(1) if step else (_text(messages[humans[-1]]) if humans else "")
+        turn: List[BaseMessage] = messages[(humans[-1] if humans else 0):]
+        done: int = sum(isinstance(m, ToolMessage) for m in turn)
+        user: str = next(
+            (_text(messages[i]) for i in reversed(humans) if not _STEP_RE.search(_text(messages[i]))), ""
+        )
+        call: Optional[Dict[str, Any]] = self.tool_call(names, request, done, user) if names else None
+        if call is not None:
+            self._count("tool_call")
+            return self._call(call["name"], call["args"], seed)
+
+        self._count("text")
+        return AIMessage(content=_sentence(seed, self.answer_words))
+
+    def structured(self, schema: str, messages: List[BaseMessage]) -> Dict[str, Any]:
+        user: str = next((_text(m) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        if schema == "RoutingOutput":
+            return {"mode": _route(_text(messages[-1]))}
+        if schema == "ResearchPlanOutput":
+            topic: str = " ".join(user.split()[:8])
+            return {"steps": [
+                {"task": f"Find background on {topic}", "depends_on": []},
+                {"task": f"Find recent figures on {topic}", "depends_on": []},
+                {"task": f"Compare the findings on {topic}", "depends_on": [0, 1]},
+            ]}
+        if schema == "ActionPlanOutput":
+            steps: List[Dict[str, Any]] = []
+            if "email" in user.lower():
+                steps.append({"task": "Send the email", "depends_on": []})
+            if "slack" in user.lower() or "#" in user or not steps:
+                steps.append({"task": "Post the Slack message", "depends_on": []})
+            return {"steps": steps}
+        if schema == "ReviewOutput":
+            return {"status": "pass", "feedback": "Accurate and complete."}
+        raise ValueError(f"FakeChatModel has no script for schema {schema}")
+
+    def tool_call(self, names: List[str], request: str, done: int, user: str = "") -> Optional[Dict[str, Any]]:
+        """The next tool call for a step, or None to answer; `done` calls already ran.
+
+        A research request that mentions saving queues save_to_notes in its
+        comparison step, so the run pauses for human approval."""
+        if "zapier_execute" in names and "search_web" not in names:
+            # Action steps check the connected apps once, then act.
+            if done == 0 and "list_zapier_connections" in names:
+                return {"name": "list_zapier_connections", "args": {}}
+            if done > 1:
+                return None
+            if "email" in request.lower():
+                params: Dict[str, str] = {"to": "alice@example.com", "subject": "Update", "body": "Hi"}
+                return {"name": "zapier_execute", "args": {"action": "send-email", "params": json.dumps(params)}}
+            params = {"channel": "#general", "message": "Update"}
+            return {"name": "zapier_execute", "args": {"action": "slack-message", "params": json.dumps(params)}}
+        if done == 1 and "save_to_notes" in names and _SAVE_RE.search(user) and request.startswith("Compare"):
+            return {"name": "save_to_notes", "args": {"content": _sentence(request, 30), "topic": "benchmark"}}
+        if done:
+            return None
+        expression: Any = _EXPRESSION_RE.search(request)
+        if expression and "calculate" in names:
+            return {"name": "calculate", "args": {"expression": expression.group(0)}}
+        if "search_web" in names:
+            return {"name": "search_web", "args": {"query": " ".join(request.split()[:12])}}
+        return None
+
+    def _call(self, name: str, args: Dict[str, Any], seed: str) -> AIMessage:
+        call_id: str = "call_" + hashlib.sha1(f"{seed}{name}".encode("utf-8")).hexdigest()[:12]
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+class FakeTavilyClient:
+    """`TavilyClient.search` with canned results and a fixed latency."""
+
+    def __init__(self, latency: float = 0.02, results: int = 5) -> None:
+        self.latency = latency
+        self.results = results
+        self.searches = 0
+
+    def _payload(self, query: str, max_results: int) -> Dict[str, Any]:
+        self.searches += 1
+        slug: str = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:40]
+        return {
+            "query": query,
+            "results": [
+                {
+                    "url": f"https://example.com/{slug}/{i}",
+                    "title": f"{query} ({i})",
+                    "content": _sentence(f"{query}/{i}", 40),
+                }
+                for i in range(min(max_results, self.results))
+            ],
+        }
+
+    def search(self, query: str, max_results: int = 5, **kwargs: Any) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._payload(query, max_results)
+
+
+class AsyncFakeTavilyClient(FakeTavilyClient):
+    async def search(self, query: str, max_results: int = 5, **kwargs: Any) -> Dict[str, Any]:  # type: ignore[override]
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._payload(query, max_results)
+
+
+@dataclass
+class FakeBackends:
+    llm: FakeChatModel
+    search: FakeTavilyClient
+    asearch: AsyncFakeTavilyClient
+    zapier: StandinServer
+
+    def reset(self) -> None:
+        """Forget call counts and the shared caches between scenario runs."""
+        from tools import search_cache
+        from zapier_client import get_zapier_client
+
+        self.llm.reset_calls()
+        self.search.searches = self.asearch.searches = 0
+        self.zapier.reset_counts()
+        search_cache.invalidate()
+        get_zapier_client().connections_cache.invalidate()
+
+    def close(self) -> None:
+        from zapier_client import get_zapier_client
+
+        get_zapier_client().close()
+        self.zapier.shutdown()
+        self.zapier.server_close()
+
+
+def install(
+    llm_latency: float = 0.05,
+    search_latency: float = 0.02,
+    zapier_latency: float = 0.01,
+    response_cache: bool = False,
+) -> FakeBackends:
+    """Point the agent, the search tools and the Zapier client at the fakes.
+
+    The Gemini rate limiter is switched off (there is no quota to protect) and
+    so is the LLM response cache unless `response_cache` is set, since the
+    scripted replies would otherwise be served from it after the first run.
+    """
+    import agent
+    import tools
+    from llm_cache import set_response_cache
+    from rate_limit import set_rate_limiter
+    from zapier_client import ZapierClient, set_zapier_client
+
+    llm = FakeChatModel(latency=llm_latency)
+    search, asearch = FakeTavilyClient(search_latency), AsyncFakeTavilyClient(search_latency)
+    server: StandinServer = start(latency=zapier_latency)
+    agent.set_llm(llm)
+    tools.set_tavily(search, asearch)
+    set_zapier_client(ZapierClient(server.url))
+    set_rate_limiter(None)
+    if not response_cache:
+        set_response_cache(None)
+    return FakeBackends(llm, search, asearch, server)
@@ -0,0 +1,431 @@
+# pyright: basic
+"""Concurrent load test of the /chat NDJSON stream, offline.
+
+Opens `--concurrency` conversations at a time against the FastAPI app until
+`--requests` have finished. Each conversation posts one /chat message drawn
+from the mode mix; research requests that ask to save their findings pause
+for approval and are resumed with /approve. Gemini, Tavily and Zapier are
+the fakes from benchmarks/fakes.py, so the numbers show what the API and the
+graph can sustain rather than what the upstream quotas allow.
+
+Targets:
+  asgi  drive the ASGI app directly in this process (default); the client
+        shares the event loop with the server
+  http  serve the app with uvicorn on a local port and stream over HTTP
+  --url an already running server; its backends are its own business
+
+    python -m benchmarks.load_chat --concurrency 20 --requests 200
+    python -m benchmarks.load_chat --target http --mix quick=3,research=1 --approve 0.5
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx  # type: ignore[import-untyped]
+
+from benchmarks.fakes import FakeBackends, install
+
+MESSAGES: Dict[str, str] = {
+    "quick": "What is {a} * {b} + 4?",
+    "research": "Research the trends in grid battery storage costs in region {a}",
+    "explain": "How do you work?",
+    "action": "Send an email to alice about launch {a} and post the update in the slack channel",
+}
+SAVE_SUFFIX: str = " and save the findings to my notes"
+# Keys that carry the answer the user is waiting for.
+FINAL_KEYS: Tuple[str, ...] = ("final_response", "response", "explanation")
+
+
+class LoadError(Exception):
+    pass
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'quick=3,research=1' -> {'quick': 3.0, 'research': 1.0}"""
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        mode, _, weight = part.partition("=")
+        mode = mode.strip()
+        if mode not in MESSAGES:
+            raise ValueError(f"unknown mode {mode!r}; expected one of {tuple(MESSAGES)}")
+        mix[mode] = float(weight or 1)
+    return mix
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered: List[float] = sorted(values)
+
+    def rank(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50": rank(0.5), "p90": rank(0.9), "p99": rank(0.99), "max": rank(1.0)}
+
+
+# ── Transports ──────────────────────────────────────────────────────────
+class AsgiTransport:
+    """POSTs straight into the ASGI app and yields body chunks as they are sent.
+
+    (httpx's ASGITransport buffers the whole body, which hides streaming.)
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def stream(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[bytes]:
+        body: bytes = json.dumps(payload).encode("utf-8")
+        messages: asyncio.Queue = asyncio.Queue()
+        finished: asyncio.Event = asyncio.Event()
+        delivered: bool = False
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            await messages.put(message)
+
+        scope: Dict[str, Any] = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "root_path": "",
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 0), "server": ("loadtest", 80),
+        }
+
+        async def call() -> None:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                await messages.put(None)
+
+        task: asyncio.Task = asyncio.create_task(call())
+        try:
+            while True:
+                message: Optional[Dict[str, Any]] = await messages.get()
+                if message is None:
+                    break
+                if message["type"] == "http.response.start" and message["status"] != 200:
+                    raise LoadError(f"HTTP {message['status']}")
+                if message["type"] == "http.response.body":
+                    if message.get("body"):
+                        yield message["body"]
+                    if not message.get("more_body"):
+                        break
+        finally:
+            finished.set()
+            await task
+
+    async def close(self) -> None:
+        return None
+
+
+class HttpTransport:
+    def __init__(self, base_url: str, connections: int) -> None:
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        self.client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None)
+
+    async def stream(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[bytes]:
+        async with self.client.stream("POST", path, json=payload) as response:
+            if response.status_code != 200:
+                raise LoadError(f"HTTP {response.status_code}")
+            async for chunk in response.aiter_bytes():
+                yield chunk
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def serve(app: Any) -> Tuple[str, Any]:
+    """Start uvicorn on a free local port in a background thread."""
+    import uvicorn  # type: ignore[import-untyped]
+
+    server: Any = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port: int = server.servers[0].sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}", server
+
+
+# ── Conversations ───────────────────────────────────────────────────────
+@dataclass
+class Conversation:
+    mode: str
+    approval: bool
+    ttfe: Optional[float] = None          # first NDJSON line of /chat
+    final: Optional[float] = None         # last line with an answer, incl. /approve
+    approve: Optional[float] = None       # the /approve round trip
+    events: int = 0
+    lines: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class Run:
+    conversations: List[Conversation] = field(default_factory=list)
+    active: int = 0
+    peak_active: int = 0
+
+
+async def _lines(transport: Any, path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    buffered: bytes = b""
+    async for chunk in transport.stream(path, payload):
+        buffered += chunk
+        *complete, buffered = buffered.split(b"\n")
+        for line in complete:
+            if line.strip():
+                yield json.loads(line)
+    if buffered.strip():
+        yield json.loads(buffered)
+
+
+async def _consume(
+    transport: Any, path: str, payload: Dict[str, Any], conv: Conversation, started: float
+) -> bool:
+    """Read one stream into `conv`; returns True if the run paused for approval."""
+    paused: bool = False
+    async for line in _lines(transport, path, payload):
+        now: float = time.perf_counter() - started
+        conv.lines += 1
+        if conv.ttfe is None:
+            conv.ttfe = now
+        if line.get("status") == "error":
+            raise LoadError(str(line.get("message", "error event")))
+        events: List[Dict[str, Any]] = line.get("events") or []
+        conv.events += len(events)
+        for event in events:
+            data: Dict[str, Any] = event.get("data") or {}
+            if any(data.get(key) for key in FINAL_KEYS):
+                conv.final = now
+            if data.get("status") == "paused":
+                paused = True
+    return paused
+
+
+async def converse(transport: Any, conv: Conversation, thread_id: str, stream_tokens: bool) -> None:
+    n: int = random.randint(2, 999)
+    message: str = MESSAGES[conv.mode].format(a=n, b=n + 7)
+    if conv.approval:
+        message += SAVE_SUFFIX
+    started: float = time.perf_counter()
+    try:
+        paused: bool = await _consume(
+            transport, "/chat",
+            {"message": message, "thread_id": thread_id, "stream_tokens": stream_tokens},
+            conv, started,
+        )
+        if paused:
+            asked: float = time.perf_counter()
+            await _consume(
+                transport, "/approve",
+                {"thread_id": thread_id, "approved": True, "stream_tokens": stream_tokens},
+                conv, started,
+            )
+            conv.approve = time.perf_counter() - asked
+        if conv.approval and not paused:
+            conv.error = "expected an approval pause"
+        elif conv.final is None:
+            conv.error = "no final response"
+    except Exception as exc:
+        conv.error = f"{type(exc).__name__}: {exc}"[:200]
+
+
+async def run_load(
+    transport: Any,
+    mix: Dict[str, float],
+    requests: int,
+    concurrency: int,
+    approve: float,
+    threads: int,
+    stream_tokens: bool,
+) -> Tuple[Run, float]:
+    modes: List[str] = list(mix)
+    weights: List[float] = [mix[m] for m in modes]
+    plan: List[Conversation] = []
+    for _ in range(requests):
+        mode: str = random.choices(modes, weights)[0]
+        plan.append(Conversation(mode, mode == "research" and random.random() < approve))
+
+    # A pooled thread id is leased by one conversation at a time; 0 means
+    # every conversation starts a fresh thread.
+    pool: asyncio.Queue = asyncio.Queue()
+    for i in range(threads):
+        pool.put_nowait(f"load-{i}")
+    run = Run()
+    pending: asyncio.Queue = asyncio.Queue()
+    for conv in plan:
+        pending.put_nowait(conv)
+
+    async def worker(worker_id: int) -> None:
+        serial: int = 0
+        while not pending.empty():
+            conv: Conversation = pending.get_nowait()
+            thread_id: str = await pool.get() if threads else f"load-w{worker_id}-{serial}"
+            serial += 1
+            run.active += 1
+            run.peak_active = max(run.peak_active, run.active)
+            try:
+                await converse(transport, conv, thread_id, stream_tokens)
+            finally:
+                run.active -= 1
+                if threads:
+                    pool.put_nowait(thread_id)
+            run.conversations.append(conv)
+
+    started: float = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return run, time.perf_counter() - started
+
+
+def report(run: Run, wall: float, config: Dict[str, Any]) -> Dict[str, Any]:
+    convs: List[Conversation] = run.conversations
+    ok: List[Conversation] = [c for c in convs if c.error is None]
+    errors: Dict[str, int] = {}
+    for conv in convs:
+        if conv.error is not None:
+            errors[conv.error] = errors.get(conv.error, 0) + 1
+    by_mode: Dict[str, Any] = {}
+    for mode in sorted({c.mode for c in convs}):
+        rows: List[Conversation] = [c for c in convs if c.mode == mode]
+        good: List[Conversation] = [c for c in rows if c.error is None]
+        by_mode[mode] = {
+            "requests": len(rows),
+            "errors": len(rows) - len(good),
+            "ttfe_ms": percentiles([c.ttfe for c in good if c.ttfe is not None]),
+            "final_ms": percentiles([c.final for c in good if c.final is not None]),
+        }
+    events: int = sum(c.events for c in convs)
+    approvals: List[float] = [c.approve for c in ok if c.approve is not None]
+    return {
+        "config": config,
+        "wall_s": round(wall, 3),
+        "requests": len(convs),
+        "errors": len(convs) - len(ok),
+        "error_rate": round((len(convs) - len(ok)) / len(convs), 4) if convs else 0.0,
+        "error_kinds": errors,
+        "throughput_rps": round(len(ok) / wall, 2) if wall else None,
+        "events": events,
+        "events_per_s": round(events / wall, 1) if wall else None,
+        "lines_per_s": round(sum(c.lines for c in convs) / wall, 1) if wall else None,
+        "peak_concurrent": run.peak_active,
+        "ttfe_ms": percentiles([c.ttfe for c in ok if c.ttfe is not None]),
+        "final_ms": percentiles([c.final for c in ok if c.final is not None]),
+        "approve_ms": percentiles(approvals),
+        "approvals": len(approvals),
+        "modes": by_mode,
+    }
+
+
+async def _main(args: Any, backends: Optional[FakeBackends]) -> Dict[str, Any]:
+    transport: Any
+    server: Any = None
+    if args.url:
+        transport = HttpTransport(args.url, args.concurrency * 2)
+    else:
+        from api import app
+
+        if args.target == "http":
+            url, server = serve(app)
+            transport = HttpTransport(url, args.concurrency * 2)
+        else:
+            transport = AsgiTransport(app)
+    config: Dict[str, Any] = {
+        "target": args.url or args.target, "concurrency": args.concurrency,
+        "requests": args.requests, "mix": args.mix, "approve": args.approve,
+        "threads": args.threads, "stream_tokens": args.stream_tokens,
+        "llm_latency_s": None if backends is None else args.llm_latency,
+    }
+    try:
+        run, wall = await run_load(
+            transport, parse_mix(args.mix), args.requests, args.concurrency,
+            args.approve, args.threads, args.stream_tokens,
+        )
+    finally:
+        await transport.close()
+        if server is not None:
+            server.should_exit = True
+    return report(run, wall, config)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--target", choices=("asgi", "http"), default="asgi")
+    parser.add_argument("--url", help="load an already running server instead")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--mix", default="quick=4,research=2,explain=1,action=2")
+    parser.add_argument("--approve", type=float, default=0.5,
+                        help="share of research requests that pause for /approve")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="reuse this many thread ids (0: a new thread per request)")
+    parser.add_argument("--stream-tokens", action="store_true")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--zapier-latency", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--out", help="also write the JSON results to this file")
+    args = parser.parse_args()
+    try:
+        parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    random.seed(args.seed)
+    backends: Optional[FakeBackends] = None
+    if not args.url:
+        # Approved save_to_notes calls write to ./notes; keep them out of the checkout.
+        os.chdir(tempfile.mkdtemp(prefix="load_chat-"))
+        backends = install(args.llm_latency, args.search_latency, args.zapier_latency)
+    try:
+        results: Dict[str, Any] = asyncio.run(_main(args, backends))
+    finally:
+        if backends is not None:
+            backends.close()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{results['requests']} conversations, concurrency {args.concurrency}, "
+        f"{results['wall_s']} s: {results['throughput_rps']} req/s, "
+        f"{results['events_per_s']} events/s, error rate {results['error_rate']:.2%}"
+    )
+    print(f"  {'':<9} {'n':>5} {'err':>4}   {'ttfe p50/p90/p99 ms':<24} final p50/p90/p99 ms")
+    for mode, row in [("all", results), *results["modes"].items()]:
+        t, f = row["ttfe_ms"], row["final_ms"]
+        print(
+            f"  {mode:<9} {row['requests']:>5} {row['errors']:>4}   "
+            f"{t['p50']}/{t['p90']}/{t['p99']:<14} {f['p50']}/{f['p90']}/{f['p99']}"
+        )
+    if results["approvals"]:
+        a = results["approve_ms"]
+        print(f"  /approve  {results['approvals']:>5} round trips   p50/p90/p99 {a['p50']}/{a['p90']}/{a['p99']} ms")
+    for kind, count in results["error_kinds"].items():
+        print(f"  error x{count}: {kind}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# pyright: basic
+"""Local stand-in for the Node Zapier service (zapier-service/server.js).
+
+Serves `GET /connections` and `POST /actions/dispatch` over HTTP/1.1 with
+keep-alive, after an optional artificial latency, and counts the TCP
+connections it accepts so connection reuse can be measured.
+
+    python -m benchmarks.zapier_standin --port 3001 --latency 0.05
+"""
+from __future__ import annotations
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+CONNECTIONS: Dict[str, Any] = {
+    "connections": [
+        {"app": "Gmail", "label": "work"},
+        {"app": "GoogleCalendarAPI", "label": "work"},
+        {"app": "Slack", "label": "team"},
+    ]
+}
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.tcp_connections = 0
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        super().__init__(("127.0.0.1", port), _Handler)
+
+    def get_request(self) -> Any:
+        with self._count_lock:
+            self.tcp_connections += 1
+        return super().get_request()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset_counts(self) -> None:
+        with self._count_lock:
+            self.tcp_connections = 0
+            self.requests = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40 ms to every request on a kept-alive connection.
+    disable_nagle_algorithm = True
+    server: StandinServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+        with self.server._count_lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body: bytes = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/connections":
+            self._reply(200, CONNECTIONS)
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        length: int = int(self.headers.get("Content-Length") or 0)
+        request: Dict[str, Any] = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/actions/dispatch":
+            self._reply(404, {"error": "not found"})
+        elif not request.get("action"):
+            self._reply(400, {"error": "action is required"})
+        else:
+            self._reply(200, {"message": f"{request['action']} done (stand-in)"})
+
+
+def start(port: int = 0, latency: float = 0.0) -> StandinServer:
+    """Start a stand-in on a background thread; call `.shutdown()` when done."""
+    server = StandinServer(port, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local Zapier service stand-in")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    args = parser.parse_args(argv)
+    server = StandinServer(args.port, args.latency)
+    print(f"Zapier stand-in listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
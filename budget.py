@@ -0,0 +1,218 @@
+# pyright: basic
+"""Per-request budgets: wall-clock deadline, LLM calls, tokens, tool calls.
+
+The API (or CLI) opens a `RequestBudget` for every /chat and /approve call
+with `start_budget()`. Graph nodes and tools run in copies of the caller's
+context, so they all see and charge the same meter: `safe_invoke` refuses an
+LLM call with `BudgetExceeded` and the tool wrappers answer with a short
+notice instead of running. Limits start from the request's own overrides; the
+router adds the defaults of the chosen mode (MODE_BUDGETS, or BUDGET_<MODE>
+such as `BUDGET_RESEARCH="seconds=300,llm_calls=30"`).
+
+Once an LLM call has been refused the meter stays exhausted, so the graph
+stops starting new work and finishes with what it has.
+
+The graph keeps `snapshot()` in its state, so /approve resumes a paused run
+with the same limits and what it had already used (`start_budget(resume=...)`);
+the time spent waiting for the user is not charged.
+"""
+from __future__ import annotations
+
+import os
+import time
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+LIMITS = ("seconds", "llm_calls", "tokens", "tool_calls")
+
+MODE_BUDGETS: Dict[str, Dict[str, float]] = {
+    "quick": {"seconds": 60, "llm_calls": 8, "tokens": 60_000, "tool_calls": 8},
+    "research": {"seconds": 240, "llm_calls": 24, "tokens": 250_000, "tool_calls": 24},
+    "explain": {"seconds": 60, "llm_calls": 3, "tokens": 30_000, "tool_calls": 0},
+    "action": {"seconds": 120, "llm_calls": 20, "tokens": 120_000, "tool_calls": 16},
+}
+
+
+class BudgetExceeded(RuntimeError):
+    """An LLM call was refused because `limit` of the request budget is spent."""
+
+    def __init__(self, limit: str) -> None:
+        super().__init__(f"request {limit} budget exhausted")
+        self.limit = limit
+
+
+def parse_limits(text: str) -> Dict[str, float]:
+    """'seconds=90,llm_calls=12' -> {'seconds': 90.0, 'llm_calls': 12.0}"""
+    limits: Dict[str, float] = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in LIMITS:
+            raise ValueError(f"unknown budget limit {name!r}; expected one of {LIMITS}")
+        limits[name] = float(value)
+    return limits
+
+
+for _mode in MODE_BUDGETS:
+    MODE_BUDGETS[_mode].update(parse_limits(os.getenv(f"BUDGET_{_mode.upper()}", "")))
+
+
+# ── Counters across requests (GET /stats) ──────────────────────────────
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "requests": 0, "exhausted": 0, "llm_refused": 0, "tools_refused": 0, "by_limit": {},
+}
+
+
+def _count(key: str, limit: Optional[str] = None) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+        if limit is not None:
+            _stats["by_limit"][limit] = _stats["by_limit"].get(limit, 0) + 1
+
+
+def budget_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {**_stats, "by_limit": dict(_stats["by_limit"]), "modes": MODE_BUDGETS}
+
+
+# ── Meter ───────────────────────────────────────────────────────────────
+class RequestBudget:
+    def __init__(self, overrides: Optional[Dict[str, float]] = None, mode: Optional[str] = None) -> None:
+        self.overrides: Dict[str, float] = dict(overrides or {})
+        unknown = set(self.overrides) - set(LIMITS)
+        if unknown:
+            raise ValueError(f"unknown budget limit(s): {', '.join(sorted(unknown))}")
+        self.limits: Dict[str, float] = dict(self.overrides)
+        self.started: float = time.monotonic()
+        self.used: Dict[str, int] = {"llm_calls": 0, "tokens": 0, "tool_calls": 0}
+        self.exhausted: Optional[str] = None
+        self._lock = threading.Lock()
+        if mode is not None:
+            self.set_mode(mode)
+        _count("requests")
+
+    def set_mode(self, mode: str) -> None:
+        """Apply the defaults of `mode` under the request's own overrides."""
+        with self._lock:
+            self.limits = {**MODE_BUDGETS.get(mode, {}), **self.overrides}
+
+    def restore(self, saved: Dict[str, Any]) -> None:
+        """Carry on from a `snapshot()` taken before the run paused."""
+        used: Dict[str, Any] = saved.get("used") or {}
+        with self._lock:
+            if saved.get("limits"):
+                self.limits = {**saved["limits"], **self.overrides}
+            for name in self.used:
+                self.used[name] = int(used.get(name, 0))
+            self.started = time.monotonic() - float(used.get("seconds", 0.0))
+            self.exhausted = saved.get("exhausted")
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_seconds(self) -> Optional[float]:
+        limit: Optional[float] = self.limits.get("seconds")
+        return None if limit is None else limit - self.elapsed()
+
+    def _exhaust(self, limit: str) -> BudgetExceeded:
+        if self.exhausted is None:
+            self.exhausted = limit
+            _count("exhausted", limit)
+        return BudgetExceeded(limit)
+
+    def _over(self, name: str, extra: int = 0) -> bool:
+        limit: Optional[float] = self.limits.get(name)
+        return limit is not None and self.used[name] + extra > limit
+
+    def check_deadline(self, wait: float = 0.0) -> None:
+        """Raise BudgetExceeded if the deadline has passed (or would, after `wait` s)."""
+        remaining: Optional[float] = self.remaining_seconds()
+        if remaining is not None and remaining <= wait:
+            with self._lock:
+                raise self._exhaust("seconds")
+
+    def begin_llm_call(self, estimate: int) -> None:
+        """Reserve one LLM call of about `estimate` tokens or raise BudgetExceeded."""
+        remaining: Optional[float] = self.remaining_seconds()
+        with self._lock:
+            limit: Optional[str] = self.exhausted
+            if limit is None and remaining is not None and remaining <= 0:
+                limit = "seconds"
+            elif limit is None and self._over("llm_calls", 1):
+                limit = "llm_calls"
+            elif limit is None and self._over("tokens", estimate):
+                limit = "tokens"
+            if limit is not None:
+                _count("llm_refused")
+                raise self._exhaust(limit)
+            self.used["llm_calls"] += 1
+
+    def charge_tokens(self, tokens: int) -> None:
+        with self._lock:
+            self.used["tokens"] += tokens
+
+    def begin_tool_call(self) -> Optional[str]:
+        """Count one tool call; returns the spent limit instead if it may not run."""
+        remaining: Optional[float] = self.remaining_seconds()
+        with self._lock:
+            limit: Optional[str] = None
+            if remaining is not None and remaining <= 0:
+                limit = "seconds"
+            elif self._over("tool_calls", 1):
+                limit = "tool_calls"
+            if limit is not None:
+                _count("tools_refused")
+                return limit
+            self.used["tool_calls"] += 1
+            return None
+
+    def is_exhausted(self) -> bool:
+        """True once the LLM side is spent: no new steps should be started."""
+        remaining: Optional[float] = self.remaining_seconds()
+        if self.exhausted is None and remaining is not None and remaining <= 0:
+            with self._lock:
+                self._exhaust("seconds")
+        return self.exhausted is not None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "overrides": dict(self.overrides),
+                "limits": dict(self.limits),
+                "used": {**self.used, "seconds": round(self.elapsed(), 3)},
+                "exhausted": self.exhausted,
+            }
+
+
+_current: ContextVar[Optional[RequestBudget]] = ContextVar("request_budget", default=None)
+
+
+def start_budget(
+    overrides: Optional[Dict[str, float]] = None,
+    mode: Optional[str] = None,
+    resume: Optional[Dict[str, Any]] = None,
+) -> RequestBudget:
+    """Open the budget for the request running in this context.
+
+    `resume` is the budget a paused run saved in its state; its overrides are
+    used when the request brings none of its own."""
+    if resume and not overrides:
+        overrides = resume.get("overrides")
+    budget: RequestBudget = RequestBudget(overrides, mode)
+    if resume:
+        budget.restore(resume)
+    _current.set(budget)
+    return budget
+
+
+def current_budget() -> Optional[RequestBudget]:
+    return _current.get()
+
+
+def budget_exhausted() -> bool:
+    budget: Optional[RequestBudget] = _current.get()
+    return budget is not None and budget.is_exhausted()
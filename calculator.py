@@ -0,0 +1,346 @@
+# pyright: basic
+"""Safe expression engine behind the `calculate` tool.
+
+Expressions are parsed once, checked against a whitelist of AST nodes and
+names, rewritten so list literals become NumPy arrays and every arithmetic
+operator and comparison goes through a size-checked helper, then compiled
+and kept in an LRU cache.
+
+Limits are structural rather than timer based: the expression length, the
+bit size of integers and the length of series are bounded, and powers,
+products, factorials and binomials are sized before they are computed, so
+every operation finishes quickly and a hostile input such as `9**9**9` or
+`factorial(10**6)` is rejected before any work is done. Results must be
+real: `(-8)**(1/3)` is refused rather than answered with a complex number. Series sizes
+are worked out from the operands' shapes, so an oversized array or
+broadcast is refused before it is allocated, and `range` / `linspace` may
+generate at most MAX_GENERATED values per expression in total, so many
+legal series held side by side cannot add up either.
+"""
+from __future__ import annotations
+
+import os
+import ast
+import math
+import operator
+import contextvars
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np  # type: ignore[import-untyped]
+
+MAX_EXPRESSION_CHARS: int = 1000
+MAX_INT_BITS: int = 4096
+MAX_SERIES: int = int(os.getenv("CALC_MAX_SERIES", "1000000"))
+MAX_GENERATED: int = int(os.getenv("CALC_MAX_GENERATED", str(4 * MAX_SERIES)))
+CACHE_SIZE: int = int(os.getenv("CALC_CACHE_SIZE", "256"))
+
+
+class CalculationError(ValueError):
+    pass
+
+
+# ── Size-checked operations ─────────────────────────────────────────────
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _too_large() -> CalculationError:
+    return CalculationError(f"integer result larger than {MAX_INT_BITS} bits")
+
+
+def _check(value: Any) -> Any:
+    if _is_int(value) and value.bit_length() > MAX_INT_BITS:
+        raise _too_large()
+    if isinstance(value, (complex, np.complexfloating)):
+        raise CalculationError("result is not a real number")
+    if isinstance(value, np.ndarray) and value.size > MAX_SERIES:
+        raise CalculationError(f"series longer than {MAX_SERIES} values")
+    return value
+
+
+def _limit(count: int) -> None:
+    if count > MAX_SERIES:
+        raise CalculationError(f"series longer than {MAX_SERIES} values")
+
+
+# Values generated so far by the expression being evaluated.
+_generated: contextvars.ContextVar[int] = contextvars.ContextVar("calc_generated", default=0)
+
+
+def _generate(count: int) -> None:
+    _limit(count)
+    total: int = _generated.get() + count
+    if total > MAX_GENERATED:
+        raise CalculationError(f"expression generates more than {MAX_GENERATED} values")
+    _generated.set(total)
+
+
+def _broadcast(*operands: Any) -> None:
+    """Refuse an element-wise operation whose result would be too long."""
+    if any(isinstance(o, np.ndarray) for o in operands):
+        _limit(math.prod(np.broadcast_shapes(*(np.shape(o) for o in operands))))
+
+
+def _elementwise(func: Callable[..., Any]) -> Callable[..., Any]:
+    def call(*args: Any) -> Any:
+        _broadcast(*args)
+        return func(*args)
+    call.__name__ = getattr(func, "__name__", "call")
+    return call
+
+
+def _pow(base: Any, exponent: Any) -> Any:
+    if _is_int(base) and _is_int(exponent) and exponent > 0 and abs(base) > 1:
+        if exponent * math.log2(abs(base)) > MAX_INT_BITS:
+            raise _too_large()
+    _broadcast(base, exponent)
+    try:
+        return _check(base ** exponent)
+    except OverflowError as exc:
+        raise CalculationError("result too large") from exc
+
+
+def _mul(left: Any, right: Any) -> Any:
+    if _is_int(left) and _is_int(right):
+        if left.bit_length() + right.bit_length() > MAX_INT_BITS + 1:
+            raise _too_large()
+    _broadcast(left, right)
+    return _check(left * right)
+
+
+def _array(*values: Any) -> Any:
+    _limit(sum(int(np.size(v)) for v in values))
+    return np.asarray(values, dtype=float)
+
+
+def _range(*args: Any) -> Any:
+    start, stop, step = (0, args[0], 1) if len(args) == 1 else (args + (1,))[:3]
+    if step == 0:
+        raise CalculationError("range() step must not be zero")
+    _generate(max(0, math.ceil((stop - start) / step)))
+    return np.arange(start, stop, step, dtype=float)
+
+
+def _linspace(start: Any, stop: Any, count: Any) -> Any:
+    _generate(max(0, int(count)))
+    return np.linspace(start, stop, int(count))
+
+
+# Size in bits of n!, comb(n, k) and perm(n, k), for non-negative arguments.
+# The binomial uses the lower bound (n/k)**k, which stays accurate for huge n;
+# whatever it lets through is at most a few thousand bits over the limit and
+# is caught by _check.
+def _factorial_bits(n: int) -> float:
+    return math.lgamma(n + 1) / math.log(2)
+
+
+def _comb_bits(n: int, k: int) -> float:
+    k = min(k, n - k)
+    return k * math.log2(n / k) if k > 0 else 0.0
+
+
+def _perm_bits(n: int, k: Any = None) -> float:
+    k = n if k is None else k
+    return _comb_bits(n, k) + _factorial_bits(k) if k <= n else 0.0
+
+
+def _sized(func: Callable[..., Any], bits: Callable[..., float]) -> Callable[..., Any]:
+    """`func` on integers, refused before it runs if the result would be too large."""
+    def call(*args: Any) -> Any:
+        values: List[int] = [int(a) for a in args]
+        if all(v >= 0 for v in values) and bits(*values) > MAX_INT_BITS:
+            raise _too_large()
+        return _check(func(*values))
+    call.__name__ = func.__name__
+    return call
+
+
+# ── Series helpers ──────────────────────────────────────────────────────
+def _series(args: Tuple[Any, ...]) -> Any:
+    """`f(series)` and `f(a, b, c)` both work."""
+    if len(args) == 1 and np.ndim(args[0]) > 0:
+        return np.asarray(args[0], dtype=float)
+    _limit(sum(int(np.size(a)) for a in args))
+    return np.asarray(args, dtype=float)
+
+
+def _reduce(func: Callable[..., Any]) -> Callable[..., Any]:
+    def call(*args: Any) -> Any:
+        return func(_series(args))
+    return call
+
+
+def growth(*args: Any) -> Any:
+    """Period-over-period growth rates: x[i] / x[i-1] - 1."""
+    series: Any = _series(args)
+    return series[1:] / series[:-1] - 1
+
+
+def cagr(*args: Any) -> Any:
+    """Compound annual growth rate: cagr(series) or cagr(start, end, periods)."""
+    if len(args) == 3 and np.ndim(args[0]) == 0:
+        start, end, periods = args
+    else:
+        series: Any = _series(args)
+        start, end, periods = series[0], series[-1], len(series) - 1
+    return (end / start) ** (1 / periods) - 1
+
+
+def percentile(series: Any, q: Any) -> Any:
+    _limit(int(np.size(series)) * max(1, int(np.size(q))))
+    return np.percentile(np.asarray(series, dtype=float), q)
+
+
+def _round(value: Any, digits: int = 0) -> Any:
+    if isinstance(value, np.ndarray):
+        return np.round(value, int(digits))
+    return round(value, int(digits))
+
+
+FUNCTIONS: Dict[str, Any] = {
+    # math (NumPy ufuncs, so they also apply element-wise to series)
+    "sqrt": np.sqrt, "exp": np.exp, "log10": np.log10, "log2": np.log2,
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan, "atan2": _elementwise(np.arctan2),
+    "floor": np.floor, "ceil": np.ceil, "abs": np.abs, "hypot": _elementwise(np.hypot),
+    "radians": np.radians, "degrees": np.degrees,
+    "log": _elementwise(lambda x, base=math.e: np.log(x) / np.log(base)),
+    "round": _round,
+    "factorial": _sized(math.factorial, _factorial_bits),
+    "comb": _sized(math.comb, _comb_bits),
+    "perm": _sized(math.perm, _perm_bits),
+    "gcd": math.gcd,
+    # series
+    "sum": _reduce(np.sum), "prod": _reduce(np.prod),
+    "mean": _reduce(np.mean), "avg": _reduce(np.mean), "median": _reduce(np.median),
+    "std": _reduce(np.std), "var": _reduce(np.var),
+    "min": _reduce(np.min), "max": _reduce(np.max), "len": _reduce(len),
+    "cumsum": _reduce(np.cumsum), "diff": _reduce(np.diff),
+    "percentile": percentile, "growth": growth, "cagr": cagr,
+    "range": _range, "linspace": _linspace,
+}
+CONSTANTS: Dict[str, Any] = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf}
+
+# Operators the rewritten AST calls through a helper, by helper name.
+_BINARY: Dict[type, str] = {
+    ast.Pow: "__pow", ast.Mult: "__mul", ast.Add: "__add", ast.Sub: "__sub",
+    ast.Div: "__div", ast.FloorDiv: "__floordiv", ast.Mod: "__mod",
+}
+_COMPARE: Dict[type, str] = {
+    ast.Eq: "__eq", ast.NotEq: "__ne", ast.Lt: "__lt",
+    ast.LtE: "__le", ast.Gt: "__gt", ast.GtE: "__ge",
+}
+
+# Helpers the rewritten AST calls; user expressions cannot name them.
+_HELPERS: Dict[str, Any] = {
+    "__pow": _pow, "__mul": _mul, "__array": _array,
+    "__add": _elementwise(operator.add), "__sub": _elementwise(operator.sub),
+    "__div": _elementwise(operator.truediv), "__floordiv": _elementwise(operator.floordiv),
+    "__mod": _elementwise(operator.mod),
+    "__eq": _elementwise(operator.eq), "__ne": _elementwise(operator.ne),
+    "__lt": _elementwise(operator.lt), "__le": _elementwise(operator.le),
+    "__gt": _elementwise(operator.gt), "__ge": _elementwise(operator.ge),
+}
+_NAMESPACE: Dict[str, Any] = {"__builtins__": {}, **FUNCTIONS, **CONSTANTS, **_HELPERS}
+
+_ALLOWED_NODES: Tuple[type, ...] = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp,
+    ast.Call, ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple,
+    ast.Subscript, ast.Slice,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+
+# ── Compilation ─────────────────────────────────────────────────────────
+def _call(name: str, args: Any) -> ast.Call:
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=list(args), keywords=[])
+
+
+class _Rewrite(ast.NodeTransformer):
+    def visit_BinOp(self, node: ast.BinOp) -> Any:
+        self.generic_visit(node)
+        return _call(_BINARY[type(node.op)], [node.left, node.right])
+
+    def visit_Compare(self, node: ast.Compare) -> Any:
+        # a < b < c becomes __lt(a, b) and __lt(b, c), as Python evaluates it.
+        self.generic_visit(node)
+        operands: List[Any] = [node.left, *node.comparators]
+        pairs: List[Any] = [
+            _call(_COMPARE[type(op)], [operands[i], operands[i + 1]])
+            for i, op in enumerate(node.ops)
+        ]
+        return pairs[0] if len(pairs) == 1 else ast.BoolOp(op=ast.And(), values=pairs)
+
+    def _sequence(self, node: Any) -> Any:
+        self.generic_visit(node)
+        return _call("__array", node.elts)
+
+    visit_List = _sequence
+    visit_Tuple = _sequence
+
+
+def _validate(tree: ast.AST) -> None:
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise CalculationError(f"unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (
+            not isinstance(node.value, (int, float)) or isinstance(node.value, bool)
+        ):
+            raise CalculationError(f"unsupported constant: {node.value!r}")
+        if isinstance(node, ast.Name) and node.id not in FUNCTIONS and node.id not in CONSTANTS:
+            raise CalculationError(f"unknown name: {node.id}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise CalculationError("only the built-in functions can be called")
+            if node.keywords:
+                raise CalculationError("keyword arguments are not supported")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(expression: str) -> Any:
+    """Validate and compile an expression; results are cached per string."""
+    if len(expression) > MAX_EXPRESSION_CHARS:
+        raise CalculationError(f"expression longer than {MAX_EXPRESSION_CHARS} characters")
+    try:
+        tree: ast.Expression = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as exc:
+        raise CalculationError(f"invalid syntax: {exc.msg}") from exc
+    _validate(tree)
+    rewritten: Any = ast.fix_missing_locations(_Rewrite().visit(tree))
+    return compile(rewritten, "<calculate>", "eval")
+
+
+def evaluate(expression: str) -> Any:
+    code: Any = compile_expression(expression.replace("^", "**"))
+    token: Any = _generated.set(0)
+    try:
+        with np.errstate(all="ignore"):
+            return _check(eval(code, _NAMESPACE))  # noqa: S307 - whitelisted AST
+    except CalculationError:
+        raise
+    except (ArithmeticError, ValueError, TypeError, IndexError) as exc:
+        raise CalculationError(str(exc)) from exc
+    finally:
+        _generated.reset(token)
+
+
+def format_result(value: Any) -> str:
+    if isinstance(value, np.ndarray):
+        return "[" + ", ".join(format_result(v) for v in value.tolist()) + "]"
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return f"{value:.12g}"
+    return str(value)
+
+
+def calculate_expression(expression: str) -> str:
+    return format_result(evaluate(expression))
+
+
+def cache_stats() -> Dict[str, Any]:
+    info: Any = compile_expression.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize}
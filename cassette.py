@@ -0,0 +1,269 @@
+# pyright: basic
+"""Record/replay of the agent's outside calls (CASSETTE_MODE=record|replay).
+
+In record mode every Gemini call made by `safe_invoke` and every call of the
+search and Zapier tools is appended to CASSETTE_PATH as one compact JSON
+line: thread id, kind ("llm" or "tool:<name>"), request key, measured
+latency and the response (or the error it raised). Retries are recorded
+attempt by attempt, so a slow production run with its quota errors can be
+reproduced exactly.
+
+Replay mode serves those lines back without touching the network, sleeping
+CASSETTE_LATENCY times the recorded latency (0 answers instantly). A call is
+matched on its thread and request key, then on the key from any thread, and
+finally, for prompts that changed (timestamps, ids), on the next unused
+record of the same kind in that thread. A call with no record left raises
+CassetteMiss.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import hashlib
+import importlib
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict  # type: ignore[import-untyped]
+from pydantic import BaseModel  # type: ignore[import-untyped]
+
+log = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+SUMMARY_CHARS: int = 120
+# Request keys are SHA-256 hex digests; this prefix is plenty to tell calls apart.
+KEY_CHARS: int = 16
+
+
+class CassetteMiss(RuntimeError):
+    """Replay found no recorded response for a call."""
+
+
+class RecordedError(RuntimeError):
+    """Replays an exception the call raised while it was being recorded."""
+
+
+def current_thread() -> str:
+    """thread_id of the graph run in this context ("-" outside a run)."""
+    try:
+        from langgraph.config import get_config  # type: ignore[import-untyped]
+
+        config: Dict[str, Any] = get_config()
+    except Exception:
+        return "-"
+    return str((config.get("configurable") or {}).get("thread_id", "-"))
+
+
+def tool_key(name: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    payload: str = json.dumps([name, list(args), kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ── Encoding ────────────────────────────────────────────────────────────
+def _encode(value: Any) -> Dict[str, Any]:
+    if isinstance(value, BaseMessage):
+        return {"message": message_to_dict(value)}
+    if isinstance(value, BaseModel):
+        cls: type = type(value)
+        return {"model": f"{cls.__module__}:{cls.__qualname__}", "data": value.model_dump(mode="json")}
+    return {"value": value}
+
+
+def _decode(data: Dict[str, Any]) -> Any:
+    if "message" in data:
+        message: BaseMessage = messages_from_dict([data["message"]])[0]
+        # A fresh id keeps add_messages from replacing an earlier identical reply.
+        message.id = f"replay-{uuid.uuid4()}"
+        return message
+    if "model" in data:
+        module, _, name = str(data["model"]).partition(":")
+        cls: Any = getattr(importlib.import_module(module), name)
+        return cls.model_validate(data["data"])
+    return data.get("value")
+
+
+def _summary(request: Any) -> str:
+    """A readable hint of the request: the last message of a prompt, or the tool args."""
+    if isinstance(request, list) and request:
+        request = request[-1]
+    if isinstance(request, BaseMessage):
+        request = request.content
+    return " ".join(str(request).split())[:SUMMARY_CHARS]
+
+
+# ── Cassette ────────────────────────────────────────────────────────────
+class Cassette:
+    def __init__(self, path: str, mode: str = "record", latency: float = 1.0) -> None:
+        if mode not in ("record", "replay"):
+            raise ValueError(f"cassette mode must be 'record' or 'replay', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._file: Optional[Any] = None
+        self._by_key: Dict[Tuple[str, str, str], Deque[Dict[str, Any]]] = {}
+        self._by_any: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        self._in_order: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        self.counters: Dict[str, float] = {
+            "recorded": 0, "replayed": 0, "fallbacks": 0, "misses": 0,
+            "recorded_seconds": 0.0, "replay_wait_seconds": 0.0,
+        }
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # ── Record ──────────────────────────────────────────────────────────
+    def _append(
+        self, kind: str, key: str, request: str, seconds: float,
+        value: Any = None, error: Optional[BaseException] = None,
+    ) -> None:
+        record: Dict[str, Any] = {
+            "thread": current_thread(), "kind": kind, "key": key,
+            "ms": round(seconds * 1000, 1), "request": request,
+        }
+        if error is not None:
+            record["error"] = {"type": type(error).__name__, "message": str(error)}
+        else:
+            record["response"] = _encode(value)
+        line: str = json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.counters["recorded"] += 1
+            self.counters["recorded_seconds"] += seconds
+
+    # ── Replay ──────────────────────────────────────────────────────────
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"cassette {self.path} does not exist; record one first")
+        with open(self.path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record: Dict[str, Any] = json.loads(line)
+                except ValueError:
+                    log.debug("skipping unreadable line %d of %s", number, self.path)
+                    continue
+                record["used"] = False
+                thread, kind, key = record["thread"], record["kind"], record["key"]
+                self._by_key.setdefault((thread, kind, key), deque()).append(record)
+                self._by_any.setdefault((kind, key), deque()).append(record)
+                self._in_order.setdefault((thread, kind), deque()).append(record)
+
+    def _take(self, kind: str, key: str) -> Dict[str, Any]:
+        thread: str = current_thread()
+        with self._lock:
+            for index, lookup in enumerate((
+                self._by_key.get((thread, kind, key)),
+                self._by_any.get((kind, key)),
+                self._in_order.get((thread, kind)),
+            )):
+                while lookup and lookup[0]["used"]:
+                    lookup.popleft()
+                if lookup:
+                    record: Dict[str, Any] = lookup.popleft()
+                    record["used"] = True
+                    self.counters["replayed"] += 1
+                    if index == 2:
+                        self.counters["fallbacks"] += 1
+                    return record
+            self.counters["misses"] += 1
+        raise CassetteMiss(f"no recorded {kind} response left for thread {thread} in {self.path}")
+
+    def _delay(self, record: Dict[str, Any]) -> float:
+        delay: float = float(record.get("ms", 0.0)) / 1000 * self.latency
+        with self._lock:
+            self.counters["replay_wait_seconds"] += delay
+        return delay
+
+    @staticmethod
+    def _result(record: Dict[str, Any]) -> Any:
+        error: Optional[Dict[str, str]] = record.get("error")
+        if error is not None:
+            raise RecordedError(f"{error['type']}: {error['message']}")
+        return _decode(record["response"])
+
+    # ── Calls ───────────────────────────────────────────────────────────
+    def call(self, kind: str, key: str, request: Any, fn: Callable[[], Any]) -> Any:
+        """Run `fn` and record it, or serve its recorded response."""
+        key = key[:KEY_CHARS]
+        if self.replaying:
+            record: Dict[str, Any] = self._take(kind, key)
+            delay: float = self._delay(record)
+            if delay > 0:
+                time.sleep(delay)
+            return self._result(record)
+        started: float = time.perf_counter()
+        try:
+            value: Any = fn()
+        except Exception as exc:
+            self._append(kind, key, _summary(request), time.perf_counter() - started, error=exc)
+            raise
+        self._append(kind, key, _summary(request), time.perf_counter() - started, value)
+        return value
+
+    async def acall(self, kind: str, key: str, request: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        key = key[:KEY_CHARS]
+        if self.replaying:
+            record: Dict[str, Any] = self._take(kind, key)
+            delay: float = self._delay(record)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return self._result(record)
+        started: float = time.perf_counter()
+        try:
+            value: Any = await fn()
+        except Exception as exc:
+            self._append(kind, key, _summary(request), time.perf_counter() - started, error=exc)
+            raise
+        self._append(kind, key, _summary(request), time.perf_counter() - started, value)
+        return value
+
+    def close(self) -> None:
+        with self._lock:
+            handle, self._file = self._file, None
+        if handle is not None:
+            handle.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c: Dict[str, float] = dict(self.counters)
+            left: int = sum(not r["used"] for queue in self._in_order.values() for r in queue)
+        return {"mode": self.mode, "path": self.path, "latency": self.latency, **c, "unused": left}
+
+
+def _from_env() -> Optional[Cassette]:
+    mode: str = os.getenv("CASSETTE_MODE", "off").lower()
+    if mode not in MODES:
+        raise ValueError(f"CASSETTE_MODE must be one of {MODES}, not {mode!r}")
+    if mode == "off":
+        return None
+    return Cassette(
+        os.getenv("CASSETTE_PATH", "cassette.jsonl"),
+        mode,
+        latency=float(os.getenv("CASSETTE_LATENCY", "1")),
+    )
+
+
+cassette: Optional[Cassette] = _from_env()
+
+
+def set_cassette(instance: Optional[Cassette]) -> None:
+    """Swap the process-wide cassette (or turn recording/replay off with None)."""
+    global cassette
+    cassette = instance
+
+
+def get_cassette() -> Optional[Cassette]:
+    return cassette
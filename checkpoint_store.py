@@ -0,0 +1,611 @@
+# pyright: basic
+"""Durable LangGraph checkpointer backed by SQLite.
+
+Checkpoints are written in WAL mode through a small write buffer that is
+flushed as one transaction every CHECKPOINT_FLUSH_INTERVAL seconds, before
+any read, and on close. Adding to the buffer never waits for SQLite, so
+`aput` stays cheap on the event loop while a flush is in progress. Channel
+values are stored once per channel version, so a checkpoint only adds rows
+for the channels that changed; the versions each checkpoint uses are kept
+in their own table. Every CHECKPOINT_PRUNE_INTERVAL seconds the threads
+written since the last pass are cut down to their newest CHECKPOINT_KEEP
+checkpoints and the channel versions none of those use are dropped, all in
+SQL. A background sweep drops threads idle for longer than
+CHECKPOINT_THREAD_TTL.
+
+Several API worker processes can share one database: every read sees the
+other workers' flushed checkpoints, and a `leases` table lets exactly one
+request at a time run a given thread, whichever worker it landed on. Leases
+and the size figures for /metrics use a connection and lock of their own, so
+neither queues behind a flush nor holds up get_tuple and put.
+"""
+from __future__ import annotations
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig  # type: ignore[import-untyped]
+from langgraph.checkpoint.base import (  # type: ignore[import-untyped]
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS checkpoint_versions (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, channel)
+);
+CREATE INDEX IF NOT EXISTS checkpoint_versions_blob
+    ON checkpoint_versions(thread_id, checkpoint_ns, channel, version);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_updated ON threads(updated);
+CREATE TABLE IF NOT EXISTS leases (
+    thread_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+Op = Tuple[str, Tuple[Any, ...]]
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    def __init__(
+        self,
+        path: str,
+        keep_last: int = 20,
+        thread_ttl: float = 7 * 86400.0,
+        flush_interval: float = 0.25,
+        prune_interval: float = 30.0,
+        sweep_interval: float = 3600.0,
+        serde: Optional[Any] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        self.thread_ttl = thread_ttl
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+        self.sweep_interval = sweep_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # Set first: other workers may hold the write lock while this one starts.
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lease_conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lease_conn.execute("PRAGMA busy_timeout=5000")
+        self._lease_lock = threading.Lock()
+        # _lock serializes use of the connection; _buffer_lock only guards the
+        # write buffer, so put() never waits behind a flush or a prune.
+        self._lock = threading.RLock()
+        self._buffer_lock = threading.Lock()
+        self._buffer: List[Op] = []
+        self._touched: Set[Tuple[str, str]] = set()
+        self._to_prune: Set[Tuple[str, str]] = set()
+        self._closed = threading.Event()
+        self._last_prune: float = time.time()
+        self._last_sweep: float = 0.0
+        self._index_versions()
+        self.counters: Dict[str, int] = {
+            "flushes": 0, "buffered_ops": 0, "pruned_checkpoints": 0, "expired_threads": 0,
+        }
+        self._worker = threading.Thread(target=self._background, name="checkpoint-flush", daemon=True)
+        self._worker.start()
+
+    # ── Write path (buffered) ───────────────────────────────────────────
+    def _enqueue(self, ops: List[Op], thread_id: str, checkpoint_ns: str) -> None:
+        with self._buffer_lock:
+            self._buffer.extend(ops)
+            self._touched.add((thread_id, checkpoint_ns))
+            self.counters["buffered_ops"] += len(ops)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        c: Dict[str, Any] = dict(checkpoint)
+        thread_id: str = str(config["configurable"]["thread_id"])
+        checkpoint_ns: str = str(config["configurable"].get("checkpoint_ns", ""))
+        values: Dict[str, Any] = c.pop("channel_values")
+        ops: List[Op] = []
+        for channel, version in new_versions.items():
+            type_, blob = (
+                self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            )
+            ops.append((
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, channel, str(version), type_, blob),
+            ))
+        for channel, version in c["channel_versions"].items():
+            ops.append((
+                "INSERT OR REPLACE INTO checkpoint_versions VALUES (?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], channel, str(version)),
+            ))
+        type_, blob = self.serde.dumps_typed(c)
+        meta_type, meta_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        ops.append((
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, checkpoint["id"],
+             config["configurable"].get("checkpoint_id"), type_, blob, meta_type, meta_blob),
+        ))
+        ops.append((
+            "INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time()),
+        ))
+        self._enqueue(ops, thread_id, checkpoint_ns)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id: str = str(config["configurable"]["thread_id"])
+        checkpoint_ns: str = str(config["configurable"].get("checkpoint_ns", ""))
+        checkpoint_id: str = str(config["configurable"]["checkpoint_id"])
+        ops: List[Op] = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx: int = WRITES_IDX_MAP.get(channel, idx)
+            # Regular writes are idempotent; special ones (errors, interrupts) overwrite.
+            verb: str = "INSERT OR IGNORE" if write_idx >= 0 else "INSERT OR REPLACE"
+            type_, blob = self.serde.dumps_typed(value)
+            ops.append((
+                f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx,
+                 channel, type_, blob, task_path),
+            ))
+        self._enqueue(ops, thread_id, checkpoint_ns)
+
+    def _transaction(self, ops: List[Op]) -> None:
+        # Caller must hold self._lock.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in ops:
+                self._conn.execute(sql, params)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def flush(self) -> None:
+        # Holding _lock for the write keeps a concurrent reader from reading
+        # before checkpoints swapped out by another flush are committed.
+        with self._lock:
+            with self._buffer_lock:
+                if not self._buffer:
+                    return
+                ops, self._buffer = self._buffer, []
+                touched, self._touched = self._touched, set()
+            try:
+                self._transaction(ops)
+            except BaseException:
+                with self._buffer_lock:  # keep them for the next flush
+                    self._buffer[:0] = ops
+                    self._touched |= touched
+                raise
+            self._to_prune |= touched
+            self.counters["flushes"] += 1
+
+    # ── Retention ───────────────────────────────────────────────────────
+    def _index_versions(self) -> None:
+        """Fill checkpoint_versions for checkpoints written before it existed."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM checkpoint_versions LIMIT 1").fetchone():
+                return
+            rows: List[Any] = self._conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, type, checkpoint FROM checkpoints"
+            ).fetchall()
+            self._transaction([
+                (
+                    "INSERT OR REPLACE INTO checkpoint_versions VALUES (?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, channel, str(version)),
+                )
+                for thread_id, checkpoint_ns, checkpoint_id, type_, blob in rows
+                for channel, version in self.serde.loads_typed((type_, blob))["channel_versions"].items()
+            ])
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> int:
+        # Caller must hold self._lock.
+        key: Tuple[str, str] = (thread_id, checkpoint_ns)
+        stale: List[Tuple[str, ...]] = [
+            (*key, row[0]) for row in self._conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                " ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (*key, self.keep_last),
+            )
+        ]
+        if not stale:
+            return 0
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("checkpoints", "writes", "checkpoint_versions"):
+                self._conn.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " AND checkpoint_id = ?",
+                    stale,
+                )
+            # Drop channel versions no surviving checkpoint refers to.
+            self._conn.execute(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND NOT EXISTS ("
+                " SELECT 1 FROM checkpoint_versions v WHERE v.thread_id = blobs.thread_id"
+                " AND v.checkpoint_ns = blobs.checkpoint_ns AND v.channel = blobs.channel"
+                " AND v.version = blobs.version)",
+                key,
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return len(stale)
+
+    def prune(self) -> int:
+        """Trim the threads written since the last pass; returns checkpoints removed."""
+        self.flush()
+        with self._lock:
+            touched, self._to_prune = self._to_prune, set()
+            removed: int = sum(self._prune(thread_id, ns) for thread_id, ns in touched)
+            self.counters["pruned_checkpoints"] += removed
+            self._last_prune = time.time()
+        return removed
+
+    def sweep_idle(self) -> int:
+        """Delete every thread not updated within `thread_ttl`; returns how many."""
+        self.flush()
+        cutoff: float = time.time() - self.thread_ttl
+        with self._lock:
+            idle: List[str] = [
+                row[0] for row in self._conn.execute(
+                    "SELECT thread_id FROM threads WHERE updated < ?", (cutoff,)
+                )
+            ]
+            for thread_id in idle:
+                self._delete(thread_id)
+            self.counters["expired_threads"] += len(idle)
+            self._last_sweep = time.time()
+        return len(idle)
+
+    def _background(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.time() - self._last_prune >= self.prune_interval:
+                    self.prune()
+                if time.time() - self._last_sweep >= self.sweep_interval:
+                    self.sweep_idle()
+            except Exception as exc:
+                print(f"[checkpoint] background flush failed: {exc}")
+
+    # ── Read path ───────────────────────────────────────────────────────
+    def _load_values(self, thread_id: str, checkpoint_ns: str, versions: Dict[str, Any]) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            row: Any = self._conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?"
+                " AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: Any) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, blob, meta_type, meta_blob = row
+        checkpoint: Dict[str, Any] = self.serde.loads_typed((type_, blob))
+        writes: List[Tuple[str, str, Any]] = [
+            (task_id, channel, self.serde.loads_typed((w_type, w_blob)))
+            for task_id, channel, w_type, w_blob in self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ?"
+                " AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+        ]
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_values(
+                    thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=self.serde.loads_typed((meta_type, meta_blob)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=writes,
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self.flush()
+        thread_id: str = str(config["configurable"]["thread_id"])
+        checkpoint_ns: str = str(config["configurable"].get("checkpoint_ns", ""))
+        checkpoint_id: Optional[str] = get_checkpoint_id(config)
+        columns: str = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id:
+                row: Any = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        self.flush()
+        where: List[str] = []
+        params: List[Any] = []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            where.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        sql: str = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint,"
+            " metadata_type, metadata FROM checkpoints"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + " ORDER BY checkpoint_id DESC"
+        )
+        with self._lock:
+            rows: List[Any] = self._conn.execute(sql, params).fetchall()
+            results: List[CheckpointTuple] = []
+            for thread_id, checkpoint_ns, *rest in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                item: CheckpointTuple = self._tuple(thread_id, checkpoint_ns, rest)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(item)
+        yield from results
+
+    # ── Deletion ────────────────────────────────────────────────────────
+    def _delete(self, thread_id: str) -> None:
+        for table in ("checkpoints", "checkpoint_versions", "blobs", "writes", "threads"):
+            self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.flush()
+        with self._lock:
+            self._delete(thread_id)
+
+    # ── Thread leases ───────────────────────────────────────────────────
+    def claim_thread(self, thread_id: str, owner: str, ttl: float) -> bool:
+        """Take (or renew) the lease on a thread; False while another owner holds it."""
+        now: float = time.time()
+        with self._lease_lock:
+            cursor: Any = self._lease_conn.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(thread_id) DO UPDATE"
+                " SET owner = excluded.owner, expires = excluded.expires"
+                " WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                (thread_id, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release_thread(self, thread_id: str, owner: str) -> None:
+        with self._lease_lock:
+            self._lease_conn.execute(
+                "DELETE FROM leases WHERE thread_id = ? AND owner = ?", (thread_id, owner)
+            )
+
+    # ── Async API ───────────────────────────────────────────────────────
+    # Writes only touch the in-memory buffer; reads and flushes hit SQLite
+    # and therefore run on a worker thread.
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items: List[CheckpointTuple] = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aflush(self) -> None:
+        await asyncio.to_thread(self.flush)
+
+    # ── Housekeeping ────────────────────────────────────────────────────
+    def stats(self) -> Dict[str, Any]:
+        """Threads, file size and counters; buffered writes show up after their flush."""
+        with self._lease_lock:
+            threads: int = int(self._lease_conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0])
+        size: int = sum(
+            os.path.getsize(p) for p in (self.path, f"{self.path}-wal") if os.path.exists(p)
+        )
+        return {"threads": threads, **self.counters, "bytes": size}
+
+    def close(self) -> None:
+        self._closed.set()
+        self._worker.join(timeout=2)
+        self.prune()
+        with self._lock:
+            self._conn.close()
+        with self._lease_lock:
+            self._lease_conn.close()
+
+
+class LocalLeases:
+    """Thread leases of a single process, for checkpointers that cannot hold them."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._leases: Dict[str, Tuple[str, float]] = {}
+
+    def claim_thread(self, thread_id: str, owner: str, ttl: float) -> bool:
+        now: float = time.time()
+        with self._lock:
+            held: Optional[Tuple[str, float]] = self._leases.get(thread_id)
+            if held is not None and held[0] != owner and held[1] >= now:
+                return False
+            self._leases[thread_id] = (owner, now + ttl)
+            return True
+
+    def release_thread(self, thread_id: str, owner: str) -> None:
+        with self._lock:
+            if self._leases.get(thread_id, ("", 0.0))[0] == owner:
+                del self._leases[thread_id]
+
+
+def thread_leases(saver: Any) -> Any:
+    """Lease holder for `saver`: the store itself when it is shared, else an in-process one."""
+    return saver if hasattr(saver, "claim_thread") else LocalLeases()
+
+
+def worker_count() -> int:
+    """API worker processes sharing this deployment (WORKERS, set by serve.py)."""
+    return max(1, int(os.getenv("WORKERS", "1")))
+
+
+def store_size(saver: Any) -> Dict[str, int]:
+    """Threads held and bytes used by either checkpointer (for /metrics)."""
+    if isinstance(saver, SqliteCheckpointSaver):
+        stats: Dict[str, Any] = saver.stats()
+        return {"threads": int(stats["threads"]), "bytes": int(stats["bytes"])}
+    # MemorySaver keeps (type, bytes) pairs in nested dicts and tuples. The
+    # graph may add to them meanwhile, so each dict is copied (one atomic step
+    # under the GIL) before it is walked.
+    def size(value: Any) -> int:
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if isinstance(value, dict):
+            return sum(size(v) for v in list(value.values()))
+        if isinstance(value, (tuple, list)):
+            return sum(size(v) for v in value)
+        return 0
+
+    parts: List[Any] = [getattr(saver, name, {}) for name in ("storage", "blobs", "writes")]
+    return {"threads": len(parts[0]), "bytes": sum(size(part) for part in parts)}
+
+
+def create_checkpointer() -> Any:
+    """Checkpointer selected by CHECKPOINTER: "memory" or "sqlite".
+
+    Defaults to memory for a single worker and to sqlite for several, which
+    must share their threads; memory with several workers is refused.
+    """
+    kind: str = os.getenv("CHECKPOINTER", "sqlite" if worker_count() > 1 else "memory").lower()
+    if kind != "sqlite" and worker_count() > 1:
+        raise ValueError(
+            f"CHECKPOINTER={kind} keeps threads inside one process; use sqlite with WORKERS > 1"
+        )
+    if kind == "sqlite":
+        return SqliteCheckpointSaver(
+            os.getenv("CHECKPOINT_DB", "checkpoints.db"),
+            keep_last=int(os.getenv("CHECKPOINT_KEEP", "20")),
+            thread_ttl=float(os.getenv("CHECKPOINT_THREAD_TTL", str(7 * 86400))),
+            flush_interval=float(os.getenv("CHECKPOINT_FLUSH_INTERVAL", "0.25")),
+            prune_interval=float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "30")),
+        )
+    from langgraph.checkpoint.memory import MemorySaver  # type: ignore[import-untyped]
+
+    return MemorySaver()
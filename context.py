@@ -0,0 +1,135 @@
+# pyright: basic
+"""Token-budgeted views of the conversation for each node.
+
+The `context` node folds turns that no longer fit CONTEXT_MAX_TOKENS into
+`AgentState.context_summary` and removes them from `messages`. Nodes then
+read the history through `context_for(state, node)`, which applies a
+per-node policy instead of sending the whole thread to Gemini.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import (  # type: ignore[import-untyped]
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+# History above this size is folded into the rolling summary...
+CONTEXT_MAX_TOKENS: int = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+# ...keeping at least the newest turns that fit in this many tokens.
+CONTEXT_KEEP_TOKENS: int = int(os.getenv("CONTEXT_KEEP_TOKENS", "2000"))
+# Longest tool output copied into a summary transcript.
+TRANSCRIPT_TOOL_CHARS: int = 500
+
+# node -> (policy, token budget for the recent window)
+POLICIES: Dict[str, tuple] = {
+    "router": ("last_user", 0),
+    # Replies like "yes" or "the second one" are routed with recent turns.
+    "router_contextual": ("window", 1000),
+    "planner": ("window", 1500),
+    "executor": ("window", 1500),
+    "chat": ("window", 3000),
+    "action_planner": ("current_turn", 2000),
+    "action_executor": ("current_turn", 3000),
+}
+
+FEEDBACK_PREFIX: str = "Reviewer Feedback:"
+
+
+def count_tokens(message: Any) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    content: Any = getattr(message, "content", message)
+    size: int = len(content) if isinstance(content, str) else len(str(content))
+    calls: Any = getattr(message, "tool_calls", None)
+    if calls:
+        size += len(str(calls))
+    return size // 4 + 4
+
+
+def total_tokens(messages: Sequence[Any]) -> int:
+    return sum(count_tokens(m) for m in messages)
+
+
+def is_user_turn(message: Any) -> bool:
+    return isinstance(message, HumanMessage) and not str(message.content).startswith(
+        FEEDBACK_PREFIX
+    )
+
+
+def last_user_message(messages: Sequence[BaseMessage]) -> Optional[BaseMessage]:
+    for message in reversed(messages):
+        if is_user_turn(message):
+            return message
+    return messages[-1] if messages else None
+
+
+def turn_starts(messages: Sequence[BaseMessage]) -> List[int]:
+    """Indices where a user turn begins; cutting there never orphans a tool result."""
+    return [i for i, m in enumerate(messages) if is_user_turn(m)]
+
+
+def fold_point(messages: Sequence[BaseMessage]) -> int:
+    """How many leading messages to fold into the summary (0 = nothing to do)."""
+    if total_tokens(messages) <= CONTEXT_MAX_TOKENS:
+        return 0
+    starts: List[int] = turn_starts(messages)
+    cut: int = 0
+    for start in starts:
+        if total_tokens(messages[start:]) < CONTEXT_KEEP_TOKENS:
+            break
+        cut = start
+    # Always keep the turn in progress.
+    return min(cut, starts[-1]) if starts else 0
+
+
+def transcript(messages: Sequence[BaseMessage]) -> str:
+    lines: List[str] = []
+    for message in messages:
+        content: str = str(message.content)
+        if isinstance(message, ToolMessage):
+            lines.append(f"Tool result: {content[:TRANSCRIPT_TOOL_CHARS]}")
+        elif isinstance(message, AIMessage):
+            calls: Any = message.tool_calls
+            if calls:
+                lines.append(f"Assistant called: {', '.join(c['name'] for c in calls)}")
+            if content:
+                lines.append(f"Assistant: {content}")
+        else:
+            lines.append(f"User: {content}")
+    return "\n".join(lines)
+
+
+def _window(messages: Sequence[BaseMessage], budget: int) -> List[BaseMessage]:
+    """Newest whole turns that fit in `budget`; the current turn is always kept."""
+    starts: List[int] = turn_starts(messages)
+    if not starts:
+        return list(messages)
+    begin: int = starts[-1]
+    for start in reversed(starts[:-1]):
+        if total_tokens(messages[start:]) > budget:
+            break
+        begin = start
+    return list(messages[begin:])
+
+
+def context_for(state: Any, node: str) -> List[BaseMessage]:
+    """Messages `node` should send to the model, with the summary up front."""
+    messages: List[BaseMessage] = list(state["messages"])
+    policy, budget = POLICIES.get(node, ("window", 3000))
+    if policy == "last_user":
+        last: Optional[BaseMessage] = last_user_message(messages)
+        return [last] if last is not None else []
+    starts: List[int] = turn_starts(messages)
+    if policy == "current_turn":
+        view: List[BaseMessage] = list(messages[starts[-1]:]) if starts else messages
+    else:
+        view = _window(messages, budget)
+    summary: str = str(state.get("context_summary") or "")
+    if summary:
+        view = [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"), *view]
+    return view
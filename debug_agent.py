@@ -26,11 +26,11 @@ except Exception as e:
 
 print("\nTesting Chat Node...")
 try:
-    from agent import chat_node, llm, CHAT_PROMPT
+    from agent import chat_node, llm, CHAT_PROMPT, render
     msg = HumanMessage(content="Hello")
     state_msgs = [msg]
     last_user_msg = "Hello"
-    prompt = CHAT_PROMPT.format(input=last_user_msg)
+    prompt = render(CHAT_PROMPT, input=last_user_msg)
     input_list = [HumanMessage(content=prompt)] + state_msgs[:-1]
     
 except Exception as e:
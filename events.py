@@ -0,0 +1,331 @@
+# pyright: basic
+"""Stream events of the API: per-node encoders, coalescing and framing.
+
+Each graph node has an encoder, registered next to the node in
+`create_graph`, that turns the node's state update into the events the
+frontend reads (`{"node": ..., "data": {...}}`). Nodes without one produce
+an empty event, so the UI still sees them run.
+
+Several events ready at the same moment (parallel steps finishing together,
+token deltas arriving faster than the client reads) go out as one
+`{"events": [...]}` record instead of one record each, and consecutive
+deltas of one node are joined. Records are framed as NDJSON (orjson when
+installed, else the json module) or, when the client's Accept header asks
+for it and ormsgpack or msgpack is installed, as a stream of MessagePack
+objects.
+"""
+from __future__ import annotations
+
+import os
+import json
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+try:
+    import orjson  # type: ignore[import-untyped]
+except ImportError:
+    orjson = None
+
+try:
+    import ormsgpack as msgpack  # type: ignore[import-untyped]
+except ImportError:
+    try:
+        import msgpack  # type: ignore[import-untyped, no-redef]
+    except ImportError:
+        msgpack = None
+
+Event = Dict[str, Any]
+EventEncoder = Callable[[str, Any], List[Event]]
+
+# Most events put in one record; 1 sends every update on its own.
+EVENT_COALESCE_MAX: int = int(os.getenv("EVENT_COALESCE_MAX", "32"))
+# How long a token delta may wait for more deltas to share its record.
+EVENT_COALESCE_MS: float = float(os.getenv("EVENT_COALESCE_MS", "20"))
+
+
+# ── Registry ────────────────────────────────────────────────────────────
+_encoders: Dict[str, EventEncoder] = {}
+
+
+def register_encoder(node: str, encoder: EventEncoder) -> None:
+    _encoders[node] = encoder
+
+
+def encode_update(update: Dict[str, Any]) -> List[Event]:
+    """Events for one LangGraph `updates` item ({node: state update})."""
+    events: List[Event] = []
+    for node, value in update.items():
+        name: str = str(node)
+        if name.startswith("__"):
+            continue
+        produced: List[Event] = _encoders.get(name, _plain)(name, value)
+        exhausted: Optional[str] = ((value or {}).get("budget") or {}).get("exhausted")
+        if exhausted and produced:
+            produced[-1]["data"]["budget_exhausted"] = exhausted
+        events.extend(produced)
+    return events
+
+
+# ── Encoders ────────────────────────────────────────────────────────────
+def message_text(content: Any) -> str:
+    """Text of a message's content (plain, or a list of content parts)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            str(part.get("text", "")) if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return str(content)
+
+
+def _last_text(value: Any) -> Optional[str]:
+    messages: List[Any] = (value or {}).get("messages") or []
+    return message_text(messages[-1].content) if messages else None
+
+
+def _event(node: str, data: Dict[str, Any]) -> List[Event]:
+    return [{"node": node, "data": data}]
+
+
+def _plain(node: str, value: Any) -> List[Event]:
+    return _event(node, {})
+
+
+def encode_context(node: str, value: Any) -> List[Event]:
+    # Only surface the context node when it actually folded history.
+    if value and value.get("context_summary"):
+        return _event(node, {"summarized": len(value.get("messages", []))})
+    return []
+
+
+def encode_router(node: str, value: Any) -> List[Event]:
+    events: List[Event] = _event(node, {"mode": value.get("mode")})
+    if value.get("speculated"):
+        # The plan came with the routing decision; report it as the planner would.
+        events += _event("planner", {"plan": value.get("plan", []), "speculative": True})
+    return events
+
+
+def encode_planner(node: str, value: Any) -> List[Event]:
+    return _event(node, {"plan": value.get("plan", [])})
+
+
+def encode_executor(node: str, value: Any) -> List[Event]:
+    data: Dict[str, Any] = {}
+    for index, result in (value.get("step_results") or {}).items():
+        data["step"] = int(index) + 1
+        pending: List[Any] = result.get("pending_calls") or []
+        if pending:
+            data["tool"] = str(pending[0]["name"])
+            data["reasoning"] = f"Using tool: {pending[0]['name']}"
+    for record in value.get("research_notes") or []:
+        if record["source"] == "answer":
+            data["output"] = record["text"]
+        else:
+            data.setdefault("sources", []).append(record["source"])
+    return _event(node, data)
+
+
+def encode_step_manager(node: str, value: Any) -> List[Event]:
+    return _event(node, {"status": "step_completed", "current_step": value.get("current_step", 0)})
+
+
+def encode_reporter(node: str, value: Any) -> List[Event]:
+    text: Optional[str] = _last_text(value)
+    return _event(node, {"final_response": text} if text is not None else {})
+
+
+def encode_chat(node: str, value: Any) -> List[Event]:
+    text: Optional[str] = _last_text(value)
+    return _event(node, {"response": text} if text is not None else {})
+
+
+def encode_validator(node: str, value: Any) -> List[Event]:
+    messages: List[Any] = (value or {}).get("messages") or []
+    if messages:
+        return _event(node, {"feedback": message_text(messages[0].content), "status": "failed"})
+    return _event(node, {"status": "passed"})
+
+
+def encode_explain(node: str, value: Any) -> List[Event]:
+    # The UI shows `explanation`; a copy under `response` would only be sent twice.
+    text: Optional[str] = _last_text(value)
+    return _event(node, {"explanation": text} if text is not None else {})
+
+
+def encode_human_approval(node: str, value: Any) -> List[Event]:
+    return _event(node, {
+        "status": "awaiting_approval",
+        "message": "Agent wants to save notes. Approve or reject.",
+    })
+
+
+def encode_tools(node: str, value: Any) -> List[Event]:
+    return _event(node, {"status": "tool_executed"})
+
+
+def encode_action_planner(node: str, value: Any) -> List[Event]:
+    return _event(node, {"action_plan": value.get("plan", []), "mode": "action"})
+
+
+def encode_action_executor(node: str, value: Any) -> List[Event]:
+    data: Dict[str, Any] = {}
+    for index, output in (value.get("action_outputs") or {}).items():
+        data["step"] = int(index) + 1
+        data["tool_result"] = str(output)
+        data["status"] = "action_executed"
+    return _event(node, data)
+
+
+def encode_action_reporter(node: str, value: Any) -> List[Event]:
+    text: Optional[str] = _last_text(value)
+    if text is None:
+        return _event(node, {})
+    return _event(node, {"final_response": text, "status": "action_complete"})
+
+
+# ── Coalescing ──────────────────────────────────────────────────────────
+def _is_delta(event: Event) -> bool:
+    return len(event["data"]) == 1 and "delta" in event["data"]
+
+
+def _merge_deltas(events: List[Event]) -> List[Event]:
+    merged: List[Event] = []
+    parts: List[str] = []
+    for event in events:
+        if _is_delta(event) and merged and _is_delta(merged[-1]) and merged[-1]["node"] == event["node"]:
+            parts.append(event["data"]["delta"])
+            continue
+        if parts:
+            merged[-1] = {"node": merged[-1]["node"], "data": {"delta": merged[-1]["data"]["delta"] + "".join(parts)}}
+            parts = []
+        merged.append(event)
+    if parts:
+        merged[-1] = {"node": merged[-1]["node"], "data": {"delta": merged[-1]["data"]["delta"] + "".join(parts)}}
+    return merged
+
+
+class _Flush:
+    """Timer marker: the linger of the batch that scheduled it is over."""
+
+    def __init__(self) -> None:
+        self.fired = False
+
+    def fire(self, queue: asyncio.Queue) -> None:
+        # With the queue full the consumer has items to take anyway and
+        # sees `fired` after the next one.
+        self.fired = True
+        if not queue.full():
+            queue.put_nowait(self)
+
+
+async def coalesce(
+    batches: AsyncIterator[List[Event]],
+    max_events: int = EVENT_COALESCE_MAX,
+    linger: float = EVENT_COALESCE_MS / 1000,
+) -> AsyncIterator[List[Event]]:
+    """Join event batches into fewer records.
+
+    Node events go out as soon as they arrive, together with whatever else
+    is already waiting. A token delta may wait up to `linger` seconds for
+    more deltas to share its record; consecutive deltas of a node are joined
+    into one. The source runs in its own task and a single timer per record
+    ends the wait, so nothing is ever held back longer than `linger`. The
+    queue between them holds at most `max_events` batches: when the client
+    reads slower than the graph produces, the graph waits.
+    """
+    if max_events <= 1:
+        async for batch in batches:
+            yield batch
+        return
+
+    done: object = object()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_events)
+    loop: Any = asyncio.get_running_loop()
+
+    async def pump() -> None:
+        try:
+            async for batch in batches:
+                await queue.put(batch)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as exc:
+            await queue.put(exc)
+            return
+        await queue.put(done)
+
+    def stop(item: Any) -> bool:
+        return item is done or isinstance(item, BaseException)
+
+    task: asyncio.Task = asyncio.create_task(pump())
+    try:
+        item: Any = await queue.get()
+        while item is not done:
+            if isinstance(item, BaseException):
+                raise item
+            if isinstance(item, _Flush):  # a timer that fired after its record went out
+                item = await queue.get()
+                continue
+            pending: List[Event] = list(item)
+            item = None
+            if linger > 0 and all(map(_is_delta, pending)):
+                marker: _Flush = _Flush()
+                timer: Any = loop.call_later(linger, marker.fire, queue)
+                while len(pending) < max_events:
+                    nxt: Any = await queue.get()
+                    if nxt is marker:
+                        break
+                    if stop(nxt) or isinstance(nxt, _Flush):
+                        item = nxt
+                        break
+                    pending.extend(nxt)
+                    if marker.fired or not all(map(_is_delta, nxt)):
+                        break  # linger over, or a node event is in: send now
+                timer.cancel()
+            while item is None and len(pending) < max_events and not queue.empty():
+                nxt = queue.get_nowait()
+                if stop(nxt):
+                    item = nxt
+                elif not isinstance(nxt, _Flush):
+                    pending.extend(nxt)
+            yield _merge_deltas(pending)
+            if item is None:
+                item = await queue.get()
+    finally:
+        task.cancel()
+        try:
+            await task
+        except BaseException:
+            pass
+
+
+# ── Framing ─────────────────────────────────────────────────────────────
+class Framing:
+    def __init__(self, name: str, media_type: str, encode: Callable[[Any], bytes]) -> None:
+        self.name = name
+        self.media_type = media_type
+        self.encode = encode
+
+
+def _ndjson(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, default=str, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def _msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, default=str)
+
+
+NDJSON: Framing = Framing("ndjson", "application/x-ndjson", _ndjson)
+MSGPACK: Optional[Framing] = (
+    Framing("msgpack", "application/x-msgpack", _msgpack) if msgpack is not None else None
+)
+
+
+def negotiate(accept: Optional[str]) -> Framing:
+    """MessagePack if the Accept header asks for it and a packer is installed, else NDJSON."""
+    if MSGPACK is not None and accept and "msgpack" in accept.lower():
+        return MSGPACK
+    return NDJSON
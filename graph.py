@@ -3,61 +3,138 @@ from __future__ import annotations
 
 from langgraph.graph import StateGraph, END  # type: ignore[import-untyped]
 from langgraph.prebuilt import ToolNode  # type: ignore[import-untyped]
+from langgraph.types import Send  # type: ignore[import-untyped]
 from langchain_core.messages import AIMessage  # type: ignore[import-untyped]
-from typing import Any, Optional
+from langchain_core.runnables import RunnableLambda  # type: ignore[import-untyped]
+from typing import Any, Callable, List, Optional, Union
 
 from agent import (
     AgentState,
+    context_node,
+    acontext_node,
     router_node,
+    arouter_node,
     planner_node,
+    aplanner_node,
     executor_node,
+    aexecutor_node,
     executor_logic,
     reporter_node,
+    areporter_node,
     chat_node,
+    achat_node,
     validator_node,
+    avalidator_node,
     explain_node,
+    aexplain_node,
     human_approval_node,
     action_planner_node,
+    aaction_planner_node,
     action_executor_node,
+    aaction_executor_node,
     action_step_manager,
     action_reporter_node,
+    aaction_reporter_node,
+    ready_steps,
+    step_task,
+    action_task,
 )
-from tools import TOOLS, ZAPIER_TOOLS
+from budget import budget_exhausted
+from events import (
+    EventEncoder,
+    encode_action_executor,
+    encode_action_planner,
+    encode_action_reporter,
+    encode_chat,
+    encode_context,
+    encode_executor,
+    encode_explain,
+    encode_human_approval,
+    encode_planner,
+    encode_reporter,
+    encode_router,
+    encode_step_manager,
+    encode_tools,
+    encode_validator,
+    register_encoder,
+)
+from metrics import instrument_node, node_timer
+from tools import TOOLS
+
+
+def _dual(func: Callable[..., Any], afunc: Callable[..., Any]) -> Any:
+    """Pair a sync node with its async variant: `stream` runs `func`, `astream` runs `afunc`."""
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+
+class TimedToolNode(ToolNode):  # type: ignore[misc]
+    """ToolNode whose runs are timed like the other nodes."""
+
+    def invoke(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> Any:
+        with node_timer("tools"):
+            return super().invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> Any:
+        with node_timer("tools"):
+            return await super().ainvoke(input, config, **kwargs)
 
 
 def create_graph(checkpointer: Optional[Any] = None) -> Any:
     graph: Any = StateGraph(AgentState)
 
     # ── Register all nodes ──────────────────────────────────────────────
-    graph.add_node("router", router_node)
-    graph.add_node("planner", planner_node)
-    graph.add_node("executor", executor_node)
-    graph.add_node("step_manager", executor_logic)
-    graph.add_node("reporter", reporter_node)
-    graph.add_node("chat_node", chat_node)
-    graph.add_node("validator", validator_node)
-    graph.add_node("explain_node", explain_node)
-    graph.add_node("human_approval", human_approval_node)
-    graph.add_node("tools", ToolNode(TOOLS))
-    graph.add_node("action_planner", action_planner_node)
-    graph.add_node("action_executor", action_executor_node)
-    graph.add_node("action_step_manager", action_step_manager)
-    graph.add_node("action_reporter", action_reporter_node)
-    graph.add_node("action_tools", ToolNode(ZAPIER_TOOLS))
+    # Every node run is timed into agent_node_duration_seconds (metrics.py);
+    # `encoder` turns the node's updates into API stream events (events.py).
+    def add(
+        name: str,
+        func: Callable[..., Any],
+        afunc: Optional[Callable[..., Any]] = None,
+        encoder: Optional[EventEncoder] = None,
+    ) -> None:
+        if afunc is None:
+            graph.add_node(name, instrument_node(name, func))
+        else:
+            graph.add_node(name, _dual(instrument_node(name, func), instrument_node(name, afunc)))
+        if encoder is not None:
+            register_encoder(name, encoder)
+
+    add("context", context_node, acontext_node, encode_context)
+    add("router", router_node, arouter_node, encode_router)
+    add("planner", planner_node, aplanner_node, encode_planner)
+    add("executor", executor_node, aexecutor_node, encode_executor)
+    add("step_manager", executor_logic, encoder=encode_step_manager)
+    add("reporter", reporter_node, areporter_node, encode_reporter)
+    add("chat_node", chat_node, achat_node, encode_chat)
+    add("validator", validator_node, avalidator_node, encode_validator)
+    add("explain_node", explain_node, aexplain_node, encode_explain)
+    add("human_approval", human_approval_node, encoder=encode_human_approval)
+    graph.add_node("tools", TimedToolNode(TOOLS))
+    register_encoder("tools", encode_tools)
+    add("action_planner", action_planner_node, aaction_planner_node, encode_action_planner)
+    add("action_executor", action_executor_node, aaction_executor_node, encode_action_executor)
+    add("action_step_manager", action_step_manager, encoder=encode_step_manager)
+    add("action_reporter", action_reporter_node, aaction_reporter_node, encode_action_reporter)
 
     # ── Entry point ─────────────────────────────────────────────────────
-    graph.set_entry_point("router")
+    graph.set_entry_point("context")
+    graph.add_edge("context", "router")
 
     # ── Router: branch to all four modes ────────────────────────────────
-    graph.add_conditional_edges(
-        "router",
-        lambda state: state["mode"],  # type: ignore[arg-type]
-        {
+    def router_logic(state: AgentState) -> Union[str, List[Any]]:  # type: ignore[type-arg]
+        mode: str = str(state["mode"])
+        if mode == "research" and state.get("speculated"):
+            # The router already holds the speculative plan; skip the planner.
+            return step_router(state)
+        return {
             "quick":    "chat_node",
             "research": "planner",
             "explain":  "explain_node",
             "action":   "action_planner",
-        },
+        }[mode]
+
+    graph.add_conditional_edges(
+        "router", router_logic,
+        ["chat_node", "planner", "explain_node", "action_planner", "executor", "reporter"],
     )
 
     # ── EXPLAIN mode ────────────────────────────────────────────────────
@@ -77,46 +154,38 @@ def create_graph(checkpointer: Optional[Any] = None) -> Any:
 
     def after_tools_logic(state: AgentState) -> str:  # type: ignore[type-arg]
         mode: str = str(state.get("mode", "quick"))
-        return "chat_node" if mode == "quick" else "executor"
+        # Research only reaches `tools` for approved writes, after every step ran.
+        return "chat_node" if mode == "quick" else "reporter"
 
     graph.add_conditional_edges(
         "tools", after_tools_logic,
-        {"chat_node": "chat_node", "executor": "executor"},
+        {"chat_node": "chat_node", "reporter": "reporter"},
     )
 
     # ── RESEARCH mode ───────────────────────────────────────────────────
-    graph.add_edge("planner", "executor")
-
-    def executor_router(state: AgentState) -> str:  # type: ignore[type-arg]
+    # Every step whose dependencies are done is sent to its own `executor`
+    # task; the wave runs concurrently and `step_manager` merges the results
+    # in plan order before the next wave (or the reporter) starts.
+    def step_router(state: AgentState) -> Union[str, List[Any]]:  # type: ignore[type-arg]
+        ready: List[int] = ready_steps(state)
+        # Once the request budget is spent, report on the steps that did run.
+        if ready and not budget_exhausted():
+            return [Send("executor", step_task(state, i)) for i in ready]
         last: Any = state["messages"][-1]
         if isinstance(last, AIMessage) and last.tool_calls:
-            tool_name: str = str(last.tool_calls[0]["name"])
-            if tool_name == "save_to_notes":
-                return "human_approval"
-            return "tools"
-        return "step_manager"
+            return "human_approval"
+        return "reporter"
 
     graph.add_conditional_edges(
-        "executor", executor_router,
-        {
-            "tools":          "tools",
-            "human_approval": "human_approval",
-            "step_manager":   "step_manager",
-        },
+        "planner", step_router, ["executor", "human_approval", "reporter"],
     )
-
-    graph.add_edge("human_approval", "tools")
-
-    def step_router(state: AgentState) -> str:  # type: ignore[type-arg]
-        current: int = int(state.get("current_step") or 0)
-        total: int = len(list(state.get("plan") or []))
-        return "executor" if current < total else "reporter"
-
+    graph.add_edge("executor", "step_manager")
     graph.add_conditional_edges(
-        "step_manager", step_router,
-        {"executor": "executor", "reporter": "reporter"},
+        "step_manager", step_router, ["executor", "human_approval", "reporter"],
     )
 
+    graph.add_edge("human_approval", "tools")
+
     # ── Validator loop ──────────────────────────────────────────────────
     def validator_logic(state: AgentState) -> str:  # type: ignore[type-arg]
         last: Any = state["messages"][-1]
@@ -134,35 +203,20 @@ def create_graph(checkpointer: Optional[Any] = None) -> Any:
     graph.add_edge("reporter", END)
 
     # ── ACTION mode ─────────────────────────────────────────────────────
-    graph.add_edge("action_planner", "action_executor")
-
-    def action_executor_router(state: AgentState) -> str:  # type: ignore[type-arg]
-        last: Any = state["messages"][-1]
-        if isinstance(last, AIMessage) and last.tool_calls:
-            return "action_tools"
-        return "action_step_manager"
+    # Independent action steps are dispatched together; a step waits only for
+    # the steps it depends on (e.g. notify after reschedule).
+    def action_step_router(state: AgentState) -> Union[str, List[Send]]:  # type: ignore[type-arg]
+        ready: List[int] = ready_steps(state)
+        if ready and not budget_exhausted():
+            return [Send("action_executor", action_task(state, index)) for index in ready]
+        return "action_reporter"
 
     graph.add_conditional_edges(
-        "action_executor", action_executor_router,
-        {
-            "action_tools":        "action_tools",
-            "action_step_manager": "action_step_manager",
-        },
+        "action_planner", action_step_router, ["action_executor", "action_reporter"],
     )
-
-    graph.add_edge("action_tools", "action_step_manager")
-
-    def action_step_router(state: AgentState) -> str:  # type: ignore[type-arg]
-        current: int = int(state.get("current_step") or 0)
-        total: int = len(list(state.get("plan") or []))
-        return "action_executor" if current < total else "action_reporter"
-
+    graph.add_edge("action_executor", "action_step_manager")
     graph.add_conditional_edges(
-        "action_step_manager", action_step_router,
-        {
-            "action_executor": "action_executor",
-            "action_reporter": "action_reporter",
-        },
+        "action_step_manager", action_step_router, ["action_executor", "action_reporter"],
     )
 
     graph.add_edge("action_reporter", END)
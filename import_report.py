@@ -0,0 +1,123 @@
+# pyright: basic
+"""Startup-time report.
+
+Imports each entry module in a fresh interpreter with `-X importtime` and
+prints its total import time plus the packages that dominate it. With
+--init it also times the clients that are now built on first use.
+
+    python import_report.py                 # agent, tools, graph, api
+    python import_report.py api --top 15
+    python import_report.py --json --budget 1500   # exit 1 if a module is slower
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import Any, Dict, List, Tuple
+
+ENTRY_MODULES: List[str] = ["agent", "tools", "graph", "api"]
+
+
+def _parse(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) rows from -X importtime output."""
+    rows: List[Tuple[str, int, int]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+
+def measure_import(module: str, top: int = 8) -> Dict[str, Any]:
+    started: float = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    wall: float = time.perf_counter() - started
+    if proc.returncode != 0:
+        return {"module": module, "error": proc.stderr.strip().splitlines()[-1:]}
+    rows: List[Tuple[str, int, int]] = _parse(proc.stderr)
+    total_us: int = next((cum for name, _, cum in rows if name == module), 0)
+    by_package: Dict[str, int] = {}
+    for name, own, _ in rows:
+        package: str = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + own
+    heaviest: List[Tuple[str, int]] = sorted(by_package.items(), key=lambda p: -p[1])[:top]
+    return {
+        "module": module,
+        "import_ms": round(total_us / 1000, 1),
+        "process_ms": round(wall * 1000, 1),
+        "modules_loaded": len(rows),
+        "packages": {name: round(us / 1000, 1) for name, us in heaviest},
+    }
+
+
+def measure_init() -> Dict[str, float]:
+    """Time the lazily built clients and bound runnables in this process."""
+    # Building a client needs a key but makes no request; any placeholder will do.
+    os.environ.setdefault("GOOGLE_API_KEY", "unset")
+    os.environ.setdefault("TAVILY_API_KEY", "unset")
+    import agent
+    import tools
+
+    timings: Dict[str, float] = {}
+    for label, build in (
+        ("llm", agent.get_llm),
+        ("llm.bind_tools(TOOLS)", lambda: agent.with_tools(tools.TOOLS)),
+        ("llm.bind_tools(ZAPIER_TOOLS)", lambda: agent.with_tools(tools.ZAPIER_TOOLS)),
+        ("tavily", tools.get_tavily),
+    ):
+        started: float = time.perf_counter()
+        build()
+        timings[label] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+    parser.add_argument("--top", type=int, default=8, help="packages listed per module")
+    parser.add_argument("--init", action="store_true", help="also time first-use clients")
+    parser.add_argument("--json", action="store_true", help="print one JSON document")
+    parser.add_argument("--budget", type=float, help="fail if any import exceeds this many ms")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"imports": [measure_import(m, args.top) for m in args.modules]}
+    if args.init:
+        report["first_use_ms"] = measure_init()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for entry in report["imports"]:
+            if "error" in entry:
+                print(f"{entry['module']:<8} FAILED: {entry['error']}")
+                continue
+            print(
+                f"{entry['module']:<8} {entry['import_ms']:>8.1f} ms import"
+                f"  ({entry['process_ms']:.0f} ms process, {entry['modules_loaded']} modules)"
+            )
+            for package, ms in entry["packages"].items():
+                print(f"    {package:<28} {ms:>8.1f} ms")
+        for label, ms in report.get("first_use_ms", {}).items():
+            print(f"first use {label:<30} {ms:>8.1f} ms")
+
+    if args.budget is not None:
+        slow: List[str] = [
+            e["module"] for e in report["imports"]
+            if "error" in e or e["import_ms"] > args.budget
+        ]
+        if slow:
+            print(f"Over the {args.budget:g} ms budget: {', '.join(slow)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+# pyright: basic
+"""Local fast-path intent classifier for `router_node`.
+
+Weighted keyword/regex rules plus a small linear model over token n-grams
+(`data/intent_model.json`) score the four modes. Confident decisions are
+answered locally; anything below INTENT_CONFIDENCE falls back to the
+structured Gemini router. Retrain the model with `python intent.py --train`.
+
+Short replies with little content of their own ("yes", "do it", "tell me
+more") mean whatever the conversation makes them mean, so they always go to
+the Gemini router, which sees the history, and its answer for them is not
+cached. Other Gemini answers are cached for INTENT_CACHE_TTL seconds.
+"""
+from __future__ import annotations
+
+import os
+import re
+import json
+import math
+import time
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+MODES: Tuple[str, ...] = ("quick", "research", "explain", "action")
+
+_DATA_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+MODEL_PATH: str = os.path.join(_DATA_DIR, "intent_model.json")
+EXAMPLES_PATH: str = os.path.join(_DATA_DIR, "intent_examples.json")
+
+CONFIDENCE_THRESHOLD: float = float(os.getenv("INTENT_CONFIDENCE", "0.9"))
+CACHE_SIZE: int = int(os.getenv("INTENT_CACHE_SIZE", "2048"))
+CACHE_TTL: float = float(os.getenv("INTENT_CACHE_TTL", "3600"))
+# Messages with fewer content words than this depend on the conversation.
+MIN_CONTENT_TOKENS: int = int(os.getenv("INTENT_MIN_CONTENT_TOKENS", "1"))
+
+_GREETING = re.compile(r"^\s*(hi|hello|hey|yo|thanks|thank you|good (morning|evening|night))\b[\s!.?]*$")
+
+# (mode, pattern, weight) — added to the model's logit for that mode.
+RULES: List[Tuple[str, "re.Pattern[str]", float]] = [
+    ("quick", _GREETING, 6.0),
+    ("quick", re.compile(r"^\s*(what|who|when|where) (is|was|are) (?!you\b)\w+( \w+)?\??$"), 1.5),
+    # Whole-message questions only: "who are you voting for" is not about the agent.
+    ("explain", re.compile(r"^\s*(how do you work|who are you|what are you)( exactly| really)?\s*[?!.]*$"), 5.0),
+    ("explain", re.compile(r"\byour (architecture|components|graph|design)\b"), 5.0),
+    ("explain", re.compile(r"\bexplain (yourself|your)\b"), 5.0),
+    ("research", re.compile(r"\b(research|analy[sz]e|analysis|deep dive|report on|compare|comparison|trends?|market)\b"), 2.5),
+    ("action", re.compile(r"\b(reschedule|schedule|send|email|slack|notify|remind|calendar|meeting|standup|invite)\b"), 2.5),
+    ("action", re.compile(r"\b(move|push|cancel) (my|the|our) \w+"), 2.0),
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9#@']+")
+
+# Words that carry no intent of their own in a reply.
+_FILLER = frozenset("""
+a an the it this that these those them me you i we us my your our please so then
+and or but ok okay sure yes yeah yep no nope go ahead do does did done it's that's
+continue more tell keep going again next also too now just what else why how about
+""".split())
+
+
+@dataclass
+class IntentDecision:
+    mode: str
+    confidence: float
+    source: str  # "rules" | "cache"
+    contextual: bool = False  # too little content to route without the history
+    expires: float = math.inf
+    conflicting: bool = False  # rules for different modes matched
+
+    @property
+    def confident(self) -> bool:
+        return (
+            not self.contextual and not self.conflicting
+            and self.confidence >= CONFIDENCE_THRESHOLD
+        )
+
+
+def normalize(text: str) -> str:
+    return " ".join(_TOKEN_RE.findall(text.lower()))
+
+
+def is_contextual(text: str) -> bool:
+    """True for replies like "yes" or "do it" whose intent is set by the conversation."""
+    lowered: str = text.lower()
+    if IntentClassifier.rule_modes(lowered):
+        return False
+    content: List[str] = [t for t in _TOKEN_RE.findall(lowered) if t not in _FILLER]
+    return len(content) < MIN_CONTENT_TOKENS
+
+
+def features(text: str) -> List[str]:
+    tokens: List[str] = _TOKEN_RE.findall(text.lower())
+    grams: List[str] = [f"u:{t}" for t in tokens]
+    grams += [f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    return grams
+
+
+def _softmax(logits: Dict[str, float]) -> Dict[str, float]:
+    top: float = max(logits.values())
+    exps: Dict[str, float] = {m: math.exp(v - top) for m, v in logits.items()}
+    total: float = sum(exps.values())
+    return {m: v / total for m, v in exps.items()}
+
+
+class IntentClassifier:
+    def __init__(self, model: Optional[Dict[str, Any]] = None) -> None:
+        model = model or {}
+        self.bias: Dict[str, float] = dict(model.get("bias") or {})
+        self.weights: Dict[str, Dict[str, float]] = dict(model.get("weights") or {})
+        self._cache: "OrderedDict[str, IntentDecision]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "local": 0,
+            "cache_hits": 0,
+            "fallbacks": 0,
+            "shadow_checked": 0,
+            "shadow_agreed": 0,
+            "contextual": 0,
+            "conflicting": 0,
+        }
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "IntentClassifier":
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(json.load(f))
+        return cls()
+
+    def scores(self, text: str) -> Dict[str, float]:
+        logits: Dict[str, float] = {m: float(self.bias.get(m, 0.0)) for m in MODES}
+        for feat in features(text):
+            for mode, weight in (self.weights.get(feat) or {}).items():
+                logits[mode] += weight
+        lowered: str = text.lower()
+        for mode, pattern, weight in RULES:
+            if pattern.search(lowered):
+                logits[mode] += weight
+        return _softmax(logits)
+
+    @staticmethod
+    def rule_modes(text: str) -> Set[str]:
+        """Modes whose rules match `text`."""
+        lowered: str = text.lower()
+        return {mode for mode, pattern, _ in RULES if pattern.search(lowered)}
+
+    def classify(self, text: str) -> IntentDecision:
+        key: str = normalize(text)
+        with self._lock:
+            self.counters["requests"] += 1
+            cached: Optional[IntentDecision] = self._cache.get(key)
+            if cached is not None and cached.expires <= time.time():
+                del self._cache[key]
+                cached = None
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.counters["cache_hits"] += 1
+                if cached.confident:
+                    self.counters["local"] += 1
+                else:
+                    self.counters["fallbacks"] += 1
+                return IntentDecision(
+                    cached.mode, cached.confidence, "cache",
+                    cached.contextual, cached.expires, cached.conflicting,
+                )
+
+        probs: Dict[str, float] = self.scores(text)
+        mode: str = max(probs, key=lambda m: probs[m])
+        # e.g. "email alice the research on market trends": the model would
+        # just break the tie between two rules, so let Gemini decide.
+        decision = IntentDecision(
+            mode, probs[mode], "rules",
+            contextual=is_contextual(text), conflicting=len(self.rule_modes(text)) > 1,
+        )
+        with self._lock:
+            if decision.contextual:
+                self.counters["contextual"] += 1
+            if decision.conflicting:
+                self.counters["conflicting"] += 1
+            self._cache[key] = decision
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+            if decision.confident:
+                self.counters["local"] += 1
+            else:
+                self.counters["fallbacks"] += 1
+        return decision
+
+    def record_llm_decision(self, text: str, local: IntentDecision, llm_mode: str) -> None:
+        """Compare a fallback guess with the LLM's answer and cache the LLM's answer
+        for CACHE_TTL seconds, unless the message only makes sense in context."""
+        with self._lock:
+            self.counters["shadow_checked"] += 1
+            if local.mode == llm_mode:
+                self.counters["shadow_agreed"] += 1
+            if local.contextual or is_contextual(text):
+                return
+            self._cache[normalize(text)] = IntentDecision(
+                llm_mode, 1.0, "cache", expires=time.time() + CACHE_TTL
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c: Dict[str, int] = dict(self.counters)
+        requests: int = c["requests"] or 1
+        return {
+            **c,
+            "fallback_rate": c["fallbacks"] / requests,
+            "cache_hit_rate": c["cache_hits"] / requests,
+            "shadow_accuracy": (
+                c["shadow_agreed"] / c["shadow_checked"] if c["shadow_checked"] else None
+            ),
+        }
+
+
+def train(
+    examples: List[Tuple[str, str]],
+    epochs: int = 40,
+    lr: float = 0.5,
+    l2: float = 1e-3,
+    seed: int = 7,
+) -> Dict[str, Any]:
+    """Fit a multinomial logistic regression over n-gram features with SGD."""
+    rng = random.Random(seed)
+    bias: Dict[str, float] = {m: 0.0 for m in MODES}
+    weights: Dict[str, Dict[str, float]] = {}
+    data: List[Tuple[List[str], str]] = [(features(t), m) for t, m in examples]
+    for _ in range(epochs):
+        rng.shuffle(data)
+        for feats, label in data:
+            logits: Dict[str, float] = dict(bias)
+            for feat in feats:
+                for mode, w in (weights.get(feat) or {}).items():
+                    logits[mode] += w
+            probs: Dict[str, float] = _softmax(logits)
+            for mode in MODES:
+                grad: float = probs[mode] - (1.0 if mode == label else 0.0)
+                bias[mode] -= lr * grad
+                for feat in feats:
+                    row: Dict[str, float] = weights.setdefault(feat, {})
+                    row[mode] = row.get(mode, 0.0) * (1 - lr * l2) - lr * grad
+    pruned: Dict[str, Dict[str, float]] = {}
+    for feat, row in weights.items():
+        kept: Dict[str, float] = {m: round(w, 4) for m, w in row.items() if abs(w) >= 0.05}
+        if kept:
+            pruned[feat] = kept
+    return {"bias": {m: round(b, 4) for m, b in bias.items()}, "weights": pruned}
+
+
+_classifier: Optional[IntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> IntentClassifier:
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier.load()
+    return _classifier
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--train" in sys.argv:
+        with open(EXAMPLES_PATH, "r", encoding="utf-8") as f:
+            pairs: List[Tuple[str, str]] = [(e["text"], e["mode"]) for e in json.load(f)]
+        # Held-out check first: how often the local path answers, and how often it is right.
+        shuffled: List[Tuple[str, str]] = list(pairs)
+        random.Random(11).shuffle(shuffled)
+        cut: int = len(shuffled) * 4 // 5
+        held_out: IntentClassifier = IntentClassifier(train(shuffled[:cut]))
+        decided: List[Tuple[IntentDecision, str]] = [
+            (held_out.classify(t), m) for t, m in shuffled[cut:]
+        ]
+        local: List[Tuple[IntentDecision, str]] = [(d, m) for d, m in decided if d.confident]
+        print(
+            f"Held out {len(decided)}: {len(local)} answered locally, "
+            f"{sum(d.mode == m for d, m in local)} of them correct "
+            f"(threshold {CONFIDENCE_THRESHOLD})"
+        )
+        model: Dict[str, Any] = train(pairs)
+        with open(MODEL_PATH, "w", encoding="utf-8") as f:
+            json.dump(model, f, indent=1, sort_keys=True)
+        clf = IntentClassifier(model)
+        correct: int = sum(clf.classify(t).mode == m for t, m in pairs)
+        print(f"Trained on {len(pairs)} examples, train accuracy {correct / len(pairs):.2%}")
+        print(f"Wrote {MODEL_PATH} ({len(model['weights'])} features)")
+    else:
+        clf = get_classifier()
+        for line in sys.stdin:
+            d: IntentDecision = clf.classify(line.strip())
+            print(f"{d.mode:8s} {d.confidence:.3f} {'local' if d.confident else 'fallback'}")
@@ -0,0 +1,240 @@
+# pyright: basic
+"""Response cache for `safe_invoke`.
+
+Keys are a SHA-256 over the model identity (class, model name, temperature),
+whatever is bound to it (tools, structured-output schema, parser) and the
+message list with volatile fields (ids) dropped. Values live in an in-memory
+LRU tier and, when LLM_CACHE_DB is set, in an SQLite tier with TTL and
+size-based eviction. Only deterministic calls (temperature == 0) are cached.
+"""
+from __future__ import annotations
+
+import os
+import re
+import json
+import time
+import uuid
+import pickle
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage  # type: ignore[import-untyped]
+
+_ADDRESS_RE = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+# ── Keying ──────────────────────────────────────────────────────────────
+def _describe(runnable: Any) -> Any:
+    """A stable, JSON-friendly description of a runnable chain."""
+    steps: Optional[List[Any]] = getattr(runnable, "steps", None)
+    if isinstance(steps, list):
+        return [_describe(step) for step in steps]
+    bound: Any = getattr(runnable, "bound", None)
+    if bound is not None:
+        return {"bound": _describe(bound), "kwargs": getattr(runnable, "kwargs", {})}
+    described: Dict[str, Any] = {"class": type(runnable).__name__}
+    for attr in ("model", "model_name", "temperature", "pydantic_object", "tools", "key_name"):
+        value: Any = getattr(runnable, attr, None)
+        if value is not None:
+            described[attr] = value
+    return described
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    if hasattr(value, "model_json_schema"):
+        return value.model_json_schema()
+    return _ADDRESS_RE.sub("", repr(value))
+
+
+def _message_payload(message: Any) -> Any:
+    if not isinstance(message, BaseMessage):
+        return str(message)
+    return {
+        "type": message.type,
+        "content": message.content,
+        "tool_calls": getattr(message, "tool_calls", None) or None,
+        "tool_call_id": getattr(message, "tool_call_id", None),
+        "name": message.name,
+    }
+
+
+def base_model(runnable: Any) -> Any:
+    """The chat model at the root of a bound/structured runnable chain."""
+    steps: Optional[List[Any]] = getattr(runnable, "steps", None)
+    if isinstance(steps, list) and steps:
+        return base_model(steps[0])
+    bound: Any = getattr(runnable, "bound", None)
+    return base_model(bound) if bound is not None else runnable
+
+
+def cache_key(runnable: Any, input_data: Any) -> Optional[str]:
+    """Canonical key for a call, or None when the call should not be cached."""
+    temperature: Any = getattr(base_model(runnable), "temperature", None)
+    if temperature is None or float(temperature) != 0.0:
+        return None
+    return request_key(runnable, input_data)
+
+
+def request_key(runnable: Any, input_data: Any) -> str:
+    """SHA-256 of the model identity, its bindings and the messages."""
+    messages: List[Any] = input_data if isinstance(input_data, list) else [input_data]
+    payload: str = json.dumps(
+        {"runnable": _describe(runnable), "messages": [_message_payload(m) for m in messages]},
+        sort_keys=True,
+        default=_json_default,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ── Storage ─────────────────────────────────────────────────────────────
+def _restore(blob: bytes) -> Any:
+    value: Any = pickle.loads(blob)  # noqa: S301 - local cache written by this process
+    if isinstance(value, BaseMessage):
+        # A fresh id keeps add_messages from replacing an earlier identical reply.
+        value.id = f"cache-{uuid.uuid4()}"
+        value.response_metadata = {**(value.response_metadata or {}), "cache_hit": True}
+    return value
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: float = 3600.0,
+        db_path: Optional[str] = None,
+        max_db_entries: int = 10_000,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self._memory: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+        self.counters: Dict[str, int] = {
+            "hits": 0, "memory_hits": 0, "disk_hits": 0,
+            "misses": 0, "stores": 0, "evictions": 0, "expired": 0,
+        }
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA busy_timeout=5000")  # the file may be shared by several workers
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed)")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        now: float = time.time()
+        with self._lock:
+            entry: Optional[Tuple[float, bytes]] = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return True, _restore(entry[1])
+                del self._memory[key]
+                self.counters["expired"] += 1
+            if self._db is not None:
+                row: Any = self._db.execute(
+                    "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    self._db.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[1], row[0])
+                    self.counters["hits"] += 1
+                    self.counters["disk_hits"] += 1
+                    return True, _restore(row[0])
+                if row is not None:
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self.counters["expired"] += 1
+            self.counters["misses"] += 1
+        return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            blob: bytes = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        now: float = time.time()
+        with self._lock:
+            self._remember(key, now, blob)
+            self.counters["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, blob, now, now),
+                )
+                self._writes_since_evict += 1
+                if self._writes_since_evict >= 64:
+                    self._evict_disk(now)
+
+    async def aget(self, key: str) -> Tuple[bool, Any]:
+        if self._db is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        if self._db is None:
+            self.set(key, value)
+            return
+        await asyncio.to_thread(self.set, key, value)
+
+    def _remember(self, key: str, created: float, blob: bytes) -> None:
+        self._memory[key] = (created, blob)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _evict_disk(self, now: float) -> None:
+        assert self._db is not None
+        self._writes_since_evict = 0
+        self._db.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,))
+        cur: Any = self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_db_entries,),
+        )
+        self.counters["evictions"] += max(cur.rowcount, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c: Dict[str, int] = dict(self.counters)
+            size: int = len(self._memory)
+        lookups: int = c["hits"] + c["misses"]
+        return {**c, "memory_entries": size, "hit_rate": c["hits"] / lookups if lookups else 0.0}
+
+
+def _from_env() -> Optional[ResponseCache]:
+    if os.getenv("LLM_CACHE", "1").lower() in ("0", "false", "off", ""):
+        return None
+    return ResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+        db_path=os.getenv("LLM_CACHE_DB") or None,
+        max_db_entries=int(os.getenv("LLM_CACHE_DB_MAX_ENTRIES", "10000")),
+    )
+
+
+response_cache: Optional[ResponseCache] = _from_env()
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Swap the process-wide cache (or disable it with None)."""
+    global response_cache
+    response_cache = cache
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    return response_cache
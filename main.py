@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from graph import create_graph
+from budget import start_budget
 from langchain_core.messages import HumanMessage
 from langgraph.checkpoint.memory import MemorySaver
 import os
@@ -75,6 +76,7 @@ def run():
                          # This works.
                          print(">> Approved. Resuming...")
                          # We pass None to resume
+                         start_budget(mode=snapshot.values.get("mode"), resume=snapshot.values.get("budget"))
                          for event in app.stream(None, config=config):
                              handle_event(event)
                          continue
@@ -98,7 +100,8 @@ def run():
                 print(f">> Remembered: {pref}")
                 continue
 
-            # Stream
+            # Stream (each input gets its own request budget)
+            start_budget()
             for event in app.stream({"messages": [HumanMessage(content=user_input)]}, config=config):
                 handle_event(event)
 
@@ -117,14 +120,12 @@ def handle_event(event):
                 print(f"  {i+1}. {step}")
             print("")
         elif node == "executor":
-            if "messages" in value:
-                last_msg = value["messages"][-1]
-                if last_msg.tool_calls:
-                    tool_name = last_msg.tool_calls[0]["name"]
-                    print(f"  [Executor] 🧠 Reasoning: I need to use {tool_name}...")
-                    print(f"  [Executor] Calling tool: {tool_name}")
-                else:
-                    print(f"  [Executor] Step output: {last_msg.content[:100]}...")
+            for idx, result in value.get("step_results", {}).items():
+                for call in result["pending_calls"]:
+                    print(f"  [Executor] Step {idx+1} queued tool: {call['name']}")
+            for record in value.get("research_notes", []):
+                if record["source"] == "answer":
+                    print(f"  [Executor] Step {record['step']+1} output: {record['text'][:100]}...")
         elif node == "explain_node":
              print("\n[Meta-Agent] Explanation:\n")
              print(value["messages"][-1].content)
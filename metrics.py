@@ -0,0 +1,275 @@
+# pyright: basic
+"""In-process metrics in the Prometheus text exposition format (GET /metrics).
+
+Counters, gauges and histograms are plain dicts keyed by label values, each
+guarded by its own lock, so recording a sample costs a dict lookup and a few
+additions; nothing is computed until a scrape renders them. Values that are
+expensive to read (the checkpoint store size) are set by an `on_scrape`
+function, which runs once at the start of every scrape.
+
+Graph nodes are timed by `instrument_node` (wired up in `create_graph`), which
+also records the running node so `safe_invoke` and the tools can label their
+samples with it.
+"""
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+import functools
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind: str = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels: Tuple[str, ...] = tuple(labels)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _series(self, values: LabelValues, extra: str = "") -> str:
+        pairs: List[str] = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Sample lines of the metric, without the HELP and TYPE header."""
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0.0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items: List[Tuple[LabelValues, float]] = list(self._values.items())
+        return [f"{self.name}{self._series(k)} {_format(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0.0) + amount
+
+    def dec(self, *values: str, amount: float = 1.0) -> None:
+        self.inc(*values, amount=-amount)
+
+    def set(self, value: float, *values: str) -> None:
+        with self._lock:
+            self._values[values] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items: List[Tuple[LabelValues, float]] = list(self._values.items())
+        return [f"{self.name}{self._series(k)} {_format(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *values: str) -> None:
+        slot: int = bisect_left(self.buckets, value)
+        with self._lock:
+            entry: Optional[Tuple[List[int], List[float]]] = self._values.get(values)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[values] = entry
+            entry[0][slot] += 1
+            entry[1][0] += value
+
+    def totals(self) -> Dict[LabelValues, Tuple[int, float]]:
+        """(count, sum) of the observations for every label set."""
+        with self._lock:
+            return {k: (sum(counts), total[0]) for k, (counts, total) in self._values.items()}
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items: List[Tuple[LabelValues, List[int], float]] = [
+                (k, list(counts), total[0]) for k, (counts, total) in self._values.items()
+            ]
+        lines: List[str] = []
+        for key, counts, total in items:
+            cumulative: int = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le: str = 'le="' + _format(bound) + '"'
+                lines.append(f"{self.name}_bucket{self._series(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._series(key)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._series(key)} {cumulative}")
+        return lines
+
+
+_REGISTRY: List[_Metric] = []
+_ON_SCRAPE: List[Callable[[], None]] = []
+
+
+def on_scrape(function: Callable[[], None]) -> None:
+    """Run `function` once before every scrape, to set gauges that are costly to read."""
+    _ON_SCRAPE.append(function)
+
+
+def render_metrics() -> str:
+    for function in list(_ON_SCRAPE):
+        try:
+            function()
+        except Exception as exc:
+            log.debug("scrape hook %s failed: %s", getattr(function, "__name__", function), exc)
+    lines: List[str] = []
+    for metric in list(_REGISTRY):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── Agent metrics ───────────────────────────────────────────────────────
+NODE_SECONDS = Histogram(
+    "agent_node_duration_seconds", "Wall time of one graph node run.", ("node",)
+)
+NODE_ERRORS = Counter(
+    "agent_node_errors_total", "Graph node runs that raised.", ("node",)
+)
+LLM_CALLS = Counter(
+    "agent_llm_calls_total",
+    "LLM requests by outcome (ok, error, cached).", ("node", "model", "outcome"),
+)
+LLM_SECONDS = Histogram(
+    "agent_llm_call_duration_seconds", "Latency of one LLM request.", ("node", "model")
+)
+LLM_RETRIES = Counter(
+    "agent_llm_retries_total", "LLM requests retried after a quota error.", ("node", "model")
+)
+LLM_TOKENS = Counter(
+    "agent_llm_tokens_total",
+    "Tokens used by LLM requests (reported usage, else the estimate).", ("node", "model"),
+)
+TOOL_SECONDS = Histogram(
+    "agent_tool_duration_seconds", "Latency of one tool call.", ("tool",)
+)
+TOOL_CALLS = Counter(
+    "agent_tool_calls_total", "Tool calls by outcome (ok, error, refused).", ("tool", "outcome")
+)
+ACTIVE_STREAMS = Gauge("agent_active_streams", "Graph runs currently streaming to a client.")
+ACTIVE_STREAMS.set(0)
+CHECKPOINT_BYTES = Gauge("agent_checkpoint_store_bytes", "Size of the checkpoint store.")
+CHECKPOINT_THREADS = Gauge("agent_checkpoint_threads", "Threads held by the checkpoint store.")
+
+
+# ── Helpers ─────────────────────────────────────────────────────────────
+_node: ContextVar[str] = ContextVar("metrics_node", default="")
+
+
+def current_node() -> str:
+    """Name of the graph node running in this context ("" outside the graph)."""
+    return _node.get()
+
+
+@contextmanager
+def node_timer(name: str) -> Iterator[None]:
+    token: Any = _node.set(name)
+    started: float = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        NODE_ERRORS.inc(name)
+        raise
+    finally:
+        NODE_SECONDS.observe(time.perf_counter() - started, name)
+        _node.reset(token)
+
+
+def instrument_node(name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    """Time every run of the node function `func` under the label `name`."""
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def arun(*args: Any, **kwargs: Any) -> Any:
+            with node_timer(name):
+                return await func(*args, **kwargs)
+        return arun
+
+    @functools.wraps(func)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        with node_timer(name):
+            return func(*args, **kwargs)
+    return run
+
+
+def model_label(runnable: Any) -> str:
+    """Model name behind a chat model, a `bind_tools` binding or a structured chain."""
+    for _ in range(4):
+        name: Any = getattr(runnable, "model", None) or getattr(runnable, "model_name", None)
+        if isinstance(name, str):
+            return name.removeprefix("models/")
+        runnable = getattr(runnable, "bound", None) or getattr(runnable, "first", None)
+        if runnable is None:
+            break
+    return "unknown"
+
+
+def observe_tool(name: str, seconds: float, outcome: str) -> None:
+    TOOL_CALLS.inc(name, outcome)
+    TOOL_SECONDS.observe(seconds, name)
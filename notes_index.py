@@ -0,0 +1,173 @@
+# pyright: basic
+"""Incremental BM25 index over the saved notes in `notes/`.
+
+Every entry `save_to_notes` appends (one `--- <timestamp> ---` block) is a
+document. A file is re-indexed when `save_to_notes` reports a write or when
+its mtime/size no longer match what was indexed; unchanged files are never
+re-read, so a search costs one directory scan plus the posting lookups.
+"""
+from __future__ import annotations
+
+import os
+import re
+import math
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+NOTES_DIR: str = "notes"
+
+_ENTRY_RE = re.compile(r"^--- (.+?) ---$", re.MULTILINE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the to was were with".split()
+)
+
+# BM25 parameters
+K1: float = 1.5
+B: float = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def split_entries(text: str) -> List[Tuple[str, str]]:
+    """(timestamp, body) for each saved entry; text before the first marker
+    is kept as an undated entry."""
+    entries: List[Tuple[str, str]] = []
+    marks: List[Any] = list(_ENTRY_RE.finditer(text))
+    head: str = text[: marks[0].start()] if marks else text
+    if head.strip():
+        entries.append(("", head.strip()))
+    for i, mark in enumerate(marks):
+        end: int = marks[i + 1].start() if i + 1 < len(marks) else len(text)
+        body: str = text[mark.end():end].strip()
+        if body:
+            entries.append((mark.group(1), body))
+    return entries
+
+
+class NotesIndex:
+    def __init__(self, directory: str = NOTES_DIR) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[float, int]] = {}          # path -> (mtime, size)
+        self._docs: Dict[int, Dict[str, Any]] = {}              # doc id -> entry
+        self._file_docs: Dict[str, List[int]] = {}              # path -> doc ids
+        self._postings: Dict[str, Dict[int, int]] = {}          # term -> {doc id: tf}
+        self._total_length: int = 0
+        self._next_id: int = 0
+        self.counters: Dict[str, int] = {"searches": 0, "files_indexed": 0, "files_removed": 0}
+
+    # ── Maintenance ─────────────────────────────────────────────────────
+    def _drop_file(self, path: str) -> None:
+        for doc_id in self._file_docs.pop(path, []):
+            doc: Dict[str, Any] = self._docs.pop(doc_id)
+            self._total_length -= doc["length"]
+            for term in doc["terms"]:
+                postings: Dict[int, int] = self._postings[term]
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._files.pop(path, None)
+
+    def _index_file(self, path: str, stat: os.stat_result) -> None:
+        self._drop_file(path)
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                text: str = f.read()
+        except OSError:
+            return
+        ids: List[int] = []
+        for timestamp, body in split_entries(text):
+            counts: Counter[str] = Counter(tokenize(body))
+            doc_id: int = self._next_id
+            self._next_id += 1
+            length: int = sum(counts.values())
+            self._docs[doc_id] = {
+                "file": os.path.basename(path),
+                "timestamp": timestamp,
+                "text": body,
+                "length": length,
+                "terms": list(counts),
+            }
+            self._total_length += length
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            ids.append(doc_id)
+        self._file_docs[path] = ids
+        self._files[path] = (stat.st_mtime, stat.st_size)
+        self.counters["files_indexed"] += 1
+
+    def refresh(self) -> None:
+        """Re-index changed files and forget deleted ones."""
+        seen: Dict[str, os.stat_result] = {}
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(".txt"):
+                    seen[entry.path] = entry.stat()
+        with self._lock:
+            for path in [p for p in self._files if p not in seen]:
+                self._drop_file(path)
+                self.counters["files_removed"] += 1
+            for path, stat in seen.items():
+                if self._files.get(path) != (stat.st_mtime, stat.st_size):
+                    self._index_file(path, stat)
+
+    def update(self, path: str) -> None:
+        """Re-index one file right after it was written."""
+        try:
+            stat: os.stat_result = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._drop_file(path)
+            return
+        with self._lock:
+            self._index_file(path, stat)
+
+    # ── Queries ─────────────────────────────────────────────────────────
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        self.refresh()
+        terms: List[str] = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            self.counters["searches"] += 1
+            count: int = len(self._docs)
+            if not count or not terms:
+                return []
+            average: float = self._total_length / count or 1.0
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings: Optional[Dict[int, int]] = self._postings.get(term)
+                if not postings:
+                    continue
+                idf: float = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm: float = K1 * (1 - B + B * self._docs[doc_id]["length"] / average)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+            best: List[Tuple[int, float]] = sorted(scores.items(), key=lambda s: -s[1])[:k]
+            return [
+                {
+                    "file": self._docs[doc_id]["file"],
+                    "timestamp": self._docs[doc_id]["timestamp"],
+                    "text": self._docs[doc_id]["text"],
+                    "score": round(score, 3),
+                }
+                for doc_id, score in best
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                "files": len(self._files),
+                "entries": len(self._docs),
+                "terms": len(self._postings),
+            }
+
+
+notes_index: NotesIndex = NotesIndex()
+
+
+def get_notes_index() -> NotesIndex:
+    return notes_index
@@ -0,0 +1,235 @@
+# pyright: basic
+"""Process-wide Gemini rate limiter.
+
+Every `safe_invoke` call acquires one request and an estimated token count
+from two token buckets (requests-per-minute and tokens-per-minute). Callers
+are served strictly first-come first-served, from threads and coroutines
+alike. A quota error pauses the whole queue for the server's retry-after hint
+(plus jitter) instead of letting every caller back off and retry on its own.
+
+Buckets live in one process, so with WORKERS API processes each one gets
+1/WORKERS of GEMINI_RPM and GEMINI_TPM and together they stay within quota.
+The split assumes requests spread evenly over the workers, which the shared
+socket does not guarantee: a worker that gets more than its share throttles
+early while quota goes unused elsewhere. Raise GEMINI_RPM a little above
+the real quota if that costs too much, and rely on the quota pause.
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Output tokens we reserve per call before the real usage is known.
+RESPONSE_TOKEN_ALLOWANCE: int = 512
+
+_RETRY_PATTERNS: List["re.Pattern[str]"] = [
+    re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+    re.compile(r"retry[_-]?delay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+    re.compile(r"retry[_-]?after['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)", re.IGNORECASE),
+]
+
+
+def parse_retry_after(message: str) -> Optional[float]:
+    """Extract a retry delay in seconds from a quota error message, if present."""
+    for pattern in _RETRY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def jittered(seconds: float, spread: float = 0.25) -> float:
+    return seconds + random.uniform(0, seconds * spread)
+
+
+def estimate_tokens(input_data: Any) -> int:
+    messages: List[Any] = input_data if isinstance(input_data, list) else [input_data]
+    chars: int = sum(len(str(getattr(m, "content", m))) for m in messages)
+    return chars // 4 + len(messages) + RESPONSE_TOKEN_ALLOWANCE
+
+
+def usage_tokens(result: Any) -> Optional[int]:
+    usage: Any = getattr(result, "usage_metadata", None)
+    if isinstance(usage, dict) and usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        needed: float = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class Reservation:
+    """One acquired call: when it was admitted and the tokens charged for it."""
+    __slots__ = ("at", "tokens")
+
+    def __init__(self, at: float, tokens: int) -> None:
+        self.at = at
+        self.tokens = tokens
+
+
+class RateLimiter:
+    # Waiters that are not at the head of the queue re-check this often.
+    POLL_SECONDS: float = 0.05
+
+    def __init__(self, rpm: float, tpm: float) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._queue: Deque[object] = deque()
+        self._paused_until: float = 0.0
+        self._window: Deque[Reservation] = deque()
+        self.counters: Dict[str, float] = {
+            "acquired": 0, "delayed": 0, "wait_seconds": 0.0, "penalties": 0,
+        }
+
+    # Caller must hold self._lock. Drops reservations older than a minute.
+    def _prune_window(self, now: float) -> None:
+        while self._window and now - self._window[0].at > 60:
+            self._window.popleft()
+
+    # Caller must hold self._lock. Returns 0 when the slot was taken (and
+    # appends its reservation to the window), otherwise how long to wait.
+    def _try_take(self, waiter: object, tokens: int) -> float:
+        now: float = time.monotonic()
+        if self._queue[0] is not waiter:
+            return self.POLL_SECONDS
+        if now < self._paused_until:
+            return self._paused_until - now
+        wait: float = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        self._queue.popleft()
+        at: float = time.time()
+        self._prune_window(at)
+        self._window.append(Reservation(at, tokens))
+        self.counters["acquired"] += 1
+        self._cond.notify_all()
+        return 0.0
+
+    def _abandon(self, waiter: object) -> None:
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+            self._cond.notify_all()
+
+    def _account(self, started: float) -> None:
+        waited: float = time.monotonic() - started
+        if waited > 0.001:
+            with self._lock:
+                self.counters["delayed"] += 1
+                self.counters["wait_seconds"] += waited
+
+    def acquire(self, tokens: int) -> Reservation:
+        waiter: object = object()
+        started: float = time.monotonic()
+        try:
+            with self._cond:
+                self._queue.append(waiter)
+                while True:
+                    wait: float = self._try_take(waiter, tokens)
+                    if wait <= 0:
+                        reservation: Reservation = self._window[-1]
+                        break
+                    self._cond.wait(timeout=min(wait, 1.0))
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        self._account(started)
+        return reservation
+
+    async def aacquire(self, tokens: int) -> Reservation:
+        waiter: object = object()
+        started: float = time.monotonic()
+        with self._lock:
+            self._queue.append(waiter)
+        try:
+            while True:
+                with self._lock:
+                    wait: float = self._try_take(waiter, tokens)
+                    if wait <= 0:
+                        reservation: Reservation = self._window[-1]
+                        break
+                await asyncio.sleep(min(wait, 1.0))
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        self._account(started)
+        return reservation
+
+    def record_usage(self, reservation: Reservation, actual: Optional[int]) -> None:
+        """Settle a call's reservation once its real usage is known."""
+        if actual is None:
+            return
+        with self._lock:
+            self._tokens.tokens -= actual - reservation.tokens
+            reservation.tokens = actual
+
+    def penalize(self, seconds: float) -> None:
+        """Pause every caller, e.g. after a 429 with a retry-after hint."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.counters["penalties"] += 1
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune_window(time.time())
+            return {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "requests_last_minute": len(self._window),
+                "tokens_last_minute": sum(r.tokens for r in self._window),
+                "queue_depth": len(self._queue),
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+                **self.counters,
+            }
+
+
+def _from_env() -> Optional[RateLimiter]:
+    if os.getenv("RATE_LIMIT", "1").lower() in ("0", "false", "off", ""):
+        return None
+    workers: int = max(1, int(os.getenv("WORKERS", "1")))
+    return RateLimiter(
+        rpm=float(os.getenv("GEMINI_RPM", "30")) / workers,
+        tpm=float(os.getenv("GEMINI_TPM", "1000000")) / workers,
+    )
+
+
+rate_limiter: Optional[RateLimiter] = _from_env()
+
+
+def set_rate_limiter(limiter: Optional[RateLimiter]) -> None:
+    global rate_limiter
+    rate_limiter = limiter
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    return rate_limiter
@@ -0,0 +1,119 @@
+# pyright: basic
+"""Structured research notes.
+
+Each research step appends `NoteRecord`s (its tool outputs and its answer) to
+`AgentState.research_notes` through the `append_notes` reducer, so a step's
+update carries only its own records. Executors read the records relevant to
+their step within NOTES_STEP_TOKENS; the reporter reads a de-duplicated view
+bounded by NOTES_REPORT_TOKENS.
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Set, TypedDict
+
+from context import count_tokens
+
+NOTES_STEP_TOKENS: int = int(os.getenv("NOTES_STEP_TOKENS", "1500"))
+NOTES_REPORT_TOKENS: int = int(os.getenv("NOTES_REPORT_TOKENS", "6000"))
+
+ANSWER: str = "answer"
+
+_WORD_RE = re.compile(r"[a-z0-9]{3,}")
+
+
+class NoteRecord(TypedDict):
+    step: int
+    source: str
+    text: str
+    tokens: int
+
+
+def note(step: int, source: str, text: str) -> NoteRecord:
+    return {"step": step, "source": source, "text": text, "tokens": count_tokens(text)}
+
+
+def append_notes(
+    left: Optional[List[NoteRecord]], right: Optional[List[NoteRecord]]
+) -> List[NoteRecord]:
+    """Reducer: append new records; writing None resets the notes for a new plan."""
+    if right is None:
+        return []
+    return [*(left or []), *right]
+
+
+def _terms(text: str) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def _clip(record: NoteRecord, budget: int) -> str:
+    if record["tokens"] <= budget:
+        return record["text"]
+    return record["text"][: max(budget, 0) * 4] + " …"
+
+
+def _render(records: Sequence[NoteRecord], texts: Dict[int, str]) -> str:
+    parts: List[str] = []
+    for index, record in sorted(enumerate(records), key=lambda r: (r[1]["step"], r[0])):
+        if index not in texts:
+            continue
+        label: str = "Result" if record["source"] == ANSWER else f"Source ({record['source']})"
+        parts.append(f"\n\nStep {record['step'] + 1} {label}:\n{texts[index]}")
+    return "".join(parts)
+
+
+def notes_for_step(
+    records: Sequence[NoteRecord],
+    step: str,
+    depends_on: Sequence[int],
+    budget: int = NOTES_STEP_TOKENS,
+) -> str:
+    """Notes an executor needs for `step`: answers of the steps it depends on
+    first, then other records ranked by term overlap, until `budget` is spent."""
+    wanted: Set[str] = _terms(step)
+    deps: Set[int] = set(depends_on)
+
+    def rank(item: Any) -> Any:
+        index, record = item
+        overlap: int = len(wanted & _terms(record["text"]))
+        return (record["step"] not in deps, record["source"] != ANSWER, -overlap, index)
+
+    chosen: Dict[int, str] = {}
+    left: int = budget
+    for index, record in sorted(enumerate(records), key=rank):
+        if left <= 0:
+            break
+        related: bool = record["step"] in deps or bool(wanted & _terms(record["text"]))
+        if not related:
+            continue
+        chosen[index] = _clip(record, left)
+        left -= min(record["tokens"], left)
+    return _render(records, chosen)
+
+
+def report_view(records: Sequence[NoteRecord], budget: int = NOTES_REPORT_TOKENS) -> str:
+    """Compact notes for the reporter: step answers first, then sources, with
+    paragraphs already seen in an earlier record dropped."""
+    seen: Set[str] = set()
+    chosen: Dict[int, str] = {}
+    left: int = budget
+    order: List[int] = sorted(
+        range(len(records)), key=lambda i: (records[i]["source"] != ANSWER, i)
+    )
+    for index in order:
+        if left <= 0:
+            break
+        kept: List[str] = []
+        for paragraph in records[index]["text"].split("\n"):
+            key: str = " ".join(paragraph.lower().split())
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            kept.append(paragraph)
+        if not kept:
+            continue
+        compact: NoteRecord = note(records[index]["step"], records[index]["source"], "\n".join(kept))
+        chosen[index] = _clip(compact, left)
+        left -= min(compact["tokens"], left)
+    return _render(records, chosen)
@@ -0,0 +1,111 @@
+# pyright: basic
+"""Local first pass of `validator_node`.
+
+Cheap checks settle most answers without the LLM reviewer: empty answers,
+answers that only repeat a tool result, and canned refusals fail with
+feedback; short answers pass. Only longer answers are inconclusive and go on
+to the structured Gemini review. A turn is sent back for another attempt at
+most REVIEW_MAX_RETRIES times; after that the validator passes the answer
+through without reviewing it.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+REVIEW_MAX_RETRIES: int = int(os.getenv("REVIEW_MAX_RETRIES", "2"))
+# Answers shorter than this pass without the LLM reviewer.
+REVIEW_PASS_CHARS: int = int(os.getenv("REVIEW_PASS_CHARS", "600"))
+# A short tool result (e.g. "42" from calculate) is a fine answer on its own.
+RAW_TOOL_CHARS: int = 200
+
+_REFUSAL_RE = re.compile(
+    r"^\W*(i('m| am) (sorry|unable|not able)|i (can't|cannot|can not|won't)|"
+    r"as an ai\b|unfortunately,? i (can't|cannot|am unable))",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class ReviewDecision:
+    verdict: str  # "pass" | "fail" | "unsure"
+    reason: str
+    feedback: str = ""
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split())
+
+
+def local_review(answer: str, tool_outputs: Sequence[str] = ()) -> ReviewDecision:
+    """Judge `answer` without the LLM where the outcome is obvious."""
+    text: str = answer.strip()
+    if not text:
+        return ReviewDecision(
+            "fail", "empty", "The answer was empty. Reply to the user's request directly."
+        )
+    if _REFUSAL_RE.match(text):
+        return ReviewDecision(
+            "fail", "refusal",
+            "The answer declined the request. Use the available tools or explain "
+            "specifically what is missing instead of refusing.",
+        )
+    squashed: str = _squash(text)
+    raw: List[str] = [_squash(out) for out in tool_outputs if len(out.strip()) >= RAW_TOOL_CHARS]
+    if squashed in raw:
+        return ReviewDecision(
+            "fail", "tool_only",
+            "The answer only repeated a raw tool result. Answer the question in "
+            "your own words using that result.",
+        )
+    if len(text) < REVIEW_PASS_CHARS:
+        return ReviewDecision("pass", "short")
+    return ReviewDecision("unsure", "long")
+
+
+class ReviewStats:
+    """How validator visits were settled, and how many LLM calls that saved."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "reviews": 0, "local_pass": 0, "local_fail": 0,
+            "llm_reviews": 0, "llm_pass": 0, "llm_fail": 0,
+            "capped": 0, "retries": 0,
+        }
+        self.reasons: Dict[str, int] = {}
+
+    def record(self, outcome: str, reason: Optional[str] = None, retry: bool = False) -> None:
+        with self._lock:
+            self.counters["reviews"] += 1
+            self.counters[outcome] += 1
+            if outcome.startswith("llm_"):
+                self.counters["llm_reviews"] += 1
+            if retry:
+                self.counters["retries"] += 1
+            if reason:
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c: Dict[str, int] = dict(self.counters)
+            reasons: Dict[str, int] = dict(self.reasons)
+        skipped: int = c["local_pass"] + c["local_fail"] + c["capped"]
+        return {
+            **c,
+            "llm_calls_saved": skipped,
+            "skip_rate": skipped / c["reviews"] if c["reviews"] else None,
+            "local_reasons": reasons,
+            "max_retries": REVIEW_MAX_RETRIES,
+            "pass_chars": REVIEW_PASS_CHARS,
+        }
+
+
+review_stats: ReviewStats = ReviewStats()
+
+
+def get_review_stats() -> ReviewStats:
+    return review_stats
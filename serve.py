@@ -0,0 +1,46 @@
+# pyright: basic
+"""Start the API with N worker processes sharing one checkpoint database.
+
+    python serve.py --workers 4 [--port 8000] [--db checkpoints.db]
+
+uvicorn forks the workers and they accept on the same socket, so any of them
+may get a request for any thread. They keep their checkpoints, and with them
+the runs paused for approval, in one SQLite file (CHECKPOINTER=sqlite, WAL
+mode), and a lease in that file lets only one request at a time run a thread.
+WORKERS is exported so each worker also takes its share of the Gemini quota.
+"""
+from __future__ import annotations
+
+import os
+import argparse
+
+from dotenv import load_dotenv  # type: ignore[import-untyped]
+import uvicorn  # type: ignore[import-untyped]
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--workers", type=int,
+        default=int(os.getenv("WORKERS") or os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1),
+        help="worker processes (default: WORKERS, WEB_CONCURRENCY or the CPU count)",
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--db", default=os.getenv("CHECKPOINT_DB", "checkpoints.db"))
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # Read by the workers when they import api.
+    os.environ["WORKERS"] = str(args.workers)
+    os.environ["CHECKPOINT_DB"] = os.path.abspath(args.db)
+    if args.workers > 1:
+        os.environ.setdefault("CHECKPOINTER", "sqlite")
+    print(f"[serve] {args.workers} worker(s) on {args.host}:{args.port}, checkpoints in {args.db}")
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
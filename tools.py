@@ -1,21 +1,76 @@
 # pyright: basic
 from __future__ import annotations
 
-from langchain.tools import tool  # type: ignore[import-untyped]
+from langchain_core.tools import tool  # type: ignore[import-untyped]
 from datetime import datetime
 import os
+import re
 import time
 import json
-import requests
-from typing import Any, Callable, List, Optional
+import asyncio
+import logging
+import functools
+import httpx  # type: ignore[import-untyped]
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from dotenv import load_dotenv  # type: ignore[import-untyped]
-from tavily import TavilyClient  # type: ignore[import-untyped]
+
+from budget import RequestBudget, current_budget
+from cassette import Cassette, get_cassette, tool_key
+from calculator import calculate_expression
+from metrics import observe_tool
+from notes_index import get_notes_index
+from ttl_cache import SingleFlightCache
+from zapier_client import ZapierServiceError, get_zapier_client
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 _TAVILY_KEY: Optional[str] = os.getenv("TAVILY_API_KEY")
-tavily: Optional[Any] = TavilyClient(api_key=_TAVILY_KEY) if _TAVILY_KEY else None
-ZAPIER_SERVICE_URL: str = os.getenv("ZAPIER_SERVICE_URL", "http://localhost:3001")
+_tavily: Optional[Any] = None
+_atavily: Optional[Any] = None
+
+# Shared across threads, plan steps and users: identical queries within the
+# TTL are answered from memory and concurrent ones share one Tavily request.
+search_cache: SingleFlightCache = SingleFlightCache(
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "900")),
+    max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "256")),
+)
+
+SEARCH_BATCH_MAX_QUERIES: int = 5
+SEARCH_BATCH_CONCURRENCY: int = int(os.getenv("SEARCH_BATCH_CONCURRENCY", "4"))
+SEARCH_QUERY_TIMEOUT: float = float(os.getenv("SEARCH_QUERY_TIMEOUT", "15"))
+
+
+def get_tavily() -> Optional[Any]:
+    """Sync Tavily client, built on first use (None without an API key)."""
+    global _tavily
+    if _tavily is None and _TAVILY_KEY:
+        from tavily import TavilyClient  # type: ignore[import-untyped]
+        _tavily = TavilyClient(api_key=_TAVILY_KEY)
+    return _tavily
+
+
+def get_atavily() -> Optional[Any]:
+    """Async Tavily client, built on first use (None without an API key)."""
+    global _atavily
+    if _atavily is None and _TAVILY_KEY:
+        from tavily import AsyncTavilyClient  # type: ignore[import-untyped]
+        _atavily = AsyncTavilyClient(api_key=_TAVILY_KEY)
+    return _atavily
+
+
+def set_tavily(client: Optional[Any], aclient: Optional[Any] = None) -> None:
+    """Swap the search clients, e.g. for the stand-ins in benchmarks/fakes.py."""
+    global _tavily, _atavily
+    _tavily, _atavily = client, aclient
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a search: case-, whitespace- and edge-punctuation-insensitive."""
+    return re.sub(r"\s+", " ", query.lower()).strip(" ?!.,;:\"'")
 
 
 def retry_operation(
@@ -36,17 +91,183 @@ def retry_operation(
     return f"Error after {retries} retries: {last_error}"
 
 
+async def aretry_operation(
+    func: Callable[[], Awaitable[str]],
+    retries: int = 3,
+    delay: int = 1,
+) -> str:
+    """Async twin of `retry_operation`; waits with `asyncio.sleep` between attempts."""
+    last_error: str = "Unknown error"
+    for attempt in range(retries):
+        try:
+            result: str = await func()
+            return result
+        except Exception as exc:
+            last_error = str(exc)
+            if attempt < retries - 1:
+                await asyncio.sleep(delay)
+    return f"Error after {retries} retries: {last_error}"
+
+
+def _fetch_results(query: str) -> List[Dict[str, str]]:
+    client: Optional[Any] = get_tavily()
+    assert client is not None
+    results: Any = client.search(query, max_results=5)
+    return [
+        {"url": str(r.get("url", "")), "content": str(r["content"])}
+        for r in results["results"]
+    ]
+
+
+async def _afetch_results(query: str) -> List[Dict[str, str]]:
+    client: Optional[Any] = get_atavily()
+    assert client is not None
+    results: Any = await client.search(query, max_results=5)
+    return [
+        {"url": str(r.get("url", "")), "content": str(r["content"])}
+        for r in results["results"]
+    ]
+
+
+def _cached_results(query: str) -> List[Dict[str, str]]:
+    return search_cache.get_or_load(normalize_query(query), lambda: _fetch_results(query))
+
+
+async def _acached_results(query: str) -> List[Dict[str, str]]:
+    return await search_cache.aget_or_load(
+        normalize_query(query), lambda: _afetch_results(query)
+    )
+
+
+def _join_contents(results: List[Dict[str, str]]) -> str:
+    return "\n".join(r["content"] for r in results)
+
+
 @tool  # type: ignore[misc]
 def search_web(query: str) -> str:
     """Search the web for up-to-date information. Handles retries automatically."""
-    if tavily is None:
+    if get_tavily() is None:
         return "Web search unavailable: TAVILY_API_KEY not set in .env"
+    return retry_operation(lambda: _join_contents(_cached_results(query)))
 
-    def _search() -> str:
-        results: Any = tavily.search(query, max_results=5)
-        return "\n".join([str(r["content"]) for r in results["results"]])
 
-    return retry_operation(_search)
+async def _asearch_web(query: str) -> str:
+    if get_atavily() is None:
+        return "Web search unavailable: TAVILY_API_KEY not set in .env"
+
+    async def _search() -> str:
+        return _join_contents(await _acached_results(query))
+
+    return await aretry_operation(_search)
+
+
+def _unique_queries(queries: List[str]) -> List[str]:
+    seen: Dict[str, str] = {}
+    for query in queries:
+        key: str = normalize_query(str(query))
+        if key and key not in seen:
+            seen[key] = str(query).strip()
+    return list(seen.values())[:SEARCH_BATCH_MAX_QUERIES]
+
+
+def _merge_batch(
+    queries: List[str], outcomes: Dict[str, Union[List[Dict[str, str]], str]]
+) -> str:
+    """Merge per-query results, de-duplicating sources and attributing each to
+    every query (by number) that returned it."""
+    merged: "Dict[str, Dict[str, Any]]" = {}
+    errors: List[str] = []
+    for number, query in enumerate(queries, start=1):
+        outcome: Union[List[Dict[str, str]], str] = outcomes.get(query, "no result")
+        if isinstance(outcome, str):
+            errors.append(f"Query {number} failed: {outcome}")
+            continue
+        for result in outcome:
+            key: str = result["url"] or result["content"][:200]
+            entry: Dict[str, Any] = merged.setdefault(key, {**result, "queries": []})
+            entry["queries"].append(number)
+
+    lines: List[str] = [f"Batch search: {len(queries)} queries, {len(merged)} unique sources."]
+    lines += [f"Query {n}: {q}" for n, q in enumerate(queries, start=1)]
+    for index, entry in enumerate(merged.values(), start=1):
+        found_by: str = ", ".join(str(n) for n in entry["queries"])
+        lines.append(f"\n[{index}] {entry['url'] or 'no url'} (queries: {found_by})")
+        lines.append(entry["content"])
+    if errors:
+        lines.append("")
+        lines += errors
+    return "\n".join(lines)
+
+
+@tool  # type: ignore[misc]
+def search_web_batch(queries: List[str]) -> str:
+    """Search the web for several queries at once (e.g. 2-5 angles of one research step).
+
+    Queries run concurrently; results are merged, de-duplicated and labelled with
+    the query numbers that found them. Prefer this over repeated search_web calls.
+    """
+    if get_tavily() is None:
+        return "Web search unavailable: TAVILY_API_KEY not set in .env"
+    unique: List[str] = _unique_queries(queries)
+    if not unique:
+        return "No queries given."
+    outcomes: Dict[str, Union[List[Dict[str, str]], str]] = {}
+    # Like the async path: at most SEARCH_BATCH_CONCURRENCY queries in flight,
+    # each with its own SEARCH_QUERY_TIMEOUT from the moment it starts. A
+    # timed-out query frees its slot; the pool has a thread for every query,
+    # so the abandoned search never holds up the ones still queued.
+    queued: List[str] = list(unique)
+    running: Dict[Any, Tuple[str, float]] = {}
+    pool = ThreadPoolExecutor(max_workers=len(unique))
+    try:
+        while queued or running:
+            while queued and len(running) < SEARCH_BATCH_CONCURRENCY:
+                query: str = queued.pop(0)
+                future: Any = pool.submit(_cached_results, query)
+                running[future] = (query, time.monotonic() + SEARCH_QUERY_TIMEOUT)
+            next_deadline: float = min(deadline for _, deadline in running.values())
+            done, _ = wait(
+                running, timeout=max(0.0, next_deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                query = running.pop(future)[0]
+                try:
+                    outcomes[query] = future.result()
+                except Exception as exc:
+                    outcomes[query] = str(exc)
+            now: float = time.monotonic()
+            for future, (query, deadline) in list(running.items()):
+                if deadline <= now:
+                    del running[future]
+                    outcomes[query] = f"timed out after {SEARCH_QUERY_TIMEOUT:g}s"
+    finally:
+        # Timed-out searches keep running in the background; don't wait on them.
+        pool.shutdown(wait=False, cancel_futures=True)
+    return _merge_batch(unique, outcomes)
+
+
+async def _asearch_web_batch(queries: List[str]) -> str:
+    if get_atavily() is None:
+        return "Web search unavailable: TAVILY_API_KEY not set in .env"
+    unique: List[str] = _unique_queries(queries)
+    if not unique:
+        return "No queries given."
+    limit = asyncio.Semaphore(SEARCH_BATCH_CONCURRENCY)
+
+    async def _one(query: str) -> Union[List[Dict[str, str]], str]:
+        async with limit:
+            try:
+                return await asyncio.wait_for(_acached_results(query), SEARCH_QUERY_TIMEOUT)
+            except asyncio.TimeoutError:
+                return f"timed out after {SEARCH_QUERY_TIMEOUT:g}s"
+            except Exception as exc:
+                return str(exc)
+
+    results: List[Union[List[Dict[str, str]], str]] = await asyncio.gather(
+        *(_one(q) for q in unique)
+    )
+    return _merge_batch(unique, dict(zip(unique, results)))
 
 
 @tool  # type: ignore[misc]
@@ -62,17 +283,43 @@ def save_to_notes(content: str, topic: str = "general") -> str:
         with open(filepath, "a", encoding="utf-8") as f:
             f.write(f"\n\n--- {datetime.now()} ---\n")
             f.write(content)
+        get_notes_index().update(filepath)
         return f"Saved to notes/{filename}.txt"
     except Exception as exc:
         return f"Error saving notes: {exc}"
 
 
+SEARCH_NOTES_RESULTS: int = 5
+SEARCH_NOTES_CHARS: int = 800
+
+
+@tool  # type: ignore[misc]
+def search_notes(query: str) -> str:
+    """Search previously saved research notes. Check here before searching the web."""
+    hits: List[Dict[str, Any]] = get_notes_index().search(query, k=SEARCH_NOTES_RESULTS * 2)
+    lines: List[str] = []
+    seen: set = set()
+    for hit in hits:
+        if hit["text"] in seen:
+            continue
+        seen.add(hit["text"])
+        lines.append(f"[{len(seen)}] notes/{hit['file']} ({hit['timestamp'] or 'undated'})")
+        lines.append(hit["text"][:SEARCH_NOTES_CHARS])
+        if len(seen) >= SEARCH_NOTES_RESULTS:
+            break
+    if not lines:
+        return f"No saved notes match: {query}"
+    return "\n".join(lines)
+
+
 @tool  # type: ignore[misc]
 def calculate(expression: str) -> str:
-    """Perform mathematical calculations safely."""
+    """Evaluate a math expression. Supports + - * / // % **, math functions (sqrt, log,
+    exp, sin, round, factorial, ...) and series given as lists or range(a, b, step):
+    sum, mean, median, std, min, max, percentile(series, q), growth(series) for
+    period-over-period rates and cagr(series) or cagr(start, end, periods)."""
     try:
-        result: Any = eval(expression, {"__builtins__": {}})  # noqa: S307
-        return str(result)
+        return calculate_expression(expression)
     except Exception as exc:
         return f"Calculation error: {exc}"
 
@@ -108,31 +355,27 @@ def zapier_execute(action: str, params: str) -> str:
     - params must be valid JSON with double-quoted keys and string values
     """
     try:
-        params_dict: dict[str, Any] = (
-            json.loads(params) if isinstance(params, str) else dict(params)
-        )
-        response = requests.post(
-            f"{ZAPIER_SERVICE_URL}/actions/dispatch",
-            json={"action": action, "params": params_dict},
-            timeout=30,
-        )
-        if response.status_code == 200:
-            data: dict[str, Any] = response.json()
-            return f"Action '{action}' succeeded: {data.get('message', 'Done')}"
-        try:
-            err: str = str(response.json().get("error", response.text))
-        except Exception:
-            err = response.text
-        return f"Action '{action}' failed (HTTP {response.status_code}): {err}"
-    except requests.exceptions.ConnectionError:
+        data: dict[str, Any] = get_zapier_client().dispatch(action, _action_params(params))
+        return f"Action '{action}' succeeded: {data.get('message', 'Done')}"
+    except Exception as exc:
+        return _zapier_execute_error(action, exc)
+
+
+def _action_params(params: Any) -> dict[str, Any]:
+    return json.loads(params) if isinstance(params, str) else dict(params)
+
+
+def _zapier_execute_error(action: str, exc: Exception) -> str:
+    if isinstance(exc, ZapierServiceError):
+        return f"Action '{action}' failed (HTTP {exc.status}): {exc.error}"
+    if isinstance(exc, httpx.ConnectError):
         return (
             "Zapier service is not running. "
             "Start it: cd zapier-service && node server.js"
         )
-    except json.JSONDecodeError as exc:
+    if isinstance(exc, json.JSONDecodeError):
         return f"Invalid JSON in params: {exc}. Use double-quoted keys and values."
-    except Exception as exc:
-        return f"Unexpected error in zapier_execute: {exc}"
+    return f"Unexpected error in zapier_execute: {exc}"
 
 
 @tool  # type: ignore[misc]
@@ -143,28 +386,183 @@ def list_zapier_connections() -> str:
     (e.g., Gmail, Slack, Google Calendar).
     """
     try:
-        response = requests.get(f"{ZAPIER_SERVICE_URL}/connections", timeout=10)
-        if response.status_code == 200:
-            data: dict[str, Any] = response.json()
-            connections: List[dict[str, Any]] = data.get("connections", [])
-            if not connections:
-                return "No apps connected. Visit zapier.com/app/connections to add apps."
-            lines: List[str] = ["Connected Zapier apps:"]
-            for conn in connections:
-                lines.append(
-                    f"  - {conn.get('app', 'unknown')} "
-                    f"(Label: {conn.get('label', 'N/A')})"
-                )
-            return "\n".join(lines)
-        return f"Could not fetch connections (HTTP {response.status_code})."
-    except requests.exceptions.ConnectionError:
+        return _format_connections(get_zapier_client().connections())
+    except Exception as exc:
+        return _connections_error(exc)
+
+
+def _format_connections(data: dict[str, Any]) -> str:
+    connections: List[dict[str, Any]] = data.get("connections", [])
+    if not connections:
+        return "No apps connected. Visit zapier.com/app/connections to add apps."
+    lines: List[str] = ["Connected Zapier apps:"]
+    for conn in connections:
+        lines.append(
+            f"  - {conn.get('app', 'unknown')} "
+            f"(Label: {conn.get('label', 'N/A')})"
+        )
+    return "\n".join(lines)
+
+
+def _connections_error(exc: Exception) -> str:
+    if isinstance(exc, ZapierServiceError):
+        return f"Could not fetch connections (HTTP {exc.status})."
+    if isinstance(exc, httpx.ConnectError):
         return "Zapier service not running. Start it: cd zapier-service && node server.js"
+    return f"Error checking Zapier connections: {exc}"
+
+
+# ── Async variants ──────────────────────────────────────────────────────
+# `graph.astream` calls tools through `ainvoke`, which uses these coroutines.
+# File tools run on a worker thread; the Zapier tools use the async pool.
+async def _asave_to_notes(content: str, topic: str = "general") -> str:
+    return await asyncio.to_thread(save_to_notes.func, content, topic)
+
+
+async def _asearch_notes(query: str) -> str:
+    # The index refresh stats and reads note files: keep it off the event loop.
+    return str(await asyncio.to_thread(search_notes.func, query))
+
+
+async def _acalculate(expression: str) -> str:
+    return str(calculate.func(expression))
+
+
+async def _azapier_execute(action: str, params: str) -> str:
+    try:
+        data: dict[str, Any] = await get_zapier_client().adispatch(action, _action_params(params))
+        return f"Action '{action}' succeeded: {data.get('message', 'Done')}"
+    except Exception as exc:
+        return _zapier_execute_error(action, exc)
+
+
+async def _alist_zapier_connections() -> str:
+    try:
+        return _format_connections(await get_zapier_client().aconnections())
     except Exception as exc:
-        return f"Error checking Zapier connections: {exc}"
+        return _connections_error(exc)
+
+
+search_web.coroutine = _asearch_web
+search_web_batch.coroutine = _asearch_web_batch
+save_to_notes.coroutine = _asave_to_notes
+search_notes.coroutine = _asearch_notes
+calculate.coroutine = _acalculate
+zapier_execute.coroutine = _azapier_execute
+list_zapier_connections.coroutine = _alist_zapier_connections
+
+
+# ── Record/replay ───────────────────────────────────────────────────────
+# Calls that leave the process go through the cassette (cassette.py) when
+# CASSETTE_MODE is set: recorded with their latency, or served back from it.
+def _recorded(t: Any) -> None:
+    func: Callable[..., Any] = t.func
+    coroutine: Callable[..., Awaitable[Any]] = t.coroutine
+    kind: str = f"tool:{t.name}"
+
+    @functools.wraps(func)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        tape: Optional[Cassette] = get_cassette()
+        if tape is None:
+            return func(*args, **kwargs)
+        return tape.call(kind, tool_key(t.name, args, kwargs), kwargs or args,
+                         lambda: func(*args, **kwargs))
+
+    @functools.wraps(coroutine)
+    async def arun(*args: Any, **kwargs: Any) -> Any:
+        tape: Optional[Cassette] = get_cassette()
+        if tape is None:
+            return await coroutine(*args, **kwargs)
+        return await tape.acall(kind, tool_key(t.name, args, kwargs), kwargs or args,
+                                lambda: coroutine(*args, **kwargs))
+
+    t.func, t.coroutine = run, arun
+
+
+for _tool in (search_web, search_web_batch, zapier_execute, list_zapier_connections):
+    _recorded(_tool)
+
+
+# ── Request budget and metrics ──────────────────────────────────────────
+# Every tool call is charged to the running request's budget (budget.py) and
+# timed into agent_tool_* (metrics.py). Once the budget is spent the tool
+# answers with a notice instead of running.
+_charged: ContextVar[bool] = ContextVar("tool_call_charged", default=False)
+
+# Tools report failures as text; these prefixes mark a call as an error.
+_ERROR_RE = re.compile(
+    r"^(Error|Unexpected error|Calculation error|Invalid JSON|Could not|"
+    r"Web search unavailable|Zapier service|Action '[^']*' failed)"
+)
+
+
+def _budget_refusal(name: str) -> Optional[str]:
+    budget: Optional[RequestBudget] = current_budget()
+    limit: Optional[str] = budget.begin_tool_call() if budget is not None else None
+    if limit is None:
+        return None
+    log.debug("refused %s, %s budget used up", name, limit)
+    observe_tool(name, 0.0, "refused")
+    return (
+        f"{name} was not run: the {limit} budget for this request is used up. "
+        "Answer with the information you already have."
+    )
+
+
+def _observe(name: str, started: float, result: Any) -> None:
+    outcome: str = "error" if _ERROR_RE.match(str(result)) else "ok"
+    observe_tool(name, time.perf_counter() - started, outcome)
+
+
+def _instrumented(t: Any) -> None:
+    func: Callable[..., Any] = t.func
+    coroutine: Callable[..., Awaitable[Any]] = t.coroutine
+
+    @functools.wraps(func)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        if _charged.get():  # called from this tool's own async variant
+            return func(*args, **kwargs)
+        refusal: Optional[str] = _budget_refusal(t.name)
+        if refusal:
+            return refusal
+        started: float = time.perf_counter()
+        try:
+            result: Any = func(*args, **kwargs)
+        except Exception as exc:
+            _observe(t.name, started, f"Error: {exc}")
+            raise
+        _observe(t.name, started, result)
+        return result
+
+    @functools.wraps(coroutine)
+    async def arun(*args: Any, **kwargs: Any) -> Any:
+        refusal: Optional[str] = _budget_refusal(t.name)
+        if refusal:
+            return refusal
+        token: Any = _charged.set(True)
+        started: float = time.perf_counter()
+        try:
+            result: Any = await coroutine(*args, **kwargs)
+        except Exception as exc:
+            _observe(t.name, started, f"Error: {exc}")
+            raise
+        finally:
+            _charged.reset(token)
+        _observe(t.name, started, result)
+        return result
+
+    t.func, t.coroutine = run, arun
+
+
+for _tool in (search_web, search_web_batch, save_to_notes, search_notes, calculate,
+              zapier_execute, list_zapier_connections):
+    _instrumented(_tool)
 
 
 TOOLS: List[Any] = [
+    search_notes,
     search_web,
+    search_web_batch,
     save_to_notes,
     calculate,
     zapier_execute,
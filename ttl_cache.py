@@ -0,0 +1,138 @@
+# pyright: basic
+"""Bounded TTL cache with singleflight loading.
+
+Concurrent callers asking for the same key while it is being fetched wait on
+the one outstanding fetch instead of issuing their own. Only successful
+results are stored; a failed fetch raises in every waiter so callers can
+retry. Both thread-based (`get_or_load`) and asyncio (`aget_or_load`) callers
+are supported.
+"""
+from __future__ import annotations
+
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SingleFlightCache:
+    def __init__(self, ttl: float = 900.0, max_entries: int = 256) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any, float]]" = OrderedDict()
+        self._inflight: Dict[str, "Future[Any]"] = {}
+        self._ainflight: Dict[Tuple[int, str], "asyncio.Future[Any]"] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {
+            "hits": 0, "misses": 0, "shared": 0, "errors": 0,
+            "evictions": 0, "fetch_seconds": 0.0, "saved_seconds": 0.0,
+        }
+
+    def _lookup(self, key: str) -> Tuple[bool, Any]:
+        entry: Optional[Tuple[float, Any, float]] = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value, cost = entry
+        if time.monotonic() > expires:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        self.counters["hits"] += 1
+        self.counters["saved_seconds"] += cost
+        return True, value
+
+    def _store(self, key: str, value: Any, cost: float) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value, cost)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def get_or_load(self, key: str, load: Callable[[], Any]) -> Any:
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            pending: Optional["Future[Any]"] = self._inflight.get(key)
+            owner: bool = pending is None
+            if owner:
+                pending = Future()
+                self._inflight[key] = pending
+                self.counters["misses"] += 1
+            else:
+                self.counters["shared"] += 1
+        assert pending is not None
+        if not owner:
+            return pending.result()
+
+        started: float = time.monotonic()
+        try:
+            value = load()
+        except BaseException as exc:
+            with self._lock:
+                self.counters["errors"] += 1
+                self._inflight.pop(key, None)
+            pending.set_exception(exc)
+            raise
+        cost: float = time.monotonic() - started
+        with self._lock:
+            self.counters["fetch_seconds"] += cost
+            self._store(key, value, cost)
+            self._inflight.pop(key, None)
+        pending.set_result(value)
+        return value
+
+    async def aget_or_load(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        flight_key: Tuple[int, str] = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            pending: Optional["asyncio.Future[Any]"] = self._ainflight.get(flight_key)
+            if pending is not None:
+                self.counters["shared"] += 1
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._ainflight[flight_key] = pending
+            self.counters["misses"] += 1
+        started: float = time.monotonic()
+        try:
+            value = await load()
+        except BaseException as exc:
+            with self._lock:
+                self.counters["errors"] += 1
+                self._ainflight.pop(flight_key, None)
+            pending.set_exception(exc)
+            # Mark retrieved so an unawaited failure does not warn at shutdown.
+            pending.exception()
+            raise
+        cost: float = time.monotonic() - started
+        with self._lock:
+            self.counters["fetch_seconds"] += cost
+            self._store(key, value, cost)
+            self._ainflight.pop(flight_key, None)
+        pending.set_result(value)
+        return value
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c: Dict[str, float] = dict(self.counters)
+            size: int = len(self._entries)
+        lookups: float = c["hits"] + c["misses"] + c["shared"]
+        return {
+            **c,
+            "entries": size,
+            "hit_rate": (c["hits"] + c["shared"]) / lookups if lookups else 0.0,
+        }
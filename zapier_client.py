@@ -0,0 +1,176 @@
+# pyright: basic
+"""Shared HTTP client for the Zapier service at ZAPIER_SERVICE_URL.
+
+One keep-alive connection pool is shared by every thread (`httpx.Client`), and
+each event loop gets its own pooled `httpx.AsyncClient`. Each endpoint has its
+own timeouts. The `/connections` listing, which the action executor asks for
+before almost every action, is served from a short-lived singleflight cache.
+"""
+from __future__ import annotations
+
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx  # type: ignore[import-untyped]
+from dotenv import load_dotenv  # type: ignore[import-untyped]
+
+from ttl_cache import SingleFlightCache
+
+load_dotenv()
+
+ZAPIER_SERVICE_URL: str = os.getenv("ZAPIER_SERVICE_URL", "http://localhost:3001")
+CONNECT_TIMEOUT: float = 3.0
+TIMEOUTS: Dict[str, float] = {
+    "/actions/dispatch": float(os.getenv("ZAPIER_DISPATCH_TIMEOUT", "30")),
+    "/connections": float(os.getenv("ZAPIER_CONNECTIONS_TIMEOUT", "10")),
+}
+POOL_SIZE: int = int(os.getenv("ZAPIER_POOL_SIZE", "10"))
+CONNECTIONS_TTL: float = float(os.getenv("ZAPIER_CONNECTIONS_TTL", "300"))
+
+
+class ZapierServiceError(Exception):
+    """Non-200 answer from the service; carries the status and error text."""
+
+    def __init__(self, status: int, error: str) -> None:
+        super().__init__(f"HTTP {status}: {error}")
+        self.status = status
+        self.error = error
+
+
+def _timeout(path: str) -> Any:
+    return httpx.Timeout(TIMEOUTS.get(path, 30.0), connect=CONNECT_TIMEOUT)
+
+
+def _error_text(response: Any) -> str:
+    try:
+        return str(response.json().get("error", response.text))
+    except Exception:
+        return str(response.text)
+
+
+class ZapierClient:
+    def __init__(self, base_url: str = ZAPIER_SERVICE_URL) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._limits = httpx.Limits(
+            max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE
+        )
+        self._client: Optional[Any] = None
+        self._aclients: Dict[int, Tuple[Any, Any]] = {}  # loop id -> (loop, client)
+        self._lock = threading.Lock()
+        self.connections_cache = SingleFlightCache(ttl=CONNECTIONS_TTL, max_entries=1)
+        self.counters: Dict[str, float] = {"requests": 0, "errors": 0, "seconds": 0.0}
+
+    # ── Pools ───────────────────────────────────────────────────────────
+    def _sync(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(base_url=self.base_url, limits=self._limits)
+            return self._client
+
+    def _async(self) -> Any:
+        loop: Any = asyncio.get_running_loop()
+        with self._lock:
+            entry: Optional[Tuple[Any, Any]] = self._aclients.get(id(loop))
+            if entry is None or entry[0] is not loop:
+                # Forget pools of loops that have since closed (e.g. asyncio.run).
+                for key in [k for k, (l, _) in self._aclients.items() if l.is_closed()]:
+                    del self._aclients[key]
+                entry = (loop, httpx.AsyncClient(base_url=self.base_url, limits=self._limits))
+                self._aclients[id(loop)] = entry
+            return entry[1]
+
+    def _account(self, started: float, failed: bool) -> None:
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["seconds"] += time.perf_counter() - started
+            if failed:
+                self.counters["errors"] += 1
+
+    def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        started: float = time.perf_counter()
+        try:
+            response: Any = self._sync().request(method, path, timeout=_timeout(path), **kwargs)
+        except Exception:
+            self._account(started, True)
+            raise
+        self._account(started, response.status_code != 200)
+        if response.status_code != 200:
+            raise ZapierServiceError(response.status_code, _error_text(response))
+        return response.json()
+
+    async def _arequest(self, method: str, path: str, **kwargs: Any) -> Any:
+        started: float = time.perf_counter()
+        try:
+            response: Any = await self._async().request(
+                method, path, timeout=_timeout(path), **kwargs
+            )
+        except Exception:
+            self._account(started, True)
+            raise
+        self._account(started, response.status_code != 200)
+        if response.status_code != 200:
+            raise ZapierServiceError(response.status_code, _error_text(response))
+        return response.json()
+
+    # ── Endpoints ───────────────────────────────────────────────────────
+    def dispatch(self, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._request("POST", "/actions/dispatch", json={"action": action, "params": params})
+
+    async def adispatch(self, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._arequest(
+            "POST", "/actions/dispatch", json={"action": action, "params": params}
+        )
+
+    def connections(self) -> Dict[str, Any]:
+        return self.connections_cache.get_or_load(
+            "connections", lambda: self._request("GET", "/connections")
+        )
+
+    async def aconnections(self) -> Dict[str, Any]:
+        return await self.connections_cache.aget_or_load(
+            "connections", lambda: self._arequest("GET", "/connections")
+        )
+
+    # ── Lifecycle ───────────────────────────────────────────────────────
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Close the pool of the running loop (and the sync pool)."""
+        with self._lock:
+            entry: Optional[Tuple[Any, Any]] = self._aclients.pop(
+                id(asyncio.get_running_loop()), None
+            )
+        if entry is not None:
+            await entry[1].aclose()
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c: Dict[str, float] = dict(self.counters)
+            pools: int = len(self._aclients) + (self._client is not None)
+        return {
+            **c,
+            "avg_ms": c["seconds"] / c["requests"] * 1000 if c["requests"] else 0.0,
+            "pools": pools,
+            "connections_cache": self.connections_cache.stats(),
+        }
+
+
+zapier_client: ZapierClient = ZapierClient()
+
+
+def get_zapier_client() -> ZapierClient:
+    return zapier_client
+
+
+def set_zapier_client(client: ZapierClient) -> None:
+    """Swap the shared client, e.g. to point it at benchmarks/zapier_standin.py."""
+    global zapier_client
+    zapier_client = client